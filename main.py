@@ -1,19 +1,21 @@
-import time
-import json
-from pathlib import Path
-from collections import Counter
-from src.recorder.screen_recorder import ScreenRecorder
-from src.recorder.event_tracker import EventTracker
-from src.recorder.audio_recorder import AudioRecorder
-from src.analyzer.activity_analyzer import ActivityAnalyzer
-from src.llm.ollama_client import OllamaClient
+import logging
+import threading
+from src.recorder.model_registry import model_registry
+from src.analyzer.similarity import SimilarityIndex
+from src.processor.session import Session
 from src.utils.data_cleaner import clear_all_data
 
-def main():
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+def main(record_audio=True, ocr=True, cpu_budget=25.0, profile=None):
     print("="*60)
     print("Desktop AI Assistant - Recording Session")
     print("="*60)
 
+    # Load Whisper in the background while waiting for user input
+    if record_audio:
+        model_registry.warm_up()
+
     print("Do you want old recorded data to be deleted?")
     choice = input("Enter 'yes' to delete, or press Enter to keep them: ")
     if choice.lower() == 'yes':
@@ -21,85 +23,129 @@ def main():
         print()
 
     RECORDING_DURATION = 180
+    LIVE_UPDATE_INTERVAL = 5
 
     print("[1/5]Initalizing recorders...")
-    screen_recorder = ScreenRecorder(interval=2)
-    event_tracker = EventTracker()
-    audio_recorder = AudioRecorder()
+    # Recording, live analysis and the LLM preload run side by side
+    session = Session(similarity_index=SimilarityIndex(), record_audio=record_audio, ocr=ocr,
+                      cpu_budget=cpu_budget, profile=profile)
+    print(f"Watching for {len(session.template_matcher.templates)} workflow templates")
 
     print("[2/5] Starting all recorders...")
-    screen_recorder.start()
-    event_tracker.start()
-    audio_recorder.start()
+    session.start()
 
-    print(f"Recording for {RECORDING_DURATION} seconds...")
+    print(f"Recording for {RECORDING_DURATION} seconds... (Ctrl+C stops early)")
     print("You can interact with your computer during this time.")
     print("Try clicking, typing, opening apps, etc")
 
-    time.sleep(RECORDING_DURATION)
+    # Print live suggestions as they come up during the recording
+    reported = 0
+    def print_live(snapshot):
+        nonlocal reported
+        for suggestion in snapshot['suggestions'][reported:]:
+            print(f"[Live] {suggestion}")
+        reported = len(snapshot['suggestions'])
 
-    print("[3/5] Stopping all recorders...")
-    screen_recorder.stop()
-    event_tracker.stop()
-    audio_recorder.stop()
-
-    print("[4/5] Analyzing workflow...")
-    analyzer = ActivityAnalyzer()
-    workflow = analyzer.generate_workflow_json()
-    workflow_file = Path("data")/f"workflow_{workflow['session_id']}.json"
-    with open(workflow_file, 'w') as f:
-        json.dump(workflow, f, indent=2)
-
-    print(f"Workflow saved to: {workflow_file}")
-
-    print(f"Captured {workflow['summary']['total_events']} events")
-    print(f"Captured {workflow['summary']['total_screenshots']} screenshots")
-    print(f"Captured {workflow['summary']['total_transcripts']} audio transcripts")
-
-    print("[Bonus] Generating hybrid pattern suggestions...")
-    hybrid_suggestions = analyzer.detect_patterns_hybrid(workflow['events'])
-
-    print("[5/5] Generating automation suggestions...")
-    print("This may take 30-60 seconds...")
-
-    llm_client = OllamaClient()
-    suggestions = llm_client.generate_suggestions(workflow)
-
-    # Save both suggestions to a file for comparison
-    suggestions_file = Path("data") / f"automation_suggestions_{workflow['session_id']}.txt"
-    with open(suggestions_file, 'w', encoding='utf-8') as f:
-        f.write("="*60 + "\n")
-        f.write("AUTOMATION SUGGESTIONS - COMPARISON\n")
-        f.write("="*60 + "\n\n")
-        
-        f.write("LLM-BASED SUGGESTIONS:\n")
-        f.write("-"*60 + "\n")
-        f.write(suggestions)
-        f.write("\n\n" + "="*60 + "\n\n")
-        
-        f.write("HYBRID PATTERN DETECTION:\n")
-        f.write("-"*60 + "\n")
-        if hybrid_suggestions:
-            f.write("\n".join(hybrid_suggestions))
-        else:
-            f.write("No patterns detected.")
-        
-        f.write("\n\n" + "="*60 + "\n")
-
-    print(f"\nAll suggestions saved to: {suggestions_file}")
+    try:
+        session.wait(RECORDING_DURATION, on_progress=print_live, interval=LIVE_UPDATE_INTERVAL)
+    except KeyboardInterrupt:
+        session.stop()
 
-    print("="*60)
-    print("AUTOMATION SUGGESTIONS:")
-    print("="*60)
-    print(suggestions)
-    print("="*60)
-    print("HYBRID PATTERN SUGGESTIONS:")
-    print("="*60)
-    print("\n".join(hybrid_suggestions))
-    print("="*60)
+    print("[3/5] Stopping all recorders...")
+    load = session.llm_client.transport.load_stats
+    if load.get("ok"):
+        print(f"LLM preloaded during recording in {load['seconds']:.2f}s (server load {load['load_seconds']:.2f}s)")
+
+    print("[4/5] Analyzing workflow and generating suggestions...")
+    print("This may take 30-60 seconds... (Ctrl+C stops the answer early)")
+
+    # Run the remaining stages in the background so Ctrl+C can cancel them
+    outcome = {}
+    def finish():
+        outcome["result"] = session.finish(
+            on_token=lambda text: print(text, end="", flush=True),
+            on_status=print
+        )
+    worker = threading.Thread(target=finish, daemon=True)
+    worker.start()
+    while worker.is_alive():
+        try:
+            worker.join(0.5)
+        except KeyboardInterrupt:
+            # Closing the stream also stops the generation in Ollama
+            print("\nCancelling...")
+            session.cancel()
+    print()
+
+    print("[5/5] Saving results...")
+    result = outcome.get("result")
+    if result is None:
+        print("Session failed, see the errors above.")
+        return
+
+    summary = result["summary"]
+    print(f"Workflow saved to: {result['workflow_file']}")
+    print(f"Captured {summary['total_events']} events")
+    print(f"Captured {summary['total_screenshots']} screenshots")
+    print(f"Captured {summary['total_transcripts']} audio transcripts")
+
+    if result["cancelled"]:
+        print("Suggestions cancelled.")
+    else:
+        print(f"\nAll suggestions saved to: {result['suggestions_file']}")
+
+        print("="*60)
+        print("AUTOMATION SUGGESTIONS:")
+        print("="*60)
+        print(result["suggestions"])
+        print("="*60)
+        print("HYBRID PATTERN SUGGESTIONS:")
+        print("="*60)
+        print("\n".join(result["hybrid_suggestions"]))
+        print("="*60)
+
+    timings = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["timings"].items())
+    print(f"Stage timings: {timings}")
+    print("Metrics exported to data/metrics/ (metrics.jsonl, metrics.prom)")
+    governor = result["governor"]
+    print(f"Resource governor ({governor['backend']}): {governor['decisions']} throttling decisions, "
+          f"highest load level {governor['max_level']}, peak process CPU {governor['peak'].get('process_cpu')}%")
+
+    if result.get("profile"):
+        print(f"Profiles saved to {result['profile']['folder']} (merged.collapsed is flame graph input)")
+        for name, profile in result["profile"]["profiles"].items():
+            hottest = profile["hottest"][0]["function"] if profile["hottest"] else "-"
+            print(f"  {name}: {profile['slow_calls']}/{profile['calls']} calls kept, "
+                  f"max {profile['max_ms']} ms, hottest {hottest}")
+
+    whisper_load_time = model_registry.load_time()
+    if whisper_load_time is not None:
+        print(f"Whisper model load time: {whisper_load_time:.2f}s")
 
     print("Recording session complete!")
     print(f"Check 'data/' folder for captured data.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record a session and suggest automations")
+    parser.add_argument("--no-audio", action="store_true", help="Don't record or transcribe audio")
+    parser.add_argument("--no-ocr", action="store_true", help="Don't OCR text near clicks")
+    parser.add_argument("--cpu-budget", type=float, default=25.0,
+                        help="Share of the machine's CPU (percent) the recorders may use before being throttled")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the recorder threads and input callbacks into data/profiles/")
+    parser.add_argument("--profile-slow-ms", type=float, default=0.0,
+                        help="Only keep profiled calls that take at least this long")
+    parser.add_argument("--profile-cprofile", action="store_true",
+                        help="Also write cProfile stats (.prof) next to the sampled stacks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format=LOG_FORMAT, datefmt="%H:%M:%S")
+
+    profile = None
+    if args.profile:
+        profile = {"slow_ms": args.profile_slow_ms, "cprofile": args.profile_cprofile}
+
+    main(record_audio=not args.no_audio, ocr=not args.no_ocr, cpu_budget=args.cpu_budget, profile=profile)
\ No newline at end of file
@@ -1,18 +1,53 @@
 import json
+import logging
+import re
 from pathlib import Path
 from datetime import datetime
+from collections import Counter
 from typing import List, Dict
+from .sequence_miner import SequenceMiner
+from .stream_analyzer import StreamingAnalyzer
+from .template_matcher import TemplateMatcher
+from .timeline_join import TimeIndex, attach_context
+from .columnar import SessionColumns
+from .workflow_io import WorkflowReader, write_workflow
+from .window_normalizer import default_normalizer
+from ..storage.event_store import to_epoch
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_TIME_PATTERN = re.compile(r"(\d{8}_\d{6})")
+
+# Audio chunk length; bounds how far a transcript's file time can be from its audio
+TRANSCRIPT_SLACK = 10
 
 class ActivityAnalyzer:
     """Analyze user activity from screenshots, events and audio"""
     def __init__(self, 
                 screenshot_dir = "data/screenshots",
                 events_dir = "data/events",
-                audio_dir = "data/audio"):
+                audio_dir = "data/audio",
+                store = None,
+                normalizer = None,
+                similarity_index = None):
         self.screenshots_dir = Path(screenshot_dir)
         self.events_dir = Path(events_dir)
         self.audio_dir = Path(audio_dir)
 
+        # Optional EventStore; JSON files are the fallback when it has no data
+        self.store = store
+
+        # Maps window titles to stable keys for counting and matching
+        self.normalizer = normalizer or default_normalizer
+
+        # Optional SimilarityIndex of past sessions for cross-session matches
+        self.similarity_index = similarity_index
+
+        # Seconds around the session's events to still count screenshots/audio,
+        # and how far a step may be from its attached screenshot
+        self.context_margin = 5
+        self.max_screenshot_distance = 10
+
         self.screenshots_dir.mkdir(parents=True, exist_ok=True)
         self.events_dir.mkdir(parents=True, exist_ok=True)
         self.audio_dir.mkdir(parents=True, exist_ok=True)
@@ -36,6 +71,11 @@ class ActivityAnalyzer:
 
 
     def load_events(self, session_id=None):
+        if self.store is not None:
+            store_session = session_id or self.store.latest_session_id()
+            if store_session and self.store.has_session(store_session):
+                return self.store.get_events(session_id=store_session)
+
         event_files = list(self.events_dir.glob("events_*.json"))
 
         if not event_files:
@@ -51,33 +91,186 @@ class ActivityAnalyzer:
                 return json.load(f)
 
         except Exception as e:
-            print(f"Error loading events: {e}")
+            logger.error("Error loading events: %s", e)
             return []
 
-    def load_screenshots(self) -> List[Path]:
+    def count_activity(self, period="week", window=None, event_type=None, start=None, end=None) -> Dict[str, int]:
+        """Events per hour/day/week/month across all stored sessions"""
+        if self.store is None:
+            return {}
+        return self.store.count_by_period(period, start=start, end=end, window=window, event_type=event_type)
+
+    def count_by_window(self, session_id=None, start=None, end=None, event_type=None) -> Dict[str, int]:
+        """Events per window across stored sessions, optionally limited to a session or range"""
+        if self.store is None:
+            return dict(Counter(e.get("window") for e in self.load_events(session_id)))
+        return self.store.count_by_window(session_id, start=start, end=end, event_type=event_type)
+
+    def _screenshot_time(self, screenshot_file):
+        try:
+            return datetime.strptime(Path(screenshot_file).stem, "screenshot_%Y-%m-%d_%H-%M-%S").timestamp()
+        except ValueError:
+            return None
+
+    def _transcript_file_time(self, transcript_file):
+        """Time encoded in a transcript file name (chunk start, or chunk save time for old files)"""
+        match = TRANSCRIPT_TIME_PATTERN.search(Path(transcript_file).stem)
+        if not match:
+            return None
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+
+    def _transcript_span(self, transcript: Dict):
+        """(start, end) epoch seconds of a transcript's audio"""
+        start = to_epoch(transcript.get("start"))
+        end = to_epoch(transcript.get("end"))
+        if start is not None and end is not None:
+            return start, end
+
+        # Older transcripts only record when transcription finished
+        finished = to_epoch(transcript.get("timestamp"))
+        if finished is None:
+            return None
+        return finished - TRANSCRIPT_SLACK, finished
+
+    def _session_span(self, events: List[Dict]):
+        times = [t for t in (to_epoch(e.get("timestamp")) for e in events) if t is not None]
+        if not times:
+            return None, None
+        return min(times) - self.context_margin, max(times) + self.context_margin
+
+    def load_screenshots(self, session_id=None, start=None, end=None) -> List[Path]:
+        """Screenshots of a session (from the store) or taken within [start, end], in time order"""
+        if self.store is not None and session_id:
+            rows = self.store.get_screenshots(session_id=session_id)
+            if rows:
+                return [Path(row["path"]) for row in rows]
+
         screenshot_files = sorted(self.screenshots_dir.glob("screenshot_*.png"))
-        return screenshot_files
+        if start is None and end is None:
+            return screenshot_files
+
+        index = TimeIndex([
+            (t, f) for f in screenshot_files
+            if (t := self._screenshot_time(f)) is not None
+        ])
+        return index.between(
+            start if start is not None else float("-inf"),
+            end if end is not None else float("inf")
+        )
+
+    def load_audio_transcripts(self, session_id=None, start=None, end=None) -> List[Dict]:
+        """Transcripts of a session or overlapping [start, end], in time order.
+
+        File names carry the chunk time, so only files near the range are opened.
+        """
+        if self.store is not None and session_id:
+            stored = self.store.get_transcripts(session_id=session_id)
+            if stored:
+                return stored
 
-    def load_audio_transcripts(self) -> List[Path]:
         transcript_files = sorted(self.audio_dir.glob("transcript_*.json"))
+        if start is not None or end is not None:
+            lower = (start if start is not None else float("-inf")) - TRANSCRIPT_SLACK
+            upper = (end if end is not None else float("inf")) + TRANSCRIPT_SLACK
+            transcript_files = [
+                f for f in transcript_files
+                if (t := self._transcript_file_time(f)) is None or lower <= t <= upper
+            ]
+
         transcripts = []
 
         for transcript_file in transcript_files:
             try:
                 with open(transcript_file, 'r') as f:
                     transcript_data = json.load(f)
-                    transcripts.append(transcript_data)
             except Exception as e:
-                print(f"Error loading transcript {transcript_file}: {e}")
+                logger.error("Error loading transcript %s: %s", transcript_file, e)
+                continue
+
+            recorded_for = transcript_data.get("session_id")
+            if session_id and recorded_for and recorded_for != session_id:
+                continue
+
+            if start is not None or end is not None:
+                span = self._transcript_span(transcript_data)
+                if span is None:
+                    continue
+                if (end is not None and span[0] > end) or (start is not None and span[1] < start):
+                    continue
+
+            transcripts.append(transcript_data)
         
         return transcripts
 
-    def generate_workflow_json(self, session_id=None) -> Dict:
-        events = self.load_events(session_id)
-        screenshots = self.load_screenshots()
-        transcripts = self.load_audio_transcripts()
+    def attach_step_context(self, steps: List[Dict], screenshots: List[Path], transcripts: List[Dict]) -> List[Dict]:
+        """Add the nearest screenshot and overlapping transcript segments to each step"""
+        step_times = [to_epoch(step.get("timestamp")) for step in steps]
+
+        screenshot_times = [
+            (t, str(f)) for f in screenshots
+            if (t := self._screenshot_time(f)) is not None
+        ]
+
+        transcript_spans = []
+        for i, transcript in enumerate(transcripts):
+            span = self._transcript_span(transcript)
+            if span is not None:
+                transcript_spans.append((span[0], span[1], {"index": i, "text": transcript.get("transcript")}))
+
+        return attach_context(
+            steps,
+            step_times,
+            screenshot_times,
+            transcript_spans,
+            max_screenshot_distance=self.max_screenshot_distance
+        )
+
+    def build_columns(self, events: List[Dict]) -> SessionColumns:
+        """Columnar view of the events for vectorized statistics"""
+        return SessionColumns.from_events(events, window_key=self.normalizer.key)
+
+    def create_stream(self, min_repeats=3) -> StreamingAnalyzer:
+        """Incremental analyzer to feed with events while recording"""
+        return StreamingAnalyzer(self, min_repeats=min_repeats)
+
+    def create_matcher(self, templates_file="data/templates/workflows.json", stream: StreamingAnalyzer = None) -> TemplateMatcher:
+        """Matcher for the registered workflow templates, reporting matches to `stream`"""
+        matcher = TemplateMatcher(self)
+        matcher.load_templates(templates_file)
+        if stream is not None:
+            matcher.add_listener(stream.add_match)
+        return matcher
+
+    def _build_workflow(self, session_id=None, stream: StreamingAnalyzer = None):
+        """Header fields, events and steps of a session's workflow"""
+        if stream is not None:
+            events = stream.events
+            workflow_steps = stream.get_steps()
+        else:
+            events = self.load_events(session_id)
+            workflow_steps = self._analyze_workflow_steps(events)
 
-        workflow = {
+        # Only this session's screenshots and transcripts
+        start, end = self._session_span(events)
+        if start is None:
+            screenshots, transcripts = [], []
+        else:
+            screenshots = self.load_screenshots(session_id, start, end)
+            transcripts = self.load_audio_transcripts(session_id, start, end)
+
+        self.attach_step_context(workflow_steps, screenshots, transcripts)
+
+        similar_workflows = self.find_similar_workflows(events, session_id)
+        if session_id:
+            self.index_session(session_id, events)
+
+        if self.store is not None and session_id:
+            try:
+                self.store.replace_steps(session_id, workflow_steps)
+            except Exception as e:
+                logger.error("Error writing workflow steps to store: %s", e)
+
+        header = {
             "session_id": session_id or datetime.now().strftime("%Y%m%d_%H%M%S"),
             "timestamp": datetime.now().isoformat(),
             "summary": {
@@ -85,129 +278,211 @@ class ActivityAnalyzer:
                 "total_screenshots": len(screenshots),
                 "total_transcripts": len(transcripts)
             },
-            "events": events,
             "screenshots": [str(s) for s in screenshots],
             "transcripts": transcripts,
-            "workflow_steps": self._analyze_workflow_steps(events)
+            "statistics": self.build_columns(events).summary() if events else {},
+            "template_matches": stream.template_matches if stream is not None else [],
+            "similar_workflows": similar_workflows
+        }
+        return header, events, workflow_steps
+
+    def generate_workflow_json(self, session_id=None, stream: StreamingAnalyzer = None) -> Dict:
+        """Build the workflow for a session as one dict.
+
+        With a `stream` that consumed the session live, its events and steps
+        are used as-is instead of reloading and re-analyzing from disk. For
+        large sessions prefer `write_workflow`, which streams to disk.
+        """
+        header, events, workflow_steps = self._build_workflow(session_id, stream)
+
+        workflow = {
+            "session_id": header["session_id"],
+            "timestamp": header["timestamp"],
+            "summary": header["summary"],
+            "events": events,
+            "screenshots": header["screenshots"],
+            "transcripts": header["transcripts"],
+            "workflow_steps": workflow_steps,
+            "statistics": header["statistics"],
+            "template_matches": header["template_matches"],
+            "similar_workflows": header["similar_workflows"]
         }
 
         return workflow
+
+    def write_workflow(self, output_file, session_id=None, stream: StreamingAnalyzer = None) -> Path:
+        """Stream a session's workflow to NDJSON; steps reference events by id.
+
+        Read it back lazily with WorkflowReader.
+        """
+        header, events, workflow_steps = self._build_workflow(session_id, stream)
+        return write_workflow(output_file, header, events, workflow_steps)
     
     def _analyze_workflow_steps(self, events: List[Dict]) -> List[Dict]:
-        steps = []
-        pending_keys = []
-        pending_window = None
-        pending_element = None
-        pending_start = None
-
-        def flush_pending_keys():
-            nonlocal pending_keys, pending_window, pending_element, pending_start
-            if not pending_keys:
-                return
-            key_text = " ".join(pending_keys)
-            step = {
-                'timestamp': pending_start,
-                'window': pending_window or "Unknown window",
-                'action_type': 'key_press',
-                'keys': pending_keys[:],
-                'summary': f"Typed: {key_text} in {pending_window or 'Unknown window'}"
-            }
-            if pending_element:
-                step['element'] = pending_element
-
-            steps.append(step)
-            pending_keys = []
-            pending_window = None
-            pending_element = None
-            pending_start = None
-
+        stream = StreamingAnalyzer(self)
         for event in events:
-            action_type = event.get("type")
-            window = event.get("window")
-
-            if action_type != "key_press":
-                flush_pending_keys()
-
-            if action_type == "mouse_click":
-                element_info = event.get("element") or {}
-                label = event.get("clicked_element") or element_info.get("name")
-                steps.append({
-                    'timestamp': event.get("timestamp"),
-                    'window': window,
-                    'action_type': 'mouse_click',
-                    'click': {
-                        "location": {"x": event.get("x"), "y": event.get("y")},
-                        "label": label,
-                        "element": element_info
-                    },
-                    'summary': self._build_click_summary(event, label, element_info)
-                })
-                pending_element = element_info or None
-
-            elif action_type == "key_press":
-                key = event.get("key")
-                if not key:
+            stream.consume(event)
+        return stream.get_steps()
+
+    def _action_token(self, event: Dict):
+        """Token identifying a single action, or None for non-actions.
+
+        Windows are normalized, so "Inbox (17) - Outlook" and "Inbox (18) - Outlook"
+        produce the same token.
+        """
+        action_type = event.get('type', '')
+        window = self.normalizer.key(event.get('window'))
+
+        if action_type == "mouse_click":
+            element = event.get('clicked_element', '')
+            # Unlabeled clicks are recorded as "Position(x, y)", unique per pixel
+            if element and not element.startswith("Position("):
+                return f"{window}: {element}"
+            return f"{window}: click"
+        if action_type == 'key_press':
+            key = event.get('key', '')
+            return f"{window}: {key}"
+        return None
+
+    def _action_sequence(self, events: List[Dict]):
+        """Action tokens for sequence mining, with the index of the event each starts at.
+
+        Runs of plain typing collapse into one "typing" token per window, so
+        "click Export -> type a filename -> Ctrl+S" is three tokens no matter
+        what was typed.
+        """
+        tokens = []
+        event_indices = []
+
+        for i, event in enumerate(events):
+            token = self._action_token(event)
+            if token is None:
+                continue
+
+            key = event.get('key', '')
+            if event.get('type') == 'key_press' and '+' not in key:
+                token = f"{self.normalizer.key(event.get('window'))}: typing"
+                if tokens and tokens[-1] == token:
                     continue
-                if not pending_keys:
-                    pending_window = window
-                    pending_start = event.get("timestamp")
-                    pending_element = event.get("element") or None
-                elif window != pending_window:
-                    flush_pending_keys()
-                    pending_window = window
-                    pending_start = event.get("timestamp")
-                    pending_element = event.get("element") or None
-
-                pending_keys.append(key)
-            else:
-                steps.append({
-                    'timestamp': event.get("timestamp"),
-                    'window': window,
-                    'action_type': action_type,
-                    'summary': f"{action_type or 'event'} recorded"
-                })
-            
-        flush_pending_keys()
 
-        return steps
+            tokens.append(token)
+            event_indices.append(i)
+
+        return tokens, event_indices
+
+    def mine_sequences(self, events: List[Dict], min_support=3, min_length=2, max_length=8) -> List[Dict]:
+        """Repeated multi-step action sequences, with occurrences as event indexes"""
+        tokens, event_indices = self._action_sequence(events)
+
+        miner = SequenceMiner(
+            min_support=min_support,
+            min_length=min_length,
+            max_length=max_length
+        )
+        sequences = miner.mine(tokens)
 
-    def detect_patterns_hybrid(self, events: List[Dict]) -> List[str]:
+        for sequence in sequences:
+            sequence["occurrences"] = [event_indices[i] for i in sequence["occurrences"]]
+            sequence["timestamps"] = [events[i].get("timestamp") for i in sequence["occurrences"]]
+
+        return sequences
+
+    def index_session(self, session_id, events: List[Dict]):
+        """Add a session's action sequence to the similarity index"""
+        if self.similarity_index is None or not events:
+            return
+        tokens, event_indices = self._action_sequence(events)
+        timestamps = [events[i].get("timestamp") for i in event_indices]
+        try:
+            self.similarity_index.add_session(session_id, tokens, timestamps)
+        except Exception as e:
+            logger.error("Error indexing session for similarity search: %s", e)
+
+    def find_similar_workflows(self, events: List[Dict], session_id=None, threshold=0.5) -> List[Dict]:
+        """Past sessions containing a workflow similar to part of this one"""
+        if self.similarity_index is None or not events:
+            return []
+        tokens, event_indices = self._action_sequence(events)
+        try:
+            matches = self.similarity_index.query_session(tokens, threshold, exclude_session=session_id)
+        except Exception as e:
+            logger.error("Error querying similar workflows: %s", e)
+            return []
+
+        for match in matches:
+            match["timestamp"] = events[event_indices[match["query_start"]]].get("timestamp")
+            match["sequence"] = tokens[match["query_start"]:match["query_end"]]
+        return matches
+
+    def detect_patterns_hybrid(self, events: List[Dict], min_repeats=3, columns: SessionColumns = None,
+                               session_id=None, similar_workflows: List[Dict] = None) -> List[str]:
+        """Rule-based automation suggestions.
+
+        `similar_workflows` is a workflow header's find_similar_workflows
+        result, reused instead of querying the similarity index again.
+        """
         suggestions = []
 
         actions = []
         windows = []
 
         for event in events:
-            action_type = event.get('type', '')
-            window = event.get('window', 'unknown')
-
-            if action_type == "mouse_click":
-                element = event.get('clicked_element', '')
-                if element:
-                    actions.append(f"{window}: {element}")
-                else:
-                    actions.append(f"{windows}: click")
-            if action_type == 'key_press':
-                key = event.get('key', '')
-                actions.append(f"{window}: {key}")
-
-            windows.append(window)
-
-        from collections import Counter
+            token = self._action_token(event)
+            if token is not None:
+                actions.append(token)
+
+            windows.append(self.normalizer.app(event.get('window')))
+
         action_counts = Counter(actions)
 
         for action, count in action_counts.items():
-            if count >= 3:
-                windows, detail = action.split(':', 1)
+            if count >= min_repeats:
+                window, detail = action.split(':', 1)
                 suggestions.append(
-                    f"Detected repetitive action: {windows} - {detail} ({count} times)"
+                    f"Detected repetitive action: {window} - {detail} ({count} times). "
                     f"This can be automated."
                 )
+
+        for sequence in self.mine_sequences(events, min_support=min_repeats):
+            steps = " -> ".join(sequence["sequence"])
+            suggestions.append(
+                f"Detected repeated workflow: {steps} ({sequence['support']} times). "
+                f"This multi-step sequence can be automated."
+            )
             
-        unique_windows = [w for w in windows if w and w != 'unknown']
+        if columns is None and events:
+            columns = self.build_columns(events)
+        if columns is not None:
+            for burst in columns.bursts(window_seconds=5, min_events=20):
+                seconds = (burst['end'] - burst['start'])/1e6
+                suggestions.append(
+                    f"Detected burst of {burst['events']} actions in {seconds:.0f}s in {burst['window']}. "
+                    f"Rapid manual input like this is a good candidate for a macro."
+                )
+
+            for window, shortcuts in columns.shortcut_usage().items():
+                total = sum(shortcuts.values())
+                if total >= min_repeats*3:
+                    top = ", ".join(f"{k} x{v}" for k, v in sorted(shortcuts.items(), key=lambda kv: -kv[1])[:3])
+                    suggestions.append(
+                        f"Heavy shortcut use in {window}: {top}. "
+                        f"The surrounding steps may be scriptable."
+                    )
+
+        if similar_workflows is None:
+            similar_workflows = self.find_similar_workflows(events, session_id)
+        for match in similar_workflows:
+            steps = " -> ".join(match["sequence"][:6])
+            suggestions.append(
+                f"Workflow also performed in session {match['session_id']} "
+                f"(similarity {match['similarity']:.0%}): {steps}. "
+                f"It recurs across sessions, so it is a strong automation candidate."
+            )
+
+        unique_windows = [w for w in windows if w and w != 'Unknown']
         if len(set(unique_windows)) >= 2:
             suggestions.append(
-                f"Detected workflow spanning multiple apps: {', '.join(set(unique_windows))}."
+                f"Detected workflow spanning multiple apps: {', '.join(set(unique_windows))}. "
                 f"Data flow between these applications can be automated."
             )
         
@@ -218,16 +493,13 @@ if __name__ == "__main__":
 
     analyzer = ActivityAnalyzer()
 
-    workflow = analyzer.generate_workflow_json()
-
-    print(f"Session ID: {workflow['session_id']}")
-    print(f"Total Events: {workflow['summary']['total_events']}")
-    print(f"Total Screenshots: {workflow['summary']['total_screenshots']}")
-    print(f"Total Transcripts: {workflow['summary']['total_transcripts']}")
-    print(f"Workflow Steps: {len(workflow['workflow_steps'])}")
+    output_file = analyzer.write_workflow(Path("data")/"workflow_latest.ndjson")
 
-    output_file = Path("data")/f"workflow_{workflow['session_id']}.json"
-    with open(output_file, 'w') as f:
-        json.dump(workflow, f, indent=2)
+    with WorkflowReader(output_file) as workflow:
+        print(f"Session ID: {workflow['session_id']}")
+        print(f"Total Events: {workflow['summary']['total_events']}")
+        print(f"Total Screenshots: {workflow['summary']['total_screenshots']}")
+        print(f"Total Transcripts: {workflow['summary']['total_transcripts']}")
+        print(f"Workflow Steps: {len(workflow['workflow_steps'])}")
 
-    print(f"Workflow saved to {output_file}")
\ No newline at end of file
+    print(f"Workflow saved to {output_file}")
@@ -0,0 +1,221 @@
+import json
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Optional
+from .activity_analyzer import ActivityAnalyzer
+from .window_normalizer import default_normalizer
+from ..storage.event_store import EventStore
+
+logger = logging.getLogger(__name__)
+
+# Bump when the per-session analysis changes so cached results are recomputed
+ANALYSIS_VERSION = 2
+
+def _analyze_session(session_id, events_dir, db_path):
+    """Analyze one session in a worker process (module-level so it can be pickled)"""
+    store = EventStore(db_path) if db_path else None
+    try:
+        analyzer = ActivityAnalyzer(events_dir=events_dir, store=store)
+        events = analyzer.load_events(session_id)
+        steps = analyzer._analyze_workflow_steps(events)
+        columns = analyzer.build_columns(events) if events else None
+
+        return {
+            "session_id": session_id,
+            "total_events": len(events),
+            "total_steps": len(steps),
+            "workflow_steps": steps,
+            "action_counts": dict(Counter(
+                token for token in map(analyzer._action_token, events) if token is not None
+            )),
+            "sequences": analyzer.mine_sequences(events),
+            "suggestions": analyzer.detect_patterns_hybrid(events, columns=columns),
+            "statistics": columns.summary() if columns is not None else {}
+        }
+    finally:
+        if store is not None:
+            store.close()
+
+class BatchAnalyzer:
+    """Analyze many sessions in parallel, caching each session's results by input fingerprint"""
+
+    def __init__(self, events_dir="data/events", db_path="data/assistant.db",
+                 cache_dir="data/cache/analysis", max_workers=None):
+        self.events_dir = Path(events_dir)
+        self.db_path = Path(db_path) if db_path else None
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        # Counters from the last run
+        self.stats = {"sessions": 0, "cached": 0, "analyzed": 0, "seconds": 0.0}
+
+    def _open_store(self):
+        if self.db_path is not None and self.db_path.exists():
+            return EventStore(self.db_path)
+        return None
+
+    def list_sessions(self, store=None) -> List[str]:
+        sessions = {f.stem.replace("events_", "", 1) for f in self.events_dir.glob("events_*.json")}
+        if store is not None:
+            sessions.update(s["session_id"] for s in store.get_sessions())
+        return sorted(sessions)
+
+    def _fingerprint(self, session_id, store=None) -> Optional[str]:
+        """mtime/size of the events file, or the store's fingerprint when the session lives there.
+
+        The window normalizer's rules are part of it, since they change the
+        action tokens and window statistics of unchanged sessions.
+        """
+        version = f"v{ANALYSIS_VERSION}:{default_normalizer.fingerprint()}"
+        if store is not None:
+            stored = store.session_fingerprint(session_id)
+            if stored is not None:
+                return f"{version}:db:{stored}"
+
+        event_file = self.events_dir/f"events_{session_id}.json"
+        if event_file.exists():
+            stat = event_file.stat()
+            return f"{version}:file:{stat.st_mtime_ns}:{stat.st_size}"
+        return None
+
+    def _cache_file(self, session_id):
+        return self.cache_dir/f"analysis_{session_id}.json"
+
+    def _load_cached(self, session_id, fingerprint):
+        cache_file = self._cache_file(session_id)
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except Exception:
+            return None
+        if cached.get("fingerprint") != fingerprint:
+            return None
+        return cached["result"]
+
+    def _save_cached(self, session_id, fingerprint, result):
+        cache_file = self._cache_file(session_id)
+        tmp_file = cache_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "result": result}, f)
+        os.replace(tmp_file, cache_file)
+
+    def analyze_sessions(self, session_ids: List[str] = None) -> Dict[str, Dict]:
+        """Per-session results, recomputing only sessions whose inputs changed"""
+        start = time.perf_counter()
+        store = self._open_store()
+        try:
+            if session_ids is None:
+                session_ids = self.list_sessions(store)
+            fingerprints = {s: self._fingerprint(s, store) for s in session_ids}
+        finally:
+            if store is not None:
+                store.close()
+
+        results = {}
+        stale = []
+        for session_id, fingerprint in fingerprints.items():
+            if fingerprint is None:
+                continue
+            cached = self._load_cached(session_id, fingerprint)
+            if cached is not None:
+                results[session_id] = cached
+            else:
+                stale.append(session_id)
+
+        db_path = str(self.db_path) if self.db_path is not None and self.db_path.exists() else None
+        if stale:
+            logger.info("Analyzing %d of %d sessions...", len(stale), len(fingerprints))
+            if self.max_workers > 1 and len(stale) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.max_workers, len(stale))) as pool:
+                    futures = {
+                        s: pool.submit(_analyze_session, s, str(self.events_dir), db_path)
+                        for s in stale
+                    }
+                    computed = {s: future.result() for s, future in futures.items()}
+            else:
+                computed = {s: _analyze_session(s, str(self.events_dir), db_path) for s in stale}
+
+            for session_id, result in computed.items():
+                self._save_cached(session_id, fingerprints[session_id], result)
+                results[session_id] = result
+
+        self.stats = {
+            "sessions": len(results),
+            "cached": len(results) - len(stale),
+            "analyzed": len(stale),
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+        return results
+
+    def merge_results(self, results: Dict[str, Dict], top=20) -> Dict:
+        """Cross-session report: actions, sequences and windows that recur across sessions"""
+        action_totals = Counter()
+        action_sessions = Counter()
+        sequence_support = Counter()
+        sequence_sessions = Counter()
+        window_dwell = Counter()
+
+        for result in results.values():
+            actions = result.get("action_counts", {})
+            action_totals.update(actions)
+            action_sessions.update(actions.keys())
+
+            for sequence in result.get("sequences", []):
+                key = " -> ".join(sequence["sequence"])
+                sequence_support[key] += sequence["support"]
+                sequence_sessions[key] += 1
+
+            for window in result.get("statistics", {}).get("windows", []):
+                window_dwell[window["window"]] += window["dwell_seconds"]
+
+        return {
+            "generated_at": datetime.now().isoformat(),
+            "sessions": sorted(results),
+            "total_events": sum(r.get("total_events", 0) for r in results.values()),
+            "top_actions": [
+                {"action": a, "count": c, "sessions": action_sessions[a]}
+                for a, c in action_totals.most_common(top)
+            ],
+            "recurring_sequences": [
+                {"sequence": s, "support": sequence_support[s], "sessions": n}
+                for s, n in sequence_sessions.most_common(top)
+                if n >= 2
+            ],
+            "window_dwell_seconds": dict(window_dwell.most_common(top)),
+            "analysis": self.stats
+        }
+
+    def run(self, session_ids: List[str] = None, report_file="data/cross_session_report.json") -> Dict:
+        results = self.analyze_sessions(session_ids)
+        report = self.merge_results(results)
+
+        if report_file:
+            Path(report_file).parent.mkdir(parents=True, exist_ok=True)
+            with open(report_file, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            logger.info("Cross-session report saved to %s", report_file)
+
+        return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print("Batch Analyzer Test")
+
+    batch = BatchAnalyzer()
+    for attempt in ("cold", "warm"):
+        report = batch.run()
+        print(f"{attempt}: {batch.stats['sessions']} sessions "
+              f"({batch.stats['cached']} cached, {batch.stats['analyzed']} analyzed) "
+              f"in {batch.stats['seconds']}s")
+
+    for sequence in report["recurring_sequences"][:5]:
+        print(f"  {sequence['sequence']} ({sequence['sessions']} sessions)")
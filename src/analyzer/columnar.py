@@ -0,0 +1,285 @@
+from typing import List, Dict
+import numpy as np
+
+# Default inter-event gap histogram edges, in seconds
+GAP_BINS = [0, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300, np.inf]
+
+class SessionColumns:
+    """Columnar view of a session's events for vectorized statistics.
+
+    Timestamps are int64 microseconds of the recorded (naive, local) event
+    times; window, event type and element (clicked element or key) are
+    stored as integer codes into vocab lists. Rows are sorted by time.
+    """
+
+    def __init__(self, timestamps, window_codes, type_codes, element_codes,
+                 windows, types, elements):
+        self.timestamps = timestamps
+        self.window_codes = window_codes
+        self.type_codes = type_codes
+        self.element_codes = element_codes
+
+        self.windows = windows
+        self.types = types
+        self.elements = elements
+
+    @staticmethod
+    def _encode(values, n):
+        vocab = {}
+        codes = np.fromiter(
+            (vocab.setdefault(v, len(vocab)) for v in values),
+            dtype=np.int32,
+            count=n
+        )
+        return codes, list(vocab)
+
+    @staticmethod
+    def _parse_timestamps(values: List) -> np.ndarray:
+        """ISO timestamps as int64 microseconds, with NaT for any that don't parse"""
+        try:
+            # numpy parses the whole column at once...
+            parsed = np.array(values, dtype="datetime64[us]")
+        except (ValueError, TypeError):
+            # ...but a single bad value fails all of it, so fall back to one at a time
+            parsed = np.empty(len(values), dtype="datetime64[us]")
+            for i, value in enumerate(values):
+                try:
+                    parsed[i] = np.datetime64(value, "us")
+                except (ValueError, TypeError):
+                    parsed[i] = np.datetime64("NaT")
+        return parsed.view(np.int64)
+
+    @classmethod
+    def from_events(cls, events: List[Dict], window_key=None) -> "SessionColumns":
+        """Build columns from event dicts; `window_key` optionally maps titles to group keys"""
+        n = len(events)
+
+        # Missing or malformed timestamps become NaT and are dropped
+        timestamps = cls._parse_timestamps([e.get("timestamp") or "NaT" for e in events])
+
+        titles = (e.get("window") or "Unknown" for e in events)
+        if window_key is not None:
+            titles = map(window_key, titles)
+        window_codes, windows = cls._encode(titles, n)
+        type_codes, types = cls._encode((e.get("type") or "event" for e in events), n)
+        element_codes, elements = cls._encode(
+            (e.get("clicked_element") or e.get("key") or "" for e in events),
+            n
+        )
+
+        valid = timestamps != np.iinfo(np.int64).min
+        order = np.argsort(timestamps[valid], kind="stable")
+        return cls(
+            timestamps[valid][order],
+            window_codes[valid][order],
+            type_codes[valid][order],
+            element_codes[valid][order],
+            windows,
+            types,
+            elements
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _type_mask(self, event_type):
+        if event_type not in self.types:
+            return np.zeros(len(self), dtype=bool)
+        return self.type_codes == self.types.index(event_type)
+
+    def shortcut_mask(self):
+        """Rows that are key presses with modifiers (e.g. "Ctrl + c")"""
+        is_shortcut = np.array(["+" in e for e in self.elements], dtype=bool)
+        if not len(is_shortcut):
+            return np.zeros(len(self), dtype=bool)
+        return self._type_mask("key_press") & is_shortcut[self.element_codes]
+
+    def gaps(self):
+        """Seconds between consecutive events"""
+        return np.diff(self.timestamps)/1e6
+
+    def duration(self):
+        if len(self) < 2:
+            return 0.0
+        return (self.timestamps[-1] - self.timestamps[0])/1e6
+
+    def window_stats(self, idle_threshold=60) -> List[Dict]:
+        """Per-window event counts, dwell time and action rate, busiest first.
+
+        Dwell time gives each window the time until the next event, with gaps
+        longer than `idle_threshold` not counted.
+        """
+        n_windows = len(self.windows)
+        counts = np.bincount(self.window_codes, minlength=n_windows)
+        clicks = np.bincount(self.window_codes, weights=self._type_mask("mouse_click"), minlength=n_windows)
+        keys = np.bincount(self.window_codes, weights=self._type_mask("key_press"), minlength=n_windows)
+        shortcuts = np.bincount(self.window_codes, weights=self.shortcut_mask(), minlength=n_windows)
+
+        dwell = np.zeros(n_windows)
+        if len(self) > 1:
+            gaps = self.gaps()
+            dwell = np.bincount(
+                self.window_codes[:-1],
+                weights=np.where(gaps > idle_threshold, 0, gaps),
+                minlength=n_windows
+            )
+
+        stats = []
+        for code in np.argsort(-counts, kind="stable"):
+            if counts[code] == 0:
+                continue
+            minutes = dwell[code]/60
+            stats.append({
+                "window": self.windows[code],
+                "events": int(counts[code]),
+                "clicks": int(clicks[code]),
+                "keys": int(keys[code]),
+                "shortcuts": int(shortcuts[code]),
+                "dwell_seconds": round(float(dwell[code]), 2),
+                "actions_per_minute": round(float(counts[code]/minutes), 1) if minutes > 0 else None
+            })
+        return stats
+
+    def gap_histogram(self, bins=None):
+        """(counts, edges) histogram of inter-event gaps in seconds"""
+        counts, edges = np.histogram(self.gaps(), bins=GAP_BINS if bins is None else bins)
+        return counts, edges
+
+    def action_rate(self, bucket_seconds=60):
+        """Events per bucket from the first event on"""
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        buckets = (self.timestamps - self.timestamps[0])//int(bucket_seconds*1e6)
+        return np.bincount(buckets)
+
+    def idle_periods(self, threshold=60) -> List[Dict]:
+        """Gaps longer than `threshold` seconds"""
+        gaps = self.gaps()
+        idle = np.flatnonzero(gaps > threshold)
+        return [
+            {
+                "start": int(self.timestamps[i]),
+                "end": int(self.timestamps[i + 1]),
+                "seconds": round(float(gaps[i]), 2)
+            }
+            for i in idle
+        ]
+
+    def bursts(self, window_seconds=5, min_events=20) -> List[Dict]:
+        """Stretches where at least `min_events` events fall within `window_seconds`.
+
+        Overlapping windows are merged; each burst reports its dominant window.
+        """
+        if len(self) < min_events:
+            return []
+
+        span = int(window_seconds*1e6)
+        ends = np.searchsorted(self.timestamps, self.timestamps + span, side="right")
+        starts = np.flatnonzero(ends - np.arange(len(self)) >= min_events)
+        if not len(starts):
+            return []
+
+        # Merge windows that overlap into runs of [first, last) row indexes
+        run_ends = ends[starts]
+        breaks = np.flatnonzero(starts[1:] >= np.maximum.accumulate(run_ends)[:-1]) + 1
+        run_first = starts[np.r_[0, breaks]]
+        run_last = np.maximum.reduceat(run_ends, np.r_[0, breaks])
+
+        bursts = []
+        for first, last in zip(run_first, run_last):
+            window_counts = np.bincount(self.window_codes[first:last])
+            bursts.append({
+                "start": int(self.timestamps[first]),
+                "end": int(self.timestamps[last - 1]),
+                "events": int(last - first),
+                "window": self.windows[int(np.argmax(window_counts))]
+            })
+        return bursts
+
+    def shortcut_usage(self) -> Dict[str, Dict[str, int]]:
+        """Shortcut counts per window"""
+        mask = self.shortcut_mask()
+        pairs = self.window_codes[mask].astype(np.int64)*len(self.elements) + self.element_codes[mask]
+        values, counts = np.unique(pairs, return_counts=True)
+
+        usage = {}
+        for value, count in zip(values, counts):
+            window = self.windows[value//len(self.elements)]
+            usage.setdefault(window, {})[self.elements[value % len(self.elements)]] = int(count)
+        return usage
+
+    def summary(self, idle_threshold=60, top_windows=5) -> Dict:
+        """Headline statistics for reports and the LLM prompt"""
+        gaps = self.gaps()
+        return {
+            "events": len(self),
+            "duration_seconds": round(self.duration(), 1),
+            "median_gap_seconds": round(float(np.median(gaps)), 2) if len(gaps) else None,
+            "idle_periods": len(self.idle_periods(idle_threshold)),
+            "idle_seconds": round(float(gaps[gaps > idle_threshold].sum()), 1) if len(gaps) else 0.0,
+            "bursts": len(self.bursts()),
+            "windows": self.window_stats(idle_threshold)[:top_windows],
+            "shortcuts": self.shortcut_usage()
+        }
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from datetime import datetime, timedelta
+
+    print("Columnar Analytics Benchmark")
+
+    random.seed(0)
+    windows = [f"App {i}" for i in range(50)]
+    keys = ["a", "b", "Ctrl + c", "Ctrl + v", "enter"]
+
+    n = 1_000_000
+    t = datetime(2026, 1, 1)
+    events = []
+    for _ in range(n):
+        t += timedelta(seconds=random.expovariate(4))
+        event_type = random.choice(["mouse_click", "key_press", "key_press"])
+        event = {"timestamp": t.isoformat(), "type": event_type, "window": random.choice(windows)}
+        if event_type == "key_press":
+            event["key"] = random.choice(keys)
+        else:
+            event["clicked_element"] = "OK"
+        events.append(event)
+
+    start = time.perf_counter()
+    columns = SessionColumns.from_events(events)
+    print(f"Built columns for {n} events in {time.perf_counter() - start:.2f}s")
+
+    events[n//2]["timestamp"] = "garbage"
+    start = time.perf_counter()
+    fallback = SessionColumns.from_events(events)
+    print(f"Built columns with one malformed timestamp in {time.perf_counter() - start:.2f}s "
+          f"({n - len(fallback)} event dropped)")
+    del events, fallback
+
+    def aggregate(columns):
+        start = time.perf_counter()
+        columns.window_stats()
+        columns.gap_histogram()
+        columns.idle_periods(5)
+        columns.bursts(5, 40)
+        columns.shortcut_usage()
+        return (time.perf_counter() - start)*1000
+
+    print(f"Aggregations over {n} events in {aggregate(columns):.0f} ms")
+
+    # 10M event dicts would need several GB of Python objects, so the larger
+    # session is generated as columns directly
+    rng = np.random.default_rng(0)
+    n = 10_000_000
+    columns = SessionColumns(
+        np.cumsum(rng.exponential(250_000, n)).astype(np.int64) + columns.timestamps[0],
+        rng.integers(0, len(windows), n, dtype=np.int32),
+        rng.choice(np.array([0, 1, 1], dtype=np.int32), n),
+        rng.integers(0, len(keys) + 1, n, dtype=np.int32),
+        windows,
+        ["mouse_click", "key_press"],
+        keys + ["OK"]
+    )
+    print(f"Aggregations over {n} events in {aggregate(columns):.0f} ms")
@@ -0,0 +1,209 @@
+from typing import List, Dict, Sequence
+import numpy as np
+
+class SequenceMiner:
+    """Find repeated multi-step action sequences in a token stream.
+
+    Builds a suffix array (prefix doubling) and LCP array (Kasai) over the
+    token ids, then walks the LCP intervals: every interval is a sequence that
+    occurs at all suffixes inside it. Only sequences that are maximal (can't be
+    extended left or right without losing occurrences) are reported.
+    """
+
+    def __init__(self, min_support=3, min_length=2, max_length=8, max_results=20):
+        self.min_support = min_support
+        self.min_length = min_length
+        self.max_length = max_length
+        self.max_results = max_results
+
+    def _encode(self, tokens):
+        vocab = {}
+        ids = np.fromiter(
+            (vocab.setdefault(t, len(vocab)) for t in tokens),
+            dtype=np.int64,
+            count=len(tokens)
+        )
+        return ids
+
+    def _suffix_array(self, ids):
+        n = len(ids)
+        rank = ids.copy()
+        k = 1
+        while True:
+            second = np.full(n, -1, dtype=np.int64)
+            second[:n - k] = rank[k:]
+            sa = np.lexsort((second, rank))
+
+            first_sorted = rank[sa]
+            second_sorted = second[sa]
+            changed = np.empty(n, dtype=bool)
+            changed[0] = False
+            changed[1:] = (first_sorted[1:] != first_sorted[:-1]) | (second_sorted[1:] != second_sorted[:-1])
+
+            new_rank = np.empty(n, dtype=np.int64)
+            new_rank[sa] = np.cumsum(changed)
+            rank = new_rank
+
+            if rank.max() == n - 1 or k >= n:
+                return sa, rank
+            k *= 2
+
+    def _lcp(self, ids, sa, rank):
+        """Kasai's algorithm, with LCPs capped at max_length.
+
+        Capping keeps h a valid lower bound for the next suffix, so the scan
+        stays linear while never comparing more than max_length tokens.
+        """
+        n = len(ids)
+        tokens = ids.tolist()
+        sa_list = sa.tolist()
+        rank_list = rank.tolist()
+        cap = self.max_length
+
+        lcp = [0]*n
+        h = 0
+        for i in range(n):
+            r = rank_list[i]
+            if r == 0:
+                h = 0
+                continue
+            j = sa_list[r - 1]
+            while h < cap and i + h < n and j + h < n and tokens[i + h] == tokens[j + h]:
+                h += 1
+            lcp[r] = h
+            if h > 0:
+                h -= 1
+        return lcp
+
+    def _lcp_intervals(self, lcp):
+        """Yield (length, lb, rb) for every LCP interval with length >= min_length"""
+        n = len(lcp)
+        stack = [(0, 0)]  # (lcp value, left bound)
+        for i in range(1, n + 1):
+            current = lcp[i] if i < n else 0
+            lb = i - 1
+            while current < stack[-1][0]:
+                value, lb = stack.pop()
+                if value >= self.min_length:
+                    yield value, lb, i - 1
+            if current > stack[-1][0]:
+                stack.append((current, lb))
+
+    @staticmethod
+    def _non_overlapping(positions, length):
+        """Greedy count of occurrences that don't overlap each other"""
+        kept = []
+        last_end = -1
+        for pos in positions:
+            if pos >= last_end:
+                kept.append(pos)
+                last_end = pos + length
+        return kept
+
+    @staticmethod
+    def _is_periodic(sequence):
+        """True for a shorter unit repeated back to back, e.g. (a, b, a, b)"""
+        length = len(sequence)
+        for period in range(1, length//2 + 1):
+            if length % period == 0 and sequence == sequence[:period]*(length//period):
+                return True
+        return False
+
+    def mine(self, tokens: Sequence[str]) -> List[Dict]:
+        """Return repeated sequences as dicts with sequence, length, support and occurrences.
+
+        `occurrences` are start indexes into `tokens`; `support` counts
+        non-overlapping occurrences. Results are ordered by how many tokens
+        they cover.
+        """
+        n = len(tokens)
+        if n < self.min_length*self.min_support:
+            return []
+
+        ids = self._encode(tokens)
+        sa, rank = self._suffix_array(ids)
+        lcp = self._lcp(ids, sa, rank)
+
+        found = {}
+        for length, lb, rb in self._lcp_intervals(lcp):
+            if rb - lb + 1 < self.min_support:
+                continue
+
+            positions = np.sort(sa[lb:rb + 1])
+
+            # Left-maximal check: if every occurrence is preceded by the same
+            # token, the longer sequence covers this one - unless extending it
+            # would make the occurrences overlap or exceed max_length
+            if positions[0] > 0 and length < self.max_length:
+                previous = ids[positions - 1]
+                if (previous == previous[0]).all():
+                    extended = self._non_overlapping((positions - 1).tolist(), length + 1)
+                    if len(extended) >= self.min_support:
+                        continue
+
+            # Tandem repeats ("a b a b a b") overlap themselves; shorten the
+            # sequence until enough occurrences are disjoint
+            positions = positions.tolist()
+            occurrences = []
+            while length >= self.min_length:
+                occurrences = self._non_overlapping(positions, length)
+                if len(occurrences) >= self.min_support:
+                    break
+                length -= 1
+            if length < self.min_length:
+                continue
+
+            start = occurrences[0]
+            sequence = tuple(tokens[start:start + length])
+            if self._is_periodic(sequence):
+                # The repeated unit is reported on its own
+                continue
+
+            known = found.get(sequence)
+            if known is None or known["support"] < len(occurrences):
+                found[sequence] = {
+                    "sequence": list(sequence),
+                    "length": length,
+                    "support": len(occurrences),
+                    "occurrences": occurrences
+                }
+
+        results = sorted(
+            found.values(),
+            key=lambda r: (r["length"]*r["support"], r["length"]),
+            reverse=True
+        )
+        return results[:self.max_results]
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    print("Sequence Miner Benchmark")
+
+    random.seed(0)
+    windows = [f"App {i}" for i in range(8)]
+    noise = [f"{w}: {a}" for w in windows for a in ("click", "typing", "Ctrl + c", "Ctrl + v", "enter")]
+    workflows = [
+        ["Excel: Export", "Excel: typing", "Excel: Ctrl + s"],
+        ["CRM: Search", "CRM: typing", "CRM: Ctrl + c", "Ticket: Ctrl + v", "Ticket: Submit"],
+    ]
+
+    for size in (10_000, 100_000):
+        tokens = []
+        while len(tokens) < size:
+            if random.random() < 0.05:
+                tokens.extend(random.choice(workflows))
+            else:
+                tokens.append(random.choice(noise))
+        tokens = tokens[:size]
+
+        miner = SequenceMiner(min_support=3, min_length=3)
+        start = time.perf_counter()
+        results = miner.mine(tokens)
+        elapsed = time.perf_counter() - start
+
+        print(f"{size} tokens: {len(results)} sequences in {elapsed*1000:.0f} ms")
+        for r in results[:3]:
+            print(f"  {' -> '.join(r['sequence'])} (support {r['support']})")
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sketches (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    start INTEGER,
+    end INTEGER,
+    start_time TEXT,
+    preview TEXT,
+    signature BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sketches_session ON sketches(session_id);
+
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    sketch_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_buckets_band_key ON buckets(band, key);
+CREATE INDEX IF NOT EXISTS idx_buckets_sketch ON buckets(sketch_id);
+"""
+
+# Modulus of the universal hash family
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+def _hash64(data: bytes) -> int:
+    """Stable across processes, unlike hash(); fits a signed SQLite integer"""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little") >> 1
+
+def gram_hashes(tokens: List[str], n=3) -> np.ndarray:
+    """32-bit hash of the action n-gram starting at each position"""
+    if len(tokens) < n:
+        grams = [" -> ".join(tokens)] if tokens else []
+    else:
+        grams = [" -> ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+    return np.array([_hash64(g.encode("utf-8")) & MAX_HASH for g in grams], dtype=np.uint64)
+
+def shingles(tokens: List[str], n=3) -> np.ndarray:
+    """Distinct n-gram hashes of a token sequence"""
+    return np.unique(gram_hashes(tokens, n))
+
+class MinHasher:
+    """MinHash signatures of shingle sets; equal rows estimate Jaccard similarity"""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.RandomState(seed)
+        # a*x + b stays below 2**64 for 32-bit a, b and x
+        self.a = rng.randint(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        if not len(hashes):
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        values = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME
+        return (values.min(axis=0) & MAX_HASH).astype(np.uint32)
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        return float(np.mean(sig_a == sig_b))
+
+
+class SimilarityIndex:
+    """On-disk LSH index of MinHash sketches of past workflows.
+
+    Every session is stored as a whole-session sketch plus one sketch per
+    sliding window of action tokens. Signatures are split into bands; two
+    sketches become candidates when any band is identical, so a query only
+    looks at the buckets it hashes to instead of every stored workflow.
+    """
+
+    def __init__(self, db_path="data/cache/similarity.db", num_perm=128, bands=32,
+                 shingle_size=3, window=20, stride=10):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm//bands
+        self.shingle_size = shingle_size
+        self.window = window
+        self.stride = stride
+
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [
+            _hash64(signature[i*self.rows:(i + 1)*self.rows].tobytes())
+            for i in range(self.bands)
+        ]
+
+    def sketch(self, tokens: List[str]) -> np.ndarray:
+        return self.hasher.signature(shingles(tokens, self.shingle_size))
+
+    def _windows(self, tokens):
+        """(start, end) token ranges of the sliding windows"""
+        if len(tokens) <= self.window:
+            return [(0, len(tokens))] if tokens else []
+        starts = range(0, len(tokens) - self.window + 1, self.stride)
+        return [(s, s + self.window) for s in starts]
+
+    def has_session(self, session_id) -> bool:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT 1 FROM sketches WHERE session_id = ? LIMIT 1", (session_id,)
+            ).fetchone() is not None
+
+    def add_session(self, session_id, tokens: List[str], timestamps: List[str] = None):
+        """Index a session and its sliding windows, replacing an earlier version of it"""
+        entries = [("session", 0, len(tokens))]
+        if len(tokens) > self.window:
+            entries += [("window", s, e) for s, e in self._windows(tokens)]
+
+        # Hash the n-grams once; each window's shingles are a slice of them
+        hashes = gram_hashes(tokens, self.shingle_size)
+
+        with self._lock:
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM buckets WHERE sketch_id IN (SELECT id FROM sketches WHERE session_id = ?)",
+                    (session_id,)
+                )
+                self.conn.execute("DELETE FROM sketches WHERE session_id = ?", (session_id,))
+
+                for kind, start, end in entries:
+                    if len(tokens) < self.shingle_size:
+                        window_hashes = hashes
+                    else:
+                        window_hashes = hashes[start:end - self.shingle_size + 1]
+                    signature = self.hasher.signature(np.unique(window_hashes))
+                    cursor = self.conn.execute(
+                        "INSERT INTO sketches (session_id, kind, start, end, start_time, preview, signature) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            session_id, kind, start, end,
+                            timestamps[start] if timestamps and start < len(timestamps) else None,
+                            json.dumps(tokens[start:start + 6]),
+                            signature.tobytes()
+                        )
+                    )
+                    self.conn.executemany(
+                        "INSERT INTO buckets (band, key, sketch_id) VALUES (?, ?, ?)",
+                        [(band, key, cursor.lastrowid) for band, key in enumerate(self._band_keys(signature))]
+                    )
+        return len(entries)
+
+    def query(self, tokens: List[str], threshold=0.5, exclude_session=None, limit=10) -> List[Dict]:
+        """Stored sketches similar to `tokens`, most similar first"""
+        signature = self.sketch(tokens)
+
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                rows = self.conn.execute(
+                    "SELECT sketch_id FROM buckets WHERE band = ? AND key = ?", (band, key)
+                ).fetchall()
+                candidates.update(row["sketch_id"] for row in rows)
+            if not candidates:
+                return []
+
+            placeholders = ",".join("?"*len(candidates))
+            rows = self.conn.execute(
+                f"SELECT * FROM sketches WHERE id IN ({placeholders})", list(candidates)
+            ).fetchall()
+
+        matches = []
+        for row in rows:
+            if row["session_id"] == exclude_session:
+                continue
+            similarity = self.hasher.similarity(signature, np.frombuffer(row["signature"], dtype=np.uint32))
+            if similarity >= threshold:
+                matches.append({
+                    "session_id": row["session_id"],
+                    "kind": row["kind"],
+                    "start": row["start"],
+                    "end": row["end"],
+                    "start_time": row["start_time"],
+                    "preview": json.loads(row["preview"]),
+                    "similarity": round(similarity, 2)
+                })
+
+        matches.sort(key=lambda m: -m["similarity"])
+        return matches[:limit]
+
+    def query_session(self, tokens: List[str], threshold=0.5, exclude_session=None, limit=5) -> List[Dict]:
+        """Past workflows similar to any window of a session, best match per past session first"""
+        best = {}
+        for start, end in self._windows(tokens):
+            for match in self.query(tokens[start:end], threshold, exclude_session):
+                current = best.get(match["session_id"])
+                if current is None or match["similarity"] > current["similarity"]:
+                    best[match["session_id"]] = {**match, "query_start": start, "query_end": end}
+
+        return sorted(best.values(), key=lambda m: -m["similarity"])[:limit]
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    import time
+
+    print("Similarity Index Benchmark")
+
+    random.seed(0)
+    vocabulary = [f"App {i % 30}: action {i}" for i in range(400)]
+    routine = [f"CRM: step {i}" for i in range(12)]
+
+    def make_session(with_routine):
+        tokens = [random.choice(vocabulary) for _ in range(300)]
+        if with_routine:
+            at = random.randrange(len(tokens))
+            tokens[at:at] = routine
+        return tokens
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SimilarityIndex(Path(tmp)/"similarity.db")
+
+        start = time.perf_counter()
+        for session in range(500):
+            index.add_session(f"session_{session}", make_session(session % 50 == 0))
+        print(f"Indexed 500 sessions in {time.perf_counter() - start:.2f}s")
+
+        query = make_session(True)
+        start = time.perf_counter()
+        matches = index.query_session(query)
+        print(f"Query over {len(index._windows(query))} windows in "
+              f"{(time.perf_counter() - start)*1000:.0f} ms: "
+              f"{[(m['session_id'], m['similarity']) for m in matches]}")
+
+        index.close()
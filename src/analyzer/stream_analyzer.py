@@ -0,0 +1,178 @@
+import threading
+from collections import Counter
+from typing import Dict, List
+
+class StreamingAnalyzer:
+    """Build workflow steps and pattern counters incrementally as events are logged.
+
+    Feed it with `consume` (e.g. as an EventTracker listener). It applies the
+    same key-run coalescing as ActivityAnalyzer._analyze_workflow_steps, one
+    event at a time, so the session is already analyzed when recording stops.
+    """
+
+    def __init__(self, analyzer, min_repeats=3):
+        # ActivityAnalyzer providing the summary and action token helpers
+        self.analyzer = analyzer
+        self.min_repeats = min_repeats
+
+        self._lock = threading.Lock()
+
+        self.events = []
+        self.steps = []
+
+        # Open key run: the step is already in self.steps and grows in place
+        self._pending_step = None
+        self._pending_window = None
+        self._pending_dirty = False
+
+        self.action_counts = Counter()
+        self.window_counts = Counter()
+        self.apps = set()
+        self.suggestions = []
+        self.template_matches = []
+        self._multi_app_reported = False
+
+    def _flush_pending_keys(self):
+        step = self._pending_step
+        if step is None:
+            return
+        self._refresh_pending_summary()
+        self._pending_step = None
+
+    def _refresh_pending_summary(self):
+        step = self._pending_step
+        if step is not None and self._pending_dirty:
+            step['summary'] = f"Typed: {' '.join(step['keys'])} in {step['window']}"
+            self._pending_dirty = False
+
+    def _start_key_run(self, event, window):
+        step = {
+            'timestamp': event.get("timestamp"),
+            'window': window or "Unknown window",
+            'action_type': 'key_press',
+            'keys': [],
+            'summary': "",
+            'event_ids': []
+        }
+        element = event.get("element")
+        if element:
+            step['element'] = element
+
+        self.steps.append(step)
+        self._pending_step = step
+        self._pending_window = window
+
+    def _add_step(self, event, event_id):
+        action_type = event.get("type")
+        window = event.get("window")
+
+        if action_type != "key_press":
+            self._flush_pending_keys()
+
+        if action_type == "mouse_click":
+            element_info = event.get("element") or {}
+            label = event.get("clicked_element") or element_info.get("name")
+            self.steps.append({
+                'timestamp': event.get("timestamp"),
+                'window': window,
+                'action_type': 'mouse_click',
+                'click': {
+                    "location": {"x": event.get("x"), "y": event.get("y")},
+                    "label": label,
+                    "element": element_info
+                },
+                'summary': self.analyzer._build_click_summary(event, label, element_info),
+                'event_ids': [event_id]
+            })
+
+        elif action_type == "key_press":
+            key = event.get("key")
+            if not key:
+                return
+            if self._pending_step is None:
+                self._start_key_run(event, window)
+            elif window != self._pending_window:
+                self._flush_pending_keys()
+                self._start_key_run(event, window)
+
+            self._pending_step['keys'].append(key)
+            self._pending_step['event_ids'].append(event_id)
+            self._pending_dirty = True
+        else:
+            self.steps.append({
+                'timestamp': event.get("timestamp"),
+                'window': window,
+                'action_type': action_type,
+                'summary': f"{action_type or 'event'} recorded",
+                'event_ids': [event_id]
+            })
+
+    def _update_patterns(self, event):
+        normalizer = self.analyzer.normalizer
+        window = event.get('window')
+        if window and window != 'Unknown':
+            self.window_counts[normalizer.key(window)] += 1
+            self.apps.add(normalizer.app(window))
+
+            if not self._multi_app_reported and len(self.apps) >= 2:
+                self._multi_app_reported = True
+                self.suggestions.append(
+                    "Detected workflow spanning multiple apps. "
+                    "Data flow between these applications can be automated."
+                )
+
+        token = self.analyzer._action_token(event)
+        if token is None:
+            return
+
+        self.action_counts[token] += 1
+        if self.action_counts[token] == self.min_repeats:
+            window, detail = token.split(':', 1)
+            self.suggestions.append(
+                f"Detected repetitive action: {window} - {detail} "
+                f"({self.min_repeats}+ times). This can be automated."
+            )
+
+    def consume(self, event: Dict):
+        """Add one logged event. Safe to call from the listener threads."""
+        with self._lock:
+            # Steps reference events by their position in the session
+            event_id = len(self.events)
+            self.events.append(event)
+            self._add_step(event, event_id)
+            self._update_patterns(event)
+
+    def add_match(self, match: Dict):
+        """Record a TemplateMatcher match. Use as the matcher's listener."""
+        with self._lock:
+            self.template_matches.append(match)
+            self.suggestions.append(
+                f"Performed known workflow '{match['template']}' ({match['actions']} actions). "
+                "It can be run automatically."
+            )
+
+    def get_steps(self) -> List[Dict]:
+        """Workflow steps so far, with the open key run's summary brought up to date"""
+        with self._lock:
+            self._refresh_pending_summary()
+            return self.steps
+
+    def snapshot(self) -> Dict:
+        """Current state of the analysis.
+
+        Nothing is copied, so this is cheap to call at any moment; the lists
+        and counters are live views that keep growing and must not be modified.
+        """
+        with self._lock:
+            self._refresh_pending_summary()
+            return {
+                "total_events": len(self.events),
+                "total_steps": len(self.steps),
+                "last_event_time": self.events[-1].get("timestamp") if self.events else None,
+                "events": self.events,
+                "workflow_steps": self.steps,
+                "action_counts": self.action_counts,
+                "window_counts": self.window_counts,
+                "suggestions": self.suggestions,
+                "template_matches": self.template_matches
+            }
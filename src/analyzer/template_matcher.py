@@ -0,0 +1,275 @@
+import json
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Template step that matches any number of actions
+GAP = "*"
+
+class TemplateMatcher:
+    """Recognize registered workflow templates in the live action stream.
+
+    A template is a list of action tokens ("Window: action", as produced by
+    ActivityAnalyzer._action_token) where "*" allows any actions in between,
+    e.g. ["CRM - Google Chrome: Search", "*", "Ctrl + c", "*", "Ticket - Jira: Ctrl + v"].
+    Gap-free segments of all templates are compiled into one Aho–Corasick
+    automaton, so each event costs O(1) amortized plus the number of segments
+    ending at it, however many templates are registered.
+    """
+
+    def __init__(self, analyzer, max_span=200):
+        # ActivityAnalyzer providing _action_token; its normalizer is used for templates
+        self.analyzer = analyzer
+        self.normalizer = analyzer.normalizer
+        # Default limit on the number of actions a single match may span
+        self.max_span = max_span
+
+        self._lock = threading.Lock()
+        self.templates = []
+        self.listeners = []
+        self.matches = []
+        self._compiled = False
+        self.reset()
+
+    def add_listener(self, callback):
+        """Register a callback receiving each match dict"""
+        self.listeners.append(callback)
+
+    def _normalize_step(self, step) -> str:
+        """Normalize the window part of a template step so it compares equal to live tokens"""
+        if ": " not in step:
+            return step
+        window, action = step.rsplit(": ", 1)
+        return f"{self.normalizer.key(window)}: {action}"
+
+    def add_template(self, name, steps: List[str], max_span=None):
+        segments = [[]]
+        for step in steps:
+            if step == GAP:
+                if segments[-1]:
+                    segments.append([])
+            else:
+                segments[-1].append(self._normalize_step(step))
+        segments = [s for s in segments if s]
+        if not segments:
+            raise ValueError(f"Template '{name}' has no steps")
+
+        with self._lock:
+            self.templates.append({
+                "name": name,
+                "steps": list(steps),
+                "segments": segments,
+                "max_span": max_span or self.max_span
+            })
+            self._compiled = False
+
+    def load_templates(self, path="data/templates/workflows.json"):
+        """Load templates from a JSON list of {"name", "steps", "max_span"} objects"""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            templates = json.load(f)
+        for template in templates:
+            self.add_template(template["name"], template["steps"], template.get("max_span"))
+        return len(templates)
+
+    def _compile(self):
+        """Build the automaton: goto trie, failure links and merged outputs"""
+        self._symbols = {}
+        self._goto = [{}]
+        outputs = [[]]
+
+        for template_id, template in enumerate(self.templates):
+            for segment_id, segment in enumerate(template["segments"]):
+                state = 0
+                for token in segment:
+                    symbol = self._symbols.setdefault(token, len(self._symbols))
+                    next_state = self._goto[state].get(symbol)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][symbol] = next_state
+                        self._goto.append({})
+                        outputs.append([])
+                    state = next_state
+                outputs[state].append((template_id, segment_id, len(segment)))
+
+        # Breadth-first failure links; each state inherits its fallback's outputs
+        self._fail = [0]*len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and symbol not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(symbol, 0)
+                outputs[child] = outputs[child] + outputs[self._fail[child]]
+                queue.append(child)
+
+        # First segments last, so a token can advance a match before restarting one
+        self._outputs = [tuple(sorted(o, key=lambda output: output[1] == 0)) for o in outputs]
+        self._compiled = True
+
+    def reset(self):
+        """Forget partial matches, e.g. when a new session starts"""
+        self._state = 0
+        self._position = 0
+        self._event_count = 0
+        self._last_token = None
+        # template id -> (next segment, position of the first action, event index of the first action)
+        self._progress = {}
+
+    def _token(self, event):
+        """Same tokens as ActivityAnalyzer._action_sequence: plain typing collapses per window"""
+        token = self.analyzer._action_token(event)
+        if token is None:
+            return None
+
+        key = event.get('key', '')
+        if event.get('type') == 'key_press' and '+' not in key:
+            token = f"{self.normalizer.key(event.get('window'))}: typing"
+        return token
+
+    def _step(self, symbol):
+        state = self._state
+        while state and symbol not in self._goto[state]:
+            state = self._fail[state]
+        self._state = self._goto[state].get(symbol, 0)
+        return self._outputs[self._state]
+
+    def consume(self, event: Dict, event_index=None):
+        """Advance the automaton by one logged event. Safe to use as an EventTracker listener.
+
+        Without `event_index`, events are numbered in the order they are consumed,
+        which matches the event ids of a StreamingAnalyzer fed by the same tracker.
+        """
+        found = []
+        with self._lock:
+            if not self._compiled:
+                self._compile()
+
+            if event_index is None:
+                event_index = self._event_count
+            self._event_count += 1
+
+            token = self._token(event)
+            if token is None:
+                return found
+            if token.endswith(": typing") and token == self._last_token:
+                return found
+            self._last_token = token
+
+            position = self._position
+            self._position += 1
+
+            symbol = self._symbols.get(token)
+            if symbol is None:
+                # Not part of any template: the automaton restarts at the root
+                self._state = 0
+                return found
+
+            # Later segments advance from the progress before this event, so a token
+            # that ends one and also starts the template again ("A * A") does both
+            before = {}
+            for template_id, segment_id, length in self._step(symbol):
+                template = self.templates[template_id]
+                start = position - length + 1
+                if template_id not in before:
+                    before[template_id] = self._progress.get(template_id)
+                progress = before[template_id] if segment_id else self._progress.get(template_id)
+
+                if progress is not None and position - progress[1] > template["max_span"]:
+                    progress = None
+                    before[template_id] = None
+                    self._progress.pop(template_id, None)
+
+                if segment_id == 0:
+                    # Restart from the latest first segment unless later segments already matched
+                    if progress is None or progress[0] == 1:
+                        progress = (1, start, event_index, position)
+                    else:
+                        continue
+                elif progress is None or progress[0] != segment_id or start <= progress[3]:
+                    continue
+                else:
+                    progress = (segment_id + 1, progress[1], progress[2], position)
+
+                if progress[0] == len(template["segments"]):
+                    self._progress.pop(template_id, None)
+                    found.append({
+                        "template": template["name"],
+                        "timestamp": event.get("timestamp"),
+                        "window": event.get("window"),
+                        "actions": position - progress[1] + 1,
+                        "start_event": progress[2],
+                        "end_event": event_index
+                    })
+                else:
+                    self._progress[template_id] = progress
+
+            self.matches.extend(found)
+
+        for match in found:
+            for listener in self.listeners:
+                try:
+                    listener(match)
+                except Exception as e:
+                    logger.error("Template listener error: %s", e)
+        return found
+
+    def match_events(self, events: List[Dict]) -> List[Dict]:
+        """Run over a finished session; event indexes refer to `events`"""
+        self.reset()
+        found = []
+        for i, event in enumerate(events):
+            found.extend(self.consume(event, i))
+        return found
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from .activity_analyzer import ActivityAnalyzer
+
+    print("Template Matcher Benchmark")
+
+    crm = "Customer 4411 - CRM - Google Chrome"
+    ticket = "TICKET-{} - Jira - Google Chrome"
+    workflow = [
+        {"type": "mouse_click", "window": crm, "clicked_element": "Search"},
+        {"type": "key_press", "window": crm, "key": "4"},
+        {"type": "key_press", "window": crm, "key": "Ctrl + c"},
+        {"type": "mouse_click", "window": ticket.format(7), "clicked_element": "Comment"},
+        {"type": "key_press", "window": ticket.format(7), "key": "Ctrl + v"},
+    ]
+
+    random.seed(0)
+    noise_windows = [f"App {i}" for i in range(200)] + ["Inbox (3) - Outlook"]
+    events = []
+    for _ in range(20_000):
+        if random.random() < 0.01:
+            events.extend(dict(e) for e in workflow)
+        else:
+            events.append({"type": "mouse_click", "window": random.choice(noise_windows),
+                           "clicked_element": random.choice(["Open", "Save", "Reply", "Next"])})
+
+    for n_templates in (1, 100, 1000):
+        matcher = TemplateMatcher(ActivityAnalyzer())
+        matcher.add_template("Copy CRM id to ticket", [
+            f"{crm}: Search", "*", f"{crm}: Ctrl + c", "*", f"{ticket.format(1)}: Ctrl + v"
+        ])
+        for i in range(n_templates - 1):
+            matcher.add_template(f"Template {i}", [
+                f"App {i % 200}: Open", "*", f"App {i}: Save", f"App {i}: Close"
+            ])
+
+        start = time.perf_counter()
+        matches = matcher.match_events(events)
+        elapsed = time.perf_counter() - start
+        print(f"{n_templates} templates: {len(matches)} matches, "
+              f"{elapsed/len(events)*1e6:.2f} us/event")
@@ -0,0 +1,129 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Tuple, Any
+
+class TimeIndex:
+    """Items sorted by time, for nearest-neighbour and range lookups with bisect"""
+
+    def __init__(self, items: List[Tuple[float, Any]]):
+        items = sorted(items, key=lambda item: item[0])
+        self.times = [t for t, _ in items]
+        self.items = [item for _, item in items]
+
+    def __len__(self):
+        return len(self.times)
+
+    def nearest(self, t):
+        """(time, item) closest to t, or None if the index is empty"""
+        if not self.times:
+            return None
+        i = bisect_left(self.times, t)
+        if i == 0:
+            best = 0
+        elif i == len(self.times):
+            best = i - 1
+        else:
+            best = i if self.times[i] - t < t - self.times[i - 1] else i - 1
+        return self.times[best], self.items[best]
+
+    def between(self, t0, t1):
+        """Items with t0 <= time <= t1"""
+        return self.items[bisect_left(self.times, t0):bisect_right(self.times, t1)]
+
+
+class IntervalTree:
+    """Static centered interval tree answering "which intervals overlap [t0, t1]" in O(log m + k)"""
+
+    def __init__(self, intervals: List[Tuple[float, float, Any]]):
+        self.root = self._build(sorted(intervals, key=lambda iv: iv[0]))
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+
+        center = intervals[len(intervals)//2][0]
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+
+        return {
+            "center": center,
+            # Intervals containing the center, sorted both ways for early exits
+            "by_start": here,
+            "by_end": sorted(here, key=lambda iv: iv[1], reverse=True),
+            "left": self._build(left),
+            "right": self._build(right)
+        }
+
+    def overlapping(self, t0, t1) -> List[Any]:
+        """Items whose [start, end] overlaps [t0, t1], in no particular order"""
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+
+            center = node["center"]
+            if t1 < center:
+                # Query is left of center: intervals here overlap iff they start by t1
+                for start, end, item in node["by_start"]:
+                    if start > t1:
+                        break
+                    found.append(item)
+                stack.append(node["left"])
+            elif t0 > center:
+                # Query is right of center: intervals here overlap iff they end at/after t0
+                for start, end, item in node["by_end"]:
+                    if end < t0:
+                        break
+                    found.append(item)
+                stack.append(node["right"])
+            else:
+                # Query contains the center, so everything here overlaps
+                found.extend(item for _, _, item in node["by_start"])
+                stack.append(node["left"])
+                stack.append(node["right"])
+        return found
+
+
+def attach_context(steps: List[Dict],
+                   step_times: List[float],
+                   screenshots: List[Tuple[float, Any]],
+                   transcripts: List[Tuple[float, float, Any]],
+                   max_screenshot_distance=None) -> List[Dict]:
+    """Attach the nearest screenshot and overlapping transcripts to each workflow step.
+
+    A step spans from its own time to the next step's time. Steps without a
+    time are left untouched. Runs in O((n + m) log m).
+    """
+    screenshot_index = TimeIndex(screenshots)
+    transcript_tree = IntervalTree(transcripts)
+
+    # Each step ends where the next timed step starts
+    ends = [None]*len(step_times)
+    next_time = None
+    for i in range(len(step_times) - 1, -1, -1):
+        if step_times[i] is not None:
+            ends[i] = next_time if next_time is not None else step_times[i]
+            next_time = step_times[i]
+
+    for step, t, end in zip(steps, step_times, ends):
+        if t is None:
+            continue
+
+        nearest = screenshot_index.nearest(t)
+        if nearest is not None:
+            shot_time, shot = nearest
+            if max_screenshot_distance is None or abs(shot_time - t) <= max_screenshot_distance:
+                step["screenshot"] = shot
+
+        overlapping = transcript_tree.overlapping(t, end)
+        if overlapping:
+            step["transcripts"] = overlapping
+
+    return steps
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import re
+import sys
+from functools import lru_cache
+from typing import Tuple
+
+# Top-level domains told apart from file extensions (not .ai, .md, .py, ...),
+# and the second levels registered under a country code, as in "bbc.co.uk"
+DOMAIN_TLDS = "com|org|net|edu|gov|io|dev|app|info|biz|co|us|uk|de|fr|nl|eu|jp|ca|au|ch|se|es|it|be"
+SECOND_LEVEL_DOMAINS = "co|com|org|net|gov|ac|edu"
+
+# (name, pattern, replacement) applied in order to the document part of a title
+DEFAULT_RULES = [
+    # Unread/notification counters: "Inbox (17)", "Chat [3]"
+    ("counter", r"\s*[\(\[]\d+[\)\]]", ""),
+    # Unsaved-changes markers: "*notes.txt", "● main.py"
+    ("dirty_marker", r"^[\*●•]\s*|\s*[\*●•]$", ""),
+    # Domains keep their registrable part: "docs.github.com" -> "github.com"
+    ("subdomain", rf"^(?:[\w-]+\.)+?(?=[\w-]+\.(?:(?:{SECOND_LEVEL_DOMAINS})\.)?(?:{DOMAIN_TLDS})$)", ""),
+    # Files collapse to their type: "Report (3).xlsx" -> "*.xlsx"; domains are left alone
+    ("file", rf"^(?![\w.-]+\.(?:{DOMAIN_TLDS})$).*(?=\.[A-Za-z][A-Za-z0-9]{{0,4}}$)", "*"),
+    # Long ids and numbers: "Ticket 48213" -> "Ticket #"
+    ("number", r"\b[0-9a-fA-F]{8,}\b|\d+", "#"),
+    ("whitespace", r"\s+", " "),
+]
+
+# Rules that also apply to the application part
+APP_RULES = {"counter", "dirty_marker"}
+
+# Separators between document and application, e.g. "Doc - App", "Page — Browser"
+APP_SEPARATOR = re.compile(r"\s+[-—–|]\s+")
+
+# Different spellings of the same application
+DEFAULT_APP_ALIASES = {
+    "Microsoft Excel": "Excel",
+    "Microsoft Word": "Word",
+    "Microsoft Outlook": "Outlook",
+}
+
+class WindowNormalizer:
+    """Map window titles to an interned (application, document class) pair.
+
+    "Report (3).xlsx - Excel" and "Q4 budget.xlsx - Excel" both become
+    ("Excel", "*.xlsx"); "Inbox (17) - Outlook" becomes ("Outlook", "Inbox").
+    Results are cached per title in an LRU cache.
+    """
+
+    def __init__(self, rules=None, app_aliases=None, cache_size=4096):
+        self.rules = [
+            (name, re.compile(pattern), replacement)
+            for name, pattern, replacement in (DEFAULT_RULES if rules is None else rules)
+        ]
+        self.app_aliases = DEFAULT_APP_ALIASES if app_aliases is None else app_aliases
+
+        self._normalize_cached = lru_cache(maxsize=cache_size)(self._normalize)
+        self._key_cached = lru_cache(maxsize=cache_size)(self._key)
+
+    def _normalize(self, title) -> Tuple[str, str]:
+        title = (title or "").strip()
+        if not title:
+            return sys.intern("Unknown"), ""
+
+        parts = APP_SEPARATOR.split(title)
+        if len(parts) > 1:
+            app = parts[-1]
+            document = " - ".join(parts[:-1])
+        else:
+            # No separator: the whole title names the application
+            app, document = title, ""
+
+        # Counters and markers can sit on the app side too ("Outlook (3)")
+        for name, pattern, replacement in self.rules:
+            if name in APP_RULES:
+                app = pattern.sub(replacement, app)
+        app = self.app_aliases.get(app.strip(), app.strip())
+
+        for name, pattern, replacement in self.rules:
+            document = pattern.sub(replacement, document)
+
+        return sys.intern(app), sys.intern(document.strip())
+
+    def normalize(self, title) -> Tuple[str, str]:
+        return self._normalize_cached(title)
+
+    def _key(self, title) -> str:
+        app, document = self._normalize_cached(title)
+        return sys.intern(f"{app} ({document})" if document else app)
+
+    def key(self, title) -> str:
+        """Single interned string for a title, e.g. "Excel (*.xlsx)", for counting and comparing"""
+        return self._key_cached(title)
+
+    def app(self, title) -> str:
+        return self._normalize_cached(title)[0]
+
+    def fingerprint(self) -> str:
+        """Short hash of the rules and aliases, to tell apart results computed under other rules"""
+        config = json.dumps({
+            "rules": [(name, pattern.pattern, replacement) for name, pattern, replacement in self.rules],
+            "app_rules": sorted(APP_RULES),
+            "separator": APP_SEPARATOR.pattern,
+            "app_aliases": self.app_aliases
+        }, sort_keys=True)
+        return hashlib.sha256(config.encode("utf-8")).hexdigest()[:16]
+
+    def cache_info(self):
+        return self._normalize_cached.cache_info()
+
+
+# Shared so the analyzer and the prompt builder normalize titles the same way
+default_normalizer = WindowNormalizer()
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    print("Window Normalizer Benchmark")
+
+    normalizer = WindowNormalizer()
+    for title in ["Report (3).xlsx - Excel", "Inbox (17) - Outlook", "*notes.txt - Notepad",
+                  "Ticket 48213 | Helpdesk - Google Chrome", "docs.github.com - Google Chrome",
+                  "Program Manager", ""]:
+        print(f"  {title!r} -> {normalizer.normalize(title)} / {normalizer.key(title)!r}")
+
+    random.seed(0)
+    templates = ["Report ({}).xlsx - Excel", "Inbox ({}) - Outlook", "Ticket {} - Google Chrome",
+                 "Untitled - Notepad", "main.py - Visual Studio Code"]
+    titles = [random.choice(templates).format(random.randint(1, 500)) for _ in range(1_000_000)]
+
+    runs = [
+        ("no cache", WindowNormalizer(cache_size=0)),
+        ("cold cache", WindowNormalizer()),
+    ]
+    runs.append(("warm cache", runs[-1][1]))
+
+    for label, normalizer in runs:
+        start = time.perf_counter()
+        keys = [normalizer.key(t) for t in titles]
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {len(titles)/elapsed/1e6:.2f}M titles/s, {len(set(keys))} distinct keys "
+              f"from {len(set(titles))} titles")
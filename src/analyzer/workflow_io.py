@@ -0,0 +1,237 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator
+
+FORMAT_NAME = "workflow-ndjson"
+FORMAT_VERSION = 1
+
+# Step fields that are rebuilt from the referenced events when reading
+DERIVED_STEP_FIELDS = ("click", "keys", "element")
+
+def _encode(record):
+    return (json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+
+class WorkflowWriter:
+    """Stream a workflow to NDJSON: a header, event records, step records, then a footer.
+
+    Steps reference events by id instead of embedding their data, and nothing
+    is buffered beyond the current record. The footer holds the byte offset
+    of every event so readers can resolve references with a seek.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temp file so readers never see a half-written workflow
+        self._tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        self._file = open(self._tmp_path, "wb")
+        self._offset = 0
+
+        self.event_offsets = []
+        self.steps_offset = None
+        self.step_count = 0
+
+    def _write(self, record):
+        data = _encode(record)
+        self._file.write(data)
+        self._offset += len(data)
+
+    def write_header(self, **fields):
+        self._write({"record": "header", "format": FORMAT_NAME, "version": FORMAT_VERSION, **fields})
+
+    def write_event(self, event: Dict) -> int:
+        if self.steps_offset is not None:
+            raise ValueError("All events must be written before the first step")
+        event_id = len(self.event_offsets)
+        self.event_offsets.append(self._offset)
+        self._write({"record": "event", "id": event_id, "event": event})
+        return event_id
+
+    def write_step(self, step: Dict):
+        if self.steps_offset is None:
+            self.steps_offset = self._offset
+
+        record = {"record": "step", "id": self.step_count}
+        record.update((k, v) for k, v in step.items() if k not in DERIVED_STEP_FIELDS)
+        if step.get("action_type") == "mouse_click":
+            record["label"] = (step.get("click") or {}).get("label")
+        self._write(record)
+        self.step_count += 1
+
+    def close(self, **fields):
+        """Write the footer (summary, offsets and any extra fields) and publish the file"""
+        if self._file.closed:
+            return
+        if self.steps_offset is None:
+            self.steps_offset = self._offset
+
+        self._write({
+            "record": "footer",
+            "total_events": len(self.event_offsets),
+            "total_steps": self.step_count,
+            "steps_offset": self.steps_offset,
+            "event_offsets": self.event_offsets,
+            **fields
+        })
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            self._tmp_path.unlink(missing_ok=True)
+
+
+def write_workflow(path, header: Dict, events: Iterable[Dict], steps: Iterable[Dict], **footer):
+    """Stream a workflow from iterables of events and steps"""
+    with WorkflowWriter(path) as writer:
+        writer.write_header(**header)
+        for event in events:
+            writer.write_event(event)
+        for step in steps:
+            writer.write_step(step)
+        writer.close(**footer)
+    return Path(path)
+
+
+class StepsView:
+    """Lazy, re-iterable view of a workflow file's steps"""
+
+    def __init__(self, reader, resolve=True):
+        self.reader = reader
+        self.resolve = resolve
+
+    def __iter__(self):
+        return self.reader.iter_steps(self.resolve)
+
+    def __len__(self):
+        return self.reader.footer.get("total_steps", 0)
+
+
+class WorkflowReader:
+    """Lazy reader for workflow NDJSON files.
+
+    Only the header and footer are read up front. `get` mirrors the dict
+    returned by ActivityAnalyzer.generate_workflow_json, except that
+    "workflow_steps" and "events" are lazy iterables.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+        with open(self.path, "rb") as f:
+            self.header = json.loads(f.readline())
+        if self.header.get("format") != FORMAT_NAME:
+            raise ValueError(f"{self.path} is not a {FORMAT_NAME} file")
+
+        self.footer = json.loads(self._read_last_line())
+        self._event_offsets = self.footer.get("event_offsets", [])
+        self._file = None
+
+    def _read_last_line(self, block_size=65536):
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            position = end
+            data = b""
+            # Skip the trailing newline, then read backwards until the previous one
+            while position > 0:
+                read_size = min(block_size, position)
+                position -= read_size
+                f.seek(position)
+                data = f.read(read_size) + data
+                newline = data.rfind(b"\n", 0, len(data) - 1)
+                if newline != -1:
+                    return data[newline + 1:]
+            return data
+
+    def _handle(self):
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        return self._file
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def get(self, key, default=None):
+        if key == "workflow_steps":
+            return StepsView(self)
+        if key == "events":
+            return self.iter_events()
+        if key == "summary":
+            return {
+                **self.header.get("summary", {}),
+                "total_events": self.footer.get("total_events", 0),
+                "total_steps": self.footer.get("total_steps", 0)
+            }
+        if key in self.footer and key not in ("event_offsets", "steps_offset"):
+            return self.footer[key]
+        return self.header.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, KeyError)
+        if value is KeyError:
+            raise KeyError(key)
+        return value
+
+    def get_event(self, event_id) -> Dict:
+        """Read a single event by id with one seek"""
+        f = self._handle()
+        f.seek(self._event_offsets[event_id])
+        return json.loads(f.readline())["event"]
+
+    def iter_events(self) -> Iterator[Dict]:
+        with open(self.path, "rb") as f:
+            if self._event_offsets:
+                f.seek(self._event_offsets[0])
+            else:
+                return
+            steps_offset = self.footer.get("steps_offset")
+            while f.tell() < steps_offset:
+                yield json.loads(f.readline())["event"]
+
+    def _resolve_step(self, step):
+        event_ids = step.get("event_ids") or []
+        if not event_ids:
+            return step
+
+        action_type = step.get("action_type")
+        if action_type == "mouse_click":
+            event = self.get_event(event_ids[0])
+            step["click"] = {
+                "location": {"x": event.get("x"), "y": event.get("y")},
+                "label": step.pop("label", None),
+                "element": event.get("element") or {}
+            }
+        elif action_type == "key_press":
+            events = [self.get_event(i) for i in event_ids]
+            step["keys"] = [e.get("key") for e in events]
+            if events and events[0].get("element"):
+                step["element"] = events[0]["element"]
+        return step
+
+    def iter_steps(self, resolve=True) -> Iterator[Dict]:
+        """Yield steps one at a time; with `resolve`, click/key details are read from their events"""
+        with open(self.path, "rb") as f:
+            f.seek(self.footer.get("steps_offset", 0))
+            for line in f:
+                record = json.loads(line)
+                if record.get("record") != "step":
+                    break
+                del record["record"]
+                yield self._resolve_step(record) if resolve else record
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,17 +1,15 @@
 import customtkinter as ctk
+import logging
 import threading
-from pathlib import Path
 import time
 import sys
 import os
 
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+# Repo root, so modules can use package-relative imports across src/
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from recorder.screen_recorder import ScreenRecorder
-from recorder.event_tracker import EventTracker
-from recorder.audio_recorder import AudioRecorder
-from analyzer.activity_analyzer import ActivityAnalyzer
-from llm.ollama_client import OllamaClient
+from src.recorder.model_registry import model_registry
+from src.gui.update_bus import UpdateBus
 
 class MainWindow:
     def __init__(self):
@@ -19,13 +17,23 @@ class MainWindow:
         self.root.title("Desktop AI Assistant")
         self.root.geometry("800x600")
 
-        self.is_recording = False
+        self.store = None
+        self.similarity_index = None
+        # Recording pipeline of the current or last session
+        self.session = None
 
-        self.screen_recorder = None
-        self.event_tracker = None
-        self.audio_recorder = None
+        # Worker threads only touch widgets through the bus
+        self.updates = UpdateBus(self.root, fps=20)
 
         self._create_widgets()
+        self.updates.start()
+
+        # Load Whisper once the window is up, while the user is still looking at it
+        self.root.after(500, self._warm_up)
+
+    def _warm_up(self):
+        if self.audio_var.get():
+            model_registry.warm_up()
 
     def _create_widgets(self):
         title = ctk.CTkLabel(
@@ -43,6 +51,15 @@ class MainWindow:
         )
         self.status_label.pack(pady=10)
 
+        # Live capture stats
+        self.stats_label = ctk.CTkLabel(
+            self.root,
+            text="",
+            font=("Consolas", 12),
+            justify="left"
+        )
+        self.stats_label.pack(pady=(0, 5))
+
         button_frame = ctk.CTkFrame(self.root)
         button_frame.pack(pady=20)
 
@@ -112,6 +129,30 @@ class MainWindow:
         self.duration_entry.insert(0, "60")
         self.duration_entry.pack(side="left", padx=15)
 
+        # Optional components; when off their libraries are never imported
+        self.audio_var = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(
+            duration_frame,
+            text="Audio",
+            variable=self.audio_var,
+            command=self._warm_up
+        ).pack(side="left", padx=10)
+
+        self.ocr_var = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(
+            duration_frame,
+            text="OCR",
+            variable=self.ocr_var
+        ).pack(side="left", padx=10)
+
+        # Writes per-thread profiles to data/profiles/ when the session ends
+        self.profile_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            duration_frame,
+            text="Profile",
+            variable=self.profile_var
+        ).pack(side="left", padx=10)
+
 
     def start_recording(self):
         try:
@@ -119,69 +160,134 @@ class MainWindow:
         except ValueError:
             duration = 60
 
-        self.is_recording = True
         self.start_button.configure(state="disabled")
         self.stop_button.configure(state="normal")
         self.status_label.configure(text="Recording in progress...")
+        self.suggestions_text.delete("1.0", "end")
+        self.session = None
 
         recording_thread = threading.Thread(
             target=self._record_session, 
-            args=(duration,),
+            args=(duration, self.audio_var.get(), self.ocr_var.get(), self.profile_var.get()),
             daemon=True
         )
         recording_thread.start()
 
     def stop_recording(self):
-        self.is_recording = False
-        self.status_label.configure(text="Recording stopped, Generating suggestions...")
+        session = self.session
+        if session is None:
+            return
+        if session.state == "recording":
+            session.stop()
+            self._set_status("Recording stopped, Generating suggestions...")
+        else:
+            # Already analyzing: a second click cancels the LLM response
+            session.cancel()
+            self._set_status("Cancelling suggestions...")
+
+    def _set_status(self, text):
+        """Show `text` in the status label from any thread; only the latest is drawn"""
+        self.updates.set("status", lambda: self.status_label.configure(text=text))
+
+    def _set_stats(self, text):
+        self.updates.set("stats", lambda: self.stats_label.configure(text=text))
+
+    def _append_suggestions(self, text):
+        """Append text to the suggestions box from any thread"""
+        self.updates.append("suggestions", self._insert_suggestions, text)
+
+    def _insert_suggestions(self, text):
+        self.suggestions_text.insert("end", text)
+        self.suggestions_text.see("end")
+
+    def _reset_buttons(self):
+        self.updates.call(lambda: self.start_button.configure(state="normal"))
+        self.updates.call(lambda: self.stop_button.configure(state="disabled"))
+
+    def _show_progress(self, session):
+        stats = session.stats()
+        status = f"Recording... {stats['events']} events, {stats['steps']} steps"
+        if stats['last_suggestion']:
+            status += f"\n{stats['last_suggestion']}"
+        self._set_status(status)
+        self._set_stats(
+            f"{stats['elapsed']:.0f}s | {stats['screenshots']} screenshots | "
+            f"{stats['audio_chunks']} audio chunks | {stats['template_matches']} template matches | "
+            f"analysis queue {stats['analysis_queue']} | load {stats['load_level']}"
+        )
 
-    def _record_session(self, duration):
+    def _record_session(self, duration, record_audio, ocr, profile=False):
         try:
-            self.screen_recorder = ScreenRecorder(interval=2)
-            self.event_tracker = EventTracker()
-            self.audio_recorder = AudioRecorder()
-
-            self.screen_recorder.start()
-            self.event_tracker.start()
-            self.audio_recorder.start()
-
-            time.sleep(duration)
-
-            self.screen_recorder.stop()
-            self.event_tracker.stop()
-            self.audio_recorder.stop()
-
-            self._generate_suggestions()
-        
+            # Imported on first use so the window shows up without waiting for them
+            from src.analyzer.similarity import SimilarityIndex
+            from src.processor.session import Session
+            from src.storage.event_store import EventStore
+
+            if self.store is None:
+                self.store = EventStore()
+            if self.similarity_index is None:
+                self.similarity_index = SimilarityIndex()
+            session = Session(store=self.store, similarity_index=self.similarity_index,
+                              record_audio=record_audio, ocr=ocr, profile={} if profile else None)
+            self.session = session
+
+            session.start()
+            # Returns as soon as Stop is clicked
+            session.wait(duration, on_progress=lambda snapshot: self._show_progress(session), interval=0.25)
+            self._generate_suggestions(session)
         except Exception as e:
-            self.status_label.configure(text=f"Error: {str(e)}")
+            self._set_status(f"Error: {str(e)}")
+            self._reset_buttons()
 
-    def _generate_suggestions(self):
+    def _generate_suggestions(self, session):
         try:
-            self.status_label.configure(text="Building and Analyzing workflow...")
-
-            analyzer = ActivityAnalyzer()
-            workflow = analyzer.generate_workflow_json()
-
-            llm_client = OllamaClient()
-            suggestions = llm_client.generate_suggestions(workflow)
-
-            hybrid_suggestion = analyzer.detect_patterns_hybrid(analyzer.load_events())
-
-            result_text = f"Pattern Detection:\n" + "\n".join(hybrid_suggestion)
-            result_text += f"LLM Suggestions:\n{suggestions}\n\n"
-
-            self.suggestions_text.delete("1.0", "end")
-            self.suggestions_text.insert("end", result_text)
-
-            self.status_label.configure(text="Analysis complete!")
-            self.start_button.configure(state="normal")
-            self.stop_button.configure(state="disabled")
+            # Show the answer as it is generated; Stop cancels it
+            self._append_suggestions("LLM Suggestions:\n")
+            streamed = []
+            started = [None]
+            def on_token(text):
+                streamed.append(text)
+                self._append_suggestions(text)
+                if started[0] is None:
+                    started[0] = time.perf_counter()
+                elapsed = time.perf_counter() - started[0]
+                rate = f", {len(streamed)/elapsed:.1f} tokens/s" if elapsed > 0 else ""
+                self._set_stats(f"{len(streamed)} tokens{rate}")
+
+            def on_status(text):
+                if session.state == "generating":
+                    text += " (Stop to cancel)"
+                self._set_status(text)
+
+            result = session.finish(on_token=on_token, on_status=on_status)
+            if not streamed:
+                # Errors come back as text instead of streamed tokens
+                self._append_suggestions(result["suggestions"])
+            self._append_suggestions(
+                "\n\nPattern Detection:\n" + "\n".join(result["hybrid_suggestions"]) + "\n"
+            )
+
+            stats = session.llm_client.generation_stats
+            status = "Analysis cancelled." if result["cancelled"] else "Analysis complete!"
+            if stats.get("cached"):
+                status += " (cached answer)"
+            elif stats.get("ttft_seconds") is not None:
+                status += f" First token {stats['ttft_seconds']}s, {stats.get('tokens_per_second')} tokens/s"
+            status += f"\nStop to suggestions: {result['timings']['stop_to_suggestions']}s"
+            if result.get("profile"):
+                status += f"\nProfiles saved to {result['profile']['folder']}"
+            self._set_status(status)
+
+            updates = self.updates.stats()
+            self._set_stats(
+                f"{result['summary']['total_events']} events | {len(streamed)} tokens | "
+                f"GUI: {updates['posted']} updates drawn in {updates['frames']} frames"
+            )
+            self._reset_buttons()
 
         except Exception as e:
-            self.status_label.configure(text=f"Analysis error: {str(e)}")
-            self.start_button.configure(state="normal")
-            self.stop_button.configure(state="disabled")
+            self._set_status(f"Analysis error: {str(e)}")
+            self._reset_buttons()
 
     def clear_data(self):
         dialog = ctk.CTkInputDialog(
@@ -191,9 +297,19 @@ class MainWindow:
         response = dialog.get_input()
 
         if response == "DELETE":
-            from utils.data_cleaner import clear_all_data
+            from src.utils.data_cleaner import clear_all_data
+
+            # The database file can't be deleted while it is open
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+            if self.similarity_index is not None:
+                self.similarity_index.close()
+                self.similarity_index = None
+
             clear_all_data(confirm=False)
             self.status_label.configure(text="Data deleted successfully!")
+            self.stats_label.configure(text="")
             self.suggestions_text.delete("1.0", "end")
         else:
             self.status_label.configure(text="Deletion cancelled.")
@@ -203,5 +319,7 @@ class MainWindow:
         self.root.mainloop()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+                        datefmt="%H:%M:%S")
     app = MainWindow()
     app.run()
\ No newline at end of file
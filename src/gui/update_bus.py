@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+class UpdateBus:
+    """Thread-safe queue of GUI updates, applied on the Tk thread.
+
+    Worker threads post updates instead of touching widgets, and the bus
+    applies them from `root.after` at most `fps` times per second. Updates
+    are coalesced between frames:
+
+    - set(key, callback, *args): only the latest update per key is applied
+    - append(key, callback, text): texts posted for a key are joined and
+      applied with one callback
+    - call(callback, *args): always applied, in order; updates posted
+      after a call are never merged into ones posted before it
+
+    `root` only needs `after(ms, func)`, so the bus also runs headless.
+    """
+
+    def __init__(self, root, fps=20):
+        self.root = root
+        self.interval_ms = max(1, int(1000/fps))
+
+        self._lock = threading.Lock()
+        self._pending = []
+        # key -> pending entry that later updates may still merge into
+        self._open: Dict = {}
+        self._running = False
+
+        self.posted = 0
+        self.applied = 0
+        self.frames = 0
+        self.errors = 0
+        self.max_frame_ms = 0.0
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval_ms, self._tick)
+        return self
+
+    def stop(self):
+        self._running = False
+
+    def set(self, key, callback: Callable, *args):
+        with self._lock:
+            self.posted += 1
+            entry = self._open.get(key)
+            if entry is not None:
+                entry[1] = args
+                return
+            entry = [callback, args]
+            self._pending.append(entry)
+            self._open[key] = entry
+
+    def append(self, key, callback: Callable, text: str):
+        with self._lock:
+            self.posted += 1
+            entry = self._open.get(key)
+            if entry is not None:
+                entry[1] = (entry[1][0] + text,)
+                return
+            entry = [callback, (text,)]
+            self._pending.append(entry)
+            self._open[key] = entry
+
+    def call(self, callback: Callable, *args):
+        with self._lock:
+            self.posted += 1
+            self._pending.append([callback, args])
+            self._open = {}
+
+    def drain(self) -> int:
+        """Apply everything posted so far on the calling thread; returns the update count"""
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._open = {}
+
+        start = time.perf_counter()
+        for callback, args in pending:
+            try:
+                callback(*args)
+            except Exception as e:
+                self.errors += 1
+                logger.error("GUI update error: %s", e)
+        elapsed_ms = (time.perf_counter() - start)*1000
+
+        self.applied += len(pending)
+        if pending:
+            self.frames += 1
+            self.max_frame_ms = max(self.max_frame_ms, elapsed_ms)
+        return len(pending)
+
+    def _tick(self):
+        if not self._running:
+            return
+        self.drain()
+        self.root.after(self.interval_ms, self._tick)
+
+    def stats(self) -> Dict:
+        return {
+            "posted": self.posted,
+            "applied": self.applied,
+            "frames": self.frames,
+            "errors": self.errors,
+            "max_frame_ms": round(self.max_frame_ms, 2)
+        }
+
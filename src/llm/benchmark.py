@@ -0,0 +1,145 @@
+import json
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+from .ollama_client import OllamaClient
+from .response_cache import ResponseCache
+from .transport import OllamaTransport
+from .mock_server import MockOllamaServer
+
+def percentile(values: List[float], p) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(p/100*len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def synthetic_workflow(n_steps, seed=0) -> Dict:
+    rng = random.Random(seed)
+    windows = ["Report.xlsx - Excel", "Inbox (3) - Outlook", "Customer 42 - CRM - Google Chrome"]
+    labels = ["Save", "Next", "Reply", "Search", "Export", "Copy"]
+    steps = []
+    for i in range(n_steps):
+        window = rng.choice(windows)
+        if rng.random() < 0.6:
+            label = rng.choice(labels)
+            steps.append({"window": window, "action_type": "mouse_click",
+                          "summary": f"Clicked '{label}' in {window}",
+                          "click": {"label": label, "element": {"control_type": "Button"}}})
+        else:
+            keys = [rng.choice("abcdefgh") for _ in range(rng.randint(1, 20))]
+            steps.append({"window": window, "action_type": "key_press", "keys": keys,
+                          "summary": f"Typed: {' '.join(keys)} in {window}"})
+    return {"session_id": f"benchmark_{n_steps}", "summary": {"total_events": n_steps}, "workflow_steps": steps}
+
+class LLMBenchmark:
+    """Drive OllamaClient.generate_suggestions at several prompt sizes and concurrency levels.
+
+    Every request bypasses the response cache so the backend is measured,
+    and all clients share one pooled transport like the app does.
+    """
+
+    def __init__(self, base_url, sizes=(50, 500, 5000), concurrency=(1, 2, 4), requests_per_level=8,
+                 map_reduce=False):
+        self.base_url = base_url
+        self.sizes = sizes
+        self.concurrency = concurrency
+        self.requests_per_level = requests_per_level
+        self.map_reduce = map_reduce
+
+    def _run_level(self, transport, cache, workflow, concurrency) -> Dict:
+        def one_request(i):
+            # Concurrent requests would all overwrite the same timeline file
+            client = OllamaClient(self.base_url, cache=cache, transport=transport, timeline_dir=None)
+            start = time.perf_counter()
+            result = client.generate_suggestions(workflow, bypass_cache=True, map_reduce=self.map_reduce)
+            stats = client.generation_stats
+            return {
+                "seconds": time.perf_counter() - start,
+                "ttft": stats.get("ttft_seconds"),
+                "tokens": stats.get("tokens") or 0,
+                "prompt_tokens": client.prompt_stats.get("estimated_tokens"),
+                "error": result.startswith("Error connecting to Ollama")
+            }
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one_request, range(self.requests_per_level)))
+        wall = time.perf_counter() - start
+
+        ok = [r for r in results if not r["error"]]
+        latencies = [r["seconds"] for r in ok]
+        ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+        return {
+            "steps": len(workflow["workflow_steps"]),
+            "concurrency": concurrency,
+            "requests": len(results),
+            "errors": len(results) - len(ok),
+            "prompt_tokens": ok[0]["prompt_tokens"] if ok else None,
+            "latency_p50": round(percentile(latencies, 50), 3) if latencies else None,
+            "latency_p95": round(percentile(latencies, 95), 3) if latencies else None,
+            "ttft_p50": round(percentile(ttfts, 50), 3) if ttfts else None,
+            "ttft_p95": round(percentile(ttfts, 95), 3) if ttfts else None,
+            "requests_per_second": round(len(ok)/wall, 2),
+            "tokens_per_second": round(sum(r["tokens"] for r in ok)/wall, 1)
+        }
+
+    def run(self, output_file="data/benchmarks/llm_benchmark.json") -> Dict:
+        transport = OllamaTransport(self.base_url, pool_size=max(self.concurrency))
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(Path(tmp)/"responses.db")
+            for size in self.sizes:
+                workflow = synthetic_workflow(size)
+                for concurrency in self.concurrency:
+                    level = self._run_level(transport, cache, workflow, concurrency)
+                    results.append(level)
+                    print(f"{size} steps x{concurrency}: p50 {level['latency_p50']}s, "
+                          f"p95 {level['latency_p95']}s, {level['tokens_per_second']} tokens/s")
+        transport.close()
+
+        report = {
+            "generated_at": datetime.now().isoformat(),
+            "base_url": self.base_url,
+            "map_reduce": self.map_reduce,
+            "results": results
+        }
+        if output_file:
+            Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Benchmark saved to {output_file}")
+        return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LLM latency/throughput benchmark")
+    parser.add_argument("--url", help="Ollama URL; a local mock server is started when omitted")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--map-reduce", action="store_true")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Mock server tokens/s")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Mock server 503 rate")
+    parser.add_argument("--output", default="data/benchmarks/llm_benchmark.json")
+    args = parser.parse_args()
+
+    mock = None
+    url = args.url
+    if url is None:
+        mock = MockOllamaServer(token_rate=args.token_rate, failure_rate=args.failure_rate).start()
+        url = mock.url
+        print(f"Using mock server at {url}")
+
+    benchmark = LLMBenchmark(url, args.sizes, args.concurrency, args.requests, args.map_reduce)
+    benchmark.run(args.output)
+
+    if mock is not None:
+        mock.stop()
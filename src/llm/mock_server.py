@@ -0,0 +1,207 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("automate the export step with a script that copies each value into the ticket "
+         "form and saves the report so repeated clicks in Excel are no longer needed").split()
+
+class MockOllamaServer:
+    """Local stand-in for the Ollama `/api/generate` endpoint.
+
+    Streams NDJSON chunks with chunked encoding like Ollama does (or returns a
+    single JSON object with "stream": false) at a configurable token rate,
+    after a first-token delay that grows with the prompt length. A share of
+    requests can fail with 503 to exercise retries. Answers are derived from
+    the prompt, so the same prompt always gets the same answer.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, token_rate=50.0, first_token_delay=0.2,
+                 prompt_rate=20000.0, load_delay=0.0, failure_rate=0.0, response_tokens=60, seed=0):
+        self.token_rate = token_rate
+        self.first_token_delay = first_token_delay
+        # Prompt characters processed per second before the first token
+        self.prompt_rate = prompt_rate
+        # One-time model load on the first request (or preload)
+        self.load_delay = load_delay
+        self.failure_rate = failure_rate
+        self.response_tokens = response_tokens
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.requests = 0
+        self.failures = 0
+
+        server = self
+        class Handler(_Handler):
+            mock = server
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+            return fail
+
+    def _load_seconds(self):
+        """Load time paid by this request: only the first one loads the model"""
+        with self._lock:
+            if self._loaded:
+                return 0.0
+            self._loaded = True
+        time.sleep(self.load_delay)
+        return self.load_delay
+
+    def answer_tokens(self, prompt):
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "little")
+        rng = random.Random(seed)
+        return [rng.choice(WORDS) + " " for _ in range(self.response_tokens)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client closed a kept-alive connection
+            pass
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": "tinyllama"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        mock = self.mock
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        if mock._should_fail():
+            self._send_json(503, {"error": "mock failure"})
+            return
+
+        start = time.perf_counter()
+        load_seconds = mock._load_seconds()
+        prompt = body.get("prompt")
+        if not prompt:
+            # Preload request: load the model and return
+            self._send_json(200, {"model": body.get("model"), "done": True,
+                                  "load_duration": int(load_seconds*1e9)})
+            return
+
+        prompt_seconds = mock.first_token_delay + len(prompt)/mock.prompt_rate
+        time.sleep(prompt_seconds)
+
+        tokens = mock.answer_tokens(prompt)
+        limit = (body.get("options") or {}).get("num_predict")
+        if limit:
+            tokens = tokens[:limit]
+
+        interval = 1/mock.token_rate
+        final = {
+            "model": body.get("model"),
+            "done": True,
+            "load_duration": int(load_seconds*1e9),
+            "prompt_eval_count": len(prompt)//4,
+            "prompt_eval_duration": int(prompt_seconds*1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(len(tokens)*interval*1e9)
+        }
+
+        if body.get("stream", True) is False:
+            time.sleep(len(tokens)*interval)
+            final["response"] = "".join(tokens)
+            final["total_duration"] = int((time.perf_counter() - start)*1e9)
+            self._send_json(200, final)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokens:
+                time.sleep(interval)
+                self._send_chunk({"model": body.get("model"), "response": token, "done": False})
+            final["response"] = ""
+            final["total_duration"] = int((time.perf_counter() - start)*1e9)
+            self._send_chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled the stream
+            pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mock Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-rate", type=float, default=50.0)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--load-delay", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockOllamaServer(
+        port=args.port,
+        token_rate=args.token_rate,
+        first_token_delay=args.first_token_delay,
+        load_delay=args.load_delay,
+        failure_rate=args.failure_rate
+    )
+    print(f"Mock Ollama server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,69 +1,76 @@
 import requests
 import json
-from typing import Dict, List, Optional
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+from .prompt_builder import PromptBuilder, estimate_tokens
+from .response_cache import ResponseCache
+from .transport import OllamaTransport
+from ..utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 class OllamaClient:
     """Client for Ollama interaction. Send workflow data and get automation suggestions"""
-    def __init__(self, base_url="http://localhost:11434"):
+    def __init__(self, base_url="http://localhost:11434", token_budget=1500, cache: ResponseCache = None,
+                 transport: OllamaTransport = None, timeline_dir="data"):
         self.base_url = base_url
+        # Pooled, retrying session that keeps the model loaded between calls
+        self.transport = transport or OllamaTransport(base_url)
         self.model = "tinyllama"
         # self.model = "qwen2:1.5b-instruct"
+        self.options = {"temperature": 0.3}
+
+        # Answers to prompts seen before are served from disk
+        self.cache = cache if cache is not None else ResponseCache()
+
+        # Prompt tokens, leaving the rest of tinyllama's 2048-token context for the answer
+        self.prompt_builder = PromptBuilder(token_budget=token_budget)
+        self.prompt_stats = {}
+        self.generation_stats = {}
+        # Each prompt is also saved there as timeline_<session_id>.txt; None turns that off
+        self.timeline_dir = Path(timeline_dir) if timeline_dir is not None else None
+
+        # Map-reduce summarization of long sessions
+        self.phase_workers = 2
+        self.phase_min_steps = 40
+        self.phase_max_steps = 400
+        self.phase_options = {**self.options, "num_predict": 160}
+        self.phase_stats = {}
 
-    def _create_prompt(self, workflow_data: Dict) -> str:
+    def _create_prompt(self, workflow_data: Dict, phase_summaries: List[str] = None) -> str:
+        # workflow_data is a generate_workflow_json dict or a WorkflowReader,
+        # whose steps are read lazily while the timeline is built.
+        # With phase_summaries (from summarize_phases) they replace the timeline.
         total_events = workflow_data.get('summary', {}).get('total_events', 0)
         steps = workflow_data.get('workflow_steps', [])
 
-        total_steps = len(steps)
-
-        # Build timeline with context
-        timeline_lines = []
-        previous_window = None
-        for i, step in enumerate(steps, 1):
-            current_window = step.get('window', 'Unknown window')
-            action = step.get('action_type')
-
-            if previous_window and current_window != previous_window:
-                timeline_lines.append(f"--- SWITCHED TO: {current_window} ---")
-
-            summary = step.get('summary') or f"{action or 'event'} recorded"
-            timeline_lines.append(f"{i}. {summary}")
-            
-            if step.get('action_type') == 'mouse_click':
-                click = step.get("click", {})
-                element = click.get("element", {})
-                label = click.get("label")
-                extras = []
-
-                if label:
-                    extras.append(f"Element: '{label}'")
-                if element.get("control_type"):
-                    extras.append(f"Control Type: {element.get('control_type')}")
-                if element.get("automation_id"):
-                    extras.append(f"Automation ID: {element.get('automation_id')}")
-                if element.get("class_name"):
-                    extras.append(f"Class Name: {element.get('class_name')}")
-
-                location = click.get("location")
-                if location:
-                    extras.append(f"Coordinates: ({location.get('x')}, {location.get('y')})")
-
-                if extras:
-                    timeline_lines.append(f" - {', '.join(extras)}")
-
-            elif action in {'key_press', 'key_sequence'}:
-                keys = step.get("key")
-                if keys:
-                    timeline_lines.append(f" - Key sequence: {keys} in {current_window}")
-                key = step.get("key")
-                if not keys and key:
-                    timeline_lines.append(f" - Key: {key} in {current_window}")
-                element = step.get("element") or {}
-                if element.get("name"):
-                    timeline_lines.append(f" - Target Element: {element['name']} in {current_window}")
-            
-            previous_window = current_window
-
-        timeline = "\n".join(timeline_lines)
+        # Vectorized session statistics from ActivityAnalyzer.build_columns
+        stats_lines = []
+        statistics = workflow_data.get('statistics') or {}
+        if statistics:
+            stats_lines.append(
+                f"Duration: {statistics.get('duration_seconds')}s, events: {statistics.get('events')}, "
+                f"idle periods: {statistics.get('idle_periods')}, bursts of rapid input: {statistics.get('bursts')}"
+            )
+            for window in statistics.get('windows', []):
+                stats_lines.append(
+                    f"- {window['window']}: {window['events']} events ({window['clicks']} clicks, "
+                    f"{window['keys']} keys, {window['shortcuts']} shortcuts), {window['dwell_seconds']}s active"
+                )
+        stats = "\n".join(stats_lines) or "Not available"
+
+        # Matches from ActivityAnalyzer.find_similar_workflows
+        history_lines = []
+        for match in workflow_data.get('similar_workflows') or []:
+            history_lines.append(
+                f"- {' -> '.join(match.get('sequence', [])[:6])} "
+                f"(also in session {match.get('session_id')}, similarity {match.get('similarity', 0):.0%})"
+            )
+        history = "\n".join(history_lines) or "None found"
         
         prompt = f"""SYSTEM ROLE:
             You are an automation analyst for desktop workflows. Study the provided activity timeline, infer the user’s objectives, and recommend actionable automations. Be specific, reference exact steps, and avoid generic statements.
@@ -89,51 +96,409 @@ class OllamaClient:
             - [Automation 2: ...]
             (Only include well-grounded ideas; omit this section if no credible automation is found.)
 
-            === ACTIVITY TIMELINE ===
-            {timeline}
+            === SESSION STATISTICS ===
+            {stats}
+
+            === SIMILAR WORKFLOWS FROM PAST SESSIONS ===
+            {history}
+
+            === {"ACTIVITY PHASES" if phase_summaries is not None else "ACTIVITY TIMELINE"} ===
+            {{timeline}}
             """
-    
+
+        if phase_summaries is not None:
+            prompt = prompt.replace("{timeline}", "\n\n".join(phase_summaries))
+            self.prompt_stats = {
+                "phases": len(phase_summaries),
+                "steps": self.phase_stats.get("steps", 0),
+                "shown_steps": self.phase_stats.get("steps", 0),
+                "prompt_chars": len(prompt),
+                "estimated_tokens": estimate_tokens(prompt)
+            }
+            return prompt
+
+        # The timeline gets whatever the rest of the prompt leaves of the budget
+        fixed_tokens = estimate_tokens(prompt.replace("{timeline}", ""))
+        timeline = self.prompt_builder.build_timeline(
+            steps,
+            max(self.prompt_builder.token_budget - fixed_tokens, 0)
+        )
+        prompt = prompt.replace("{timeline}", timeline)
+
+        self.prompt_stats = {
+            **self.prompt_builder.stats,
+            "prompt_chars": len(prompt),
+            "estimated_tokens": estimate_tokens(prompt)
+        }
         return prompt
     
-    def generate_suggestions(self, workflow_data: Dict) -> str:
-        prompt = self._create_prompt(workflow_data)
+    def _prepare_prompt(self, workflow_data, phase_summaries: List[str] = None) -> str:
+        prompt = self._create_prompt(workflow_data, phase_summaries)
 
-        from pathlib import Path
-        timeline_file = Path("data")/f"timeline_{workflow_data.get('session_id', 'unknown')}.txt"
-        with open(timeline_file, 'w', encoding='utf-8') as f:
-            f.write(prompt)
+        if self.timeline_dir is not None:
+            self.timeline_dir.mkdir(parents=True, exist_ok=True)
+            timeline_file = self.timeline_dir/f"timeline_{workflow_data.get('session_id', 'unknown')}.txt"
+            with open(timeline_file, 'w', encoding='utf-8') as f:
+                f.write(prompt)
+            logger.debug("Timeline saved to: %s", timeline_file)
+        stats = self.prompt_stats
+        logger.info("Prompt: %d chars, ~%d tokens (budget %d), %d of %d steps shown",
+                    stats['prompt_chars'], stats['estimated_tokens'], self.prompt_builder.token_budget,
+                    stats['shown_steps'], stats['steps'])
+        metrics.histogram("llm_prompt_tokens").record(stats['estimated_tokens'])
+        return prompt
 
-        print(f"Timeline save to: {timeline_file}")
+    def stream_prompt(self, prompt: str, cancel_event: threading.Event = None,
+                      options: Dict = None, stats: Dict = None) -> Iterator[str]:
+        """Yield response text as Ollama streams it, one NDJSON chunk at a time.
 
-        try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
+        Setting `cancel_event` closes the connection, which also stops the
+        generation on the server. The request runs on a watcher thread that
+        does this, so a stream still waiting for its first or next chunk stops
+        right away too. Malformed chunks are skipped. Timing ends up in
+        `stats`, which defaults to `generation_stats`.
+        """
+        start = time.perf_counter()
+        if stats is None:
+            stats = self.generation_stats = {}
+        stats.update({"ttft_seconds": None, "chunks": 0, "malformed_chunks": 0,
+                      "total_seconds": None, "cancelled": False})
+
+        def post():
+            return self.transport.post(
+                "/api/generate",
+                {
                     "model": self.model,
                     "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3
-                    }
+                    "stream": True,
+                    "options": options or self.options
                 },
-                timeout = 600
+                stream=True,
+                # Only the wait between chunks is bounded, not the whole answer
+                timeout=(10, 600)
             )
+
+        finished = threading.Event()
+        if cancel_event is None:
+            response = post()
+        else:
+            response = self._post_until_cancel(post, cancel_event, finished)
+            if response is None:
+                stats["cancelled"] = True
+                stats["total_seconds"] = round(time.perf_counter() - start, 3)
+                return
+        done = False
+        try:
             response.raise_for_status()
+            # chunk_size=None hands over data as it arrives instead of filling 512-byte blocks
+            for line in self._iter_lines(response, cancel_event):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if not line:
+                    continue
+
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError:
+                    stats["malformed_chunks"] += 1
+                    logger.warning("Skipping malformed chunk from Ollama: %r", line[:200])
+                    continue
+                if chunk.get("error"):
+                    raise requests.exceptions.RequestException(chunk["error"])
+
+                text = chunk.get("response", "")
+                if text:
+                    if stats["ttft_seconds"] is None:
+                        stats["ttft_seconds"] = round(time.perf_counter() - start, 3)
+                    stats["chunks"] += 1
+                    yield text
+
+                if chunk.get("done"):
+                    # Server-side counters, in nanoseconds
+                    if chunk.get("eval_count") and chunk.get("eval_duration"):
+                        stats["tokens"] = chunk["eval_count"]
+                        stats["tokens_per_second"] = round(chunk["eval_count"]/(chunk["eval_duration"]/1e9), 1)
+                    if chunk.get("prompt_eval_count"):
+                        stats["prompt_tokens"] = chunk["prompt_eval_count"]
+                    # Model load is reported apart from prompt processing and generation
+                    for field in ("load_duration", "prompt_eval_duration", "eval_duration"):
+                        if field in chunk:
+                            stats[field.replace("duration", "seconds")] = round(chunk[field]/1e9, 3)
+                    done = True
+                    break
+        finally:
+            finished.set()
+            response.close()
+            stats["cancelled"] = not done and cancel_event is not None and cancel_event.is_set()
+            stats["total_seconds"] = round(time.perf_counter() - start, 3)
+            if "tokens_per_second" not in stats and stats["ttft_seconds"] is not None:
+                # No server counters (e.g. cancelled): count streamed chunks, one token each
+                generating = stats["total_seconds"] - stats["ttft_seconds"]
+                stats["tokens"] = stats["chunks"]
+                stats["tokens_per_second"] = round(stats["chunks"]/generating, 1) if generating > 0 else None
+
+    @staticmethod
+    def _post_until_cancel(post: Callable, cancel_event: threading.Event, finished: threading.Event):
+        """Run `post` on a watcher thread that closes its response on cancel.
+
+        Returns the response, or None when cancelled before it arrived; the
+        watcher then closes it as soon as it does. Reading the response ends
+        by setting `finished`.
+        """
+        result = {}
+        opened = threading.Event()
+
+        def watch():
+            try:
+                result["response"] = post()
+            except Exception as error:
+                result["error"] = error
+                return
+            finally:
+                opened.set()
+            while not finished.is_set():
+                if cancel_event.wait(0.05):
+                    response = result["response"]
+                    # close() alone doesn't wake a read blocked on the socket;
+                    # shutdown() does (urllib3 2.3+)
+                    shutdown = getattr(response.raw, "shutdown", None)
+                    if shutdown is not None:
+                        shutdown()
+                    response.close()
+                    return
+
+        threading.Thread(target=watch, name="stream-cancel", daemon=True).start()
+        while not opened.wait(0.05):
+            if cancel_event.is_set():
+                return None
+        if "error" in result:
+            raise result["error"]
+        return result["response"]
+
+    @staticmethod
+    def _iter_lines(response, cancel_event: threading.Event = None) -> Iterator[bytes]:
+        """response.iter_lines, ending quietly when a cancel closed the stream under it"""
+        try:
+            yield from response.iter_lines(chunk_size=None)
+        except (requests.exceptions.RequestException, AttributeError, OSError, ValueError):
+            if cancel_event is None or not cancel_event.is_set():
+                raise
 
-            result = response.json()
-            return result.get("response", "No suggestions generated")
+    def _phase_prompt(self, phase, index) -> str:
+        prompt = f"""Summarize this phase of a recorded desktop session in at most 3 sentences: the applications used, what the user did, and any repeated actions with their step numbers.
 
+            === PHASE {index}: STEPS {phase['first']}-{phase['last']} ===
+            {{timeline}}
+            """
+        budget = max(self.prompt_builder.token_budget - estimate_tokens(prompt), 0)
+        timeline = self.prompt_builder.build_timeline(phase["steps"], budget, first_number=phase["first"])
+        return prompt.replace("{timeline}", timeline)
+
+    def summarize_phases(self, workflow_data, cancel_event: threading.Event = None,
+                         bypass_cache=False) -> List[Dict]:
+        """Map step: one short summary per phase, generated concurrently.
+
+        Phases are split at window switches. Summaries are cached by their
+        prompt, so after new activity only the changed last phase is regenerated.
+        """
+        start = time.perf_counter()
+        phases = self.prompt_builder.split_phases(
+            workflow_data.get('workflow_steps', []),
+            self.phase_min_steps,
+            self.phase_max_steps
+        )
+        # Prompts are built here; only generation runs in the pool. They must not
+        # depend on later phases, or appended activity would miss the cache.
+        prompts = [self._phase_prompt(phase, i) for i, phase in enumerate(phases, 1)]
+
+        summaries = [None]*len(phases)
+        pending = []
+        for i, prompt in enumerate(prompts):
+            cached = None if bypass_cache else self.cache.get(self.model, prompt, self.phase_options)
+            if cached is not None:
+                summaries[i] = cached
+            else:
+                pending.append(i)
+
+        if pending:
+            for i, text in zip(pending, self._generate_many([prompts[i] for i in pending], cancel_event)):
+                summaries[i] = text
+
+        self.phase_stats = {
+            "phases": len(phases),
+            "cached": len(phases) - len(pending),
+            "generated": len(pending),
+            "steps": phases[-1]["last"] if phases else 0,
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+        logger.info("Summarized %d phases (%d generated, %d cached) in %ss",
+                    len(phases), len(pending), len(phases) - len(pending), self.phase_stats['seconds'])
+        metrics.counter("llm_phase_summaries_total", source="generated").inc(len(pending))
+        metrics.counter("llm_phase_summaries_total", source="cached").inc(len(phases) - len(pending))
+        metrics.histogram("llm_map_seconds").record(self.phase_stats['seconds'])
+
+        return [
+            {"first": phase["first"], "last": phase["last"], "apps": phase["apps"], "summary": summary}
+            for phase, summary in zip(phases, summaries)
+        ]
+
+    def _generate_many(self, prompts: List[str], cancel_event=None) -> List[str]:
+        """Generate short answers for several prompts with bounded concurrency, caching each"""
+        def generate(prompt):
+            if cancel_event is not None and cancel_event.is_set():
+                # Prompts still waiting for a worker are not sent at all
+                return ""
+            text = "".join(self.stream_prompt(prompt, cancel_event, self.phase_options, stats={}))
+            if text and not (cancel_event is not None and cancel_event.is_set()):
+                self.cache.put(self.model, prompt, text, self.phase_options)
+            return text
+
+        with ThreadPoolExecutor(max_workers=self.phase_workers) as pool:
+            return list(pool.map(generate, prompts))
+
+    @staticmethod
+    def _format_phase(index, phase) -> str:
+        return (f"Phase {index} (steps {phase['first']}-{phase['last']}, {', '.join(phase['apps'])}): "
+                f"{' '.join(phase['summary'].split())}")
+
+    def reduce_phases(self, phases: List[Dict], token_budget, cancel_event=None,
+                      bypass_cache=False, group_size=6) -> List[str]:
+        """Merge consecutive phase summaries until they fit `token_budget` tokens.
+
+        Groups have a fixed size, so earlier groups (and their cached merges)
+        stay the same as the session grows.
+        """
+        while len(phases) > 1:
+            lines = [self._format_phase(i, p) for i, p in enumerate(phases, 1)]
+            if estimate_tokens("\n\n".join(lines)) <= token_budget or (
+                    cancel_event is not None and cancel_event.is_set()):
+                return lines
+
+            groups = [phases[i:i + group_size] for i in range(0, len(phases), group_size)]
+            prompts = [
+                "Combine these consecutive summaries of a desktop session into one summary of at most "
+                "4 sentences. Keep application names, repeated actions and step numbers.\n\n"
+                + "\n".join(self._format_phase(i, p) for i, p in enumerate(group, 1))
+                for group in groups
+            ]
+
+            merged = [None]*len(groups)
+            pending = []
+            for i, prompt in enumerate(prompts):
+                cached = None if bypass_cache else self.cache.get(self.model, prompt, self.phase_options)
+                if cached is not None:
+                    merged[i] = cached
+                else:
+                    pending.append(i)
+            for i, text in zip(pending, self._generate_many([prompts[i] for i in pending], cancel_event)):
+                merged[i] = text
+
+            phases = [
+                {
+                    "first": group[0]["first"],
+                    "last": group[-1]["last"],
+                    "apps": list(dict.fromkeys(app for p in group for app in p["apps"])),
+                    "summary": text
+                }
+                for group, text in zip(groups, merged)
+            ]
+        return [self._format_phase(i, p) for i, p in enumerate(phases, 1)]
+
+    def preload(self) -> threading.Thread:
+        """Load the model in the background so it is ready when the session ends"""
+        return self.transport.preload_async(self.model)
+
+    def stream_suggestions(self, workflow_data: Dict, cancel_event: threading.Event = None) -> Iterator[str]:
+        """Streaming version of generate_suggestions"""
+        return self.stream_prompt(self._prepare_prompt(workflow_data), cancel_event)
+
+    def _cancelled(self) -> str:
+        """Result of a map-reduce request cancelled before its final pass"""
+        self.generation_stats = {"ttft_seconds": None, "total_seconds": 0.0, "cancelled": True}
+        logger.info("Generation cancelled before the final pass")
+        metrics.counter("llm_requests_total", outcome="cancelled").inc()
+        return "No suggestions generated"
+
+    def generate_suggestions(self, workflow_data: Dict, on_token: Callable[[str], None] = None,
+                             cancel_event: threading.Event = None, bypass_cache=False,
+                             map_reduce=None) -> str:
+        """Full suggestions text; `on_token` receives each piece as it arrives.
+
+        Cached answers are returned at once unless `bypass_cache` is set, in
+        which case a fresh answer is generated and replaces the cached one.
+        With `map_reduce` (by default: when the timeline doesn't fit the
+        budget) phases are summarized first and the final pass works from
+        the summaries; a cancel during those phases skips the final pass.
+        """
+        prompt = self._prepare_prompt(workflow_data)
+
+        truncated = self.prompt_stats["shown_steps"] < self.prompt_stats["steps"]
+        if map_reduce or (map_reduce is None and truncated):
+            try:
+                phases = self.summarize_phases(workflow_data, cancel_event, bypass_cache)
+                if cancel_event is not None and cancel_event.is_set():
+                    return self._cancelled()
+                # Summaries get what the rest of the final prompt leaves of the budget
+                fixed_tokens = estimate_tokens(self._create_prompt(workflow_data, []))
+                summaries = self.reduce_phases(
+                    phases,
+                    max(self.prompt_builder.token_budget - fixed_tokens, 0),
+                    cancel_event,
+                    bypass_cache
+                )
+                if cancel_event is not None and cancel_event.is_set():
+                    return self._cancelled()
+            except requests.exceptions.RequestException as e:
+                return f"Error connecting to Ollama: {e}"
+            prompt = self._prepare_prompt(workflow_data, summaries)
+
+        if not bypass_cache:
+            cached = self.cache.get(self.model, prompt, self.options)
+            if cached is not None:
+                self.generation_stats = {"cached": True, "ttft_seconds": 0.0, "total_seconds": 0.0,
+                                         "cancelled": False}
+                logger.info("Using cached suggestions (cache hit rate %.0f%%)", self.cache.stats()['hit_rate']*100)
+                metrics.counter("llm_requests_total", outcome="cached").inc()
+                if on_token is not None:
+                    on_token(cached)
+                return cached
+
+        parts = []
+        try:
+            for text in self.stream_prompt(prompt, cancel_event):
+                parts.append(text)
+                if on_token is not None:
+                    on_token(text)
         except requests.exceptions.RequestException as e:
+            logger.error("Error connecting to Ollama: %s", e)
+            metrics.counter("llm_requests_total", outcome="error").inc()
             return f"Error connecting to Ollama: {e}"
 
+        stats = self.generation_stats
+        logger.info("Generation: first token after %ss, %s tokens/s, %ss total%s",
+                    stats['ttft_seconds'], stats.get('tokens_per_second'), stats['total_seconds'],
+                    " (cancelled)" if stats['cancelled'] else "")
+        if "load_seconds" in stats:
+            logger.info("Model load %ss, prompt %ss, generation %ss",
+                        stats['load_seconds'], stats.get('prompt_eval_seconds'), stats.get('eval_seconds'))
+        metrics.counter("llm_requests_total", outcome="cancelled" if stats['cancelled'] else "ok").inc()
+        metrics.histogram("llm_request_seconds").record(stats['total_seconds'])
+        if stats['ttft_seconds'] is not None:
+            metrics.histogram("llm_ttft_seconds").record(stats['ttft_seconds'])
+        metrics.counter("llm_tokens_total").inc(stats.get('tokens') or 0)
+
+        suggestions = "".join(parts)
+        if suggestions and not stats["cancelled"]:
+            self.cache.put(self.model, prompt, suggestions, self.options)
+        return suggestions or "No suggestions generated"
+
 if __name__ == "__main__":
+    # The package-relative imports need this run as a module from the
+    # repository root: python -m src.llm.ollama_client
+    logging.basicConfig(level=logging.INFO)
     print("Ollama Client Test")
 
-    import sys
-    from pathlib import Path
-    sys.path.append(str(Path(__file__).parent.parent))
-
-    from analyzer.activity_analyzer import ActivityAnalyzer
+    from ..analyzer.activity_analyzer import ActivityAnalyzer
 
     print("Loading workflow data...")
     analyzer = ActivityAnalyzer()
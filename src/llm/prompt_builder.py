@@ -0,0 +1,263 @@
+import math
+from typing import Dict, Iterable, List
+from ..analyzer.window_normalizer import default_normalizer
+
+# Rough size of a tinyllama/llama token in characters of English text
+CHARS_PER_TOKEN = 4
+
+# Key runs longer than this are summarized instead of listing every key
+MAX_LISTED_KEYS = 12
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text)/CHARS_PER_TOKEN)
+
+class PromptBuilder:
+    """Compress a workflow's steps into a timeline that fits a token budget.
+
+    Consecutive identical steps collapse into one line ("Steps 12-40: ..."),
+    element details are only spelled out the first time an element is clicked,
+    and when the timeline is still too long the lowest-signal entries are
+    dropped and marked as omitted. `stats` describes the last build.
+    """
+
+    def __init__(self, token_budget=1500, normalizer=None):
+        self.token_budget = token_budget
+        self.normalizer = normalizer or default_normalizer
+        self.stats = {}
+
+    @staticmethod
+    def _step_signature(step):
+        """Steps with the same signature in the same window collapse into one run"""
+        action = step.get('action_type')
+        if action == 'mouse_click':
+            return action, (step.get('click') or {}).get('label') or step.get('label')
+        if action == 'key_press':
+            keys = step.get('keys') or []
+            return action, tuple(k for k in keys if '+' in k) or 'typing'
+        return action, step.get('summary')
+
+    def _key_summary(self, step, window):
+        keys = step.get('keys') or []
+        if len(keys) <= MAX_LISTED_KEYS:
+            return step.get('summary') or f"Typed: {' '.join(keys)} in {window}"
+        shortcuts = sorted({k for k in keys if '+' in k})
+        summary = f"Typed {len(keys)} keys in {window}"
+        if shortcuts:
+            summary += f" (shortcuts: {', '.join(shortcuts)})"
+        return summary
+
+    def _click_details(self, step, window_key, seen_elements):
+        """Detail line for a click, or None if the same element was already described"""
+        click = step.get("click") or {}
+        element = click.get("element") or {}
+        label = click.get("label") or step.get("label")
+
+        details = []
+        if element.get("control_type"):
+            details.append(f"Control Type: {element.get('control_type')}")
+        if element.get("automation_id"):
+            details.append(f"Automation ID: {element.get('automation_id')}")
+        if element.get("class_name"):
+            details.append(f"Class Name: {element.get('class_name')}")
+
+        element_key = (window_key, label, tuple(details))
+        if (label or details) and element_key in seen_elements:
+            return None
+        seen_elements.add(element_key)
+
+        extras = [f"Element: '{label}'"] if label else []
+        extras += details
+        location = click.get("location")
+        # Coordinates only help when nothing else identifies the element
+        if location and not extras:
+            extras.append(f"Coordinates: ({location.get('x')}, {location.get('y')})")
+        return f" - {', '.join(extras)}" if extras else None
+
+    def _entries(self, steps: Iterable[Dict], first_number=1) -> List[Dict]:
+        """Timeline entries: runs of identical steps with their lines and a signal score"""
+        entries = []
+        seen_elements = set()
+        previous_window = None
+
+        for number, step in enumerate(steps, first_number):
+            window = step.get('window', 'Unknown window')
+            window_key = self.normalizer.key(window)
+            signature = self._step_signature(step)
+
+            last = entries[-1] if entries else None
+            if last is not None and last["window_key"] == window_key and last["signature"] == signature:
+                last["last"] = number
+                last["count"] += 1
+                continue
+
+            entry = {
+                "first": number,
+                "last": number,
+                "count": 1,
+                "window": window,
+                "window_key": window_key,
+                "signature": signature,
+                "step": step,
+                "switch": previous_window is not None and window_key != previous_window,
+                "details": None
+            }
+            if step.get('action_type') == 'mouse_click':
+                entry["details"] = self._click_details(step, window_key, seen_elements)
+            entries.append(entry)
+            previous_window = window_key
+
+        for entry in entries:
+            entry["lines"] = self._render(entry)
+            entry["score"] = self._score(entry)
+        if entries:
+            # Keep the start and end of the session for context
+            entries[0]["score"] += 5
+            entries[-1]["score"] += 5
+        return entries
+
+    def _render(self, entry) -> List[str]:
+        step = entry["step"]
+        action = step.get('action_type')
+        if action == 'key_press':
+            summary = self._key_summary(step, entry["window"])
+        else:
+            summary = step.get('summary') or f"{action or 'event'} recorded"
+
+        lines = []
+        if entry["switch"]:
+            lines.append(f"--- SWITCHED TO: {entry['window']} ---")
+        if entry["count"] > 1:
+            lines.append(f"Steps {entry['first']}-{entry['last']}: {summary} (x{entry['count']})")
+        else:
+            lines.append(f"{entry['first']}. {summary}")
+        if entry["details"]:
+            lines.append(entry["details"])
+        return lines
+
+    @staticmethod
+    def _score(entry) -> float:
+        step = entry["step"]
+        action, detail = entry["signature"]
+        score = 1.0
+        if entry["switch"]:
+            score += 3
+        if action == 'mouse_click' and detail:
+            score += 2
+        if action == 'key_press' and detail != 'typing':
+            score += 2
+        if entry["details"]:
+            score += 1
+        if step.get('transcripts'):
+            score += 2
+        # Long repeats are what automation removes
+        score += min(3, math.log2(entry["count"]))
+        return score
+
+    def build_timeline(self, steps: Iterable[Dict], token_budget=None, first_number=1) -> str:
+        """Timeline text within `token_budget` tokens (default: the builder's budget).
+
+        Steps are numbered from `first_number`, so a phase keeps its session step numbers.
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        entries = self._entries(steps, first_number)
+        for entry in entries:
+            entry["tokens"] = estimate_tokens("\n".join(entry["lines"])) + 1
+
+        total_tokens = sum(e["tokens"] for e in entries)
+        if total_tokens <= budget:
+            kept = entries
+        else:
+            # Highest-signal entries first, leaving room for an omission marker after each
+            marker_tokens = estimate_tokens("... 10000 steps omitted ...") + 1
+            chosen = set()
+            used = 0
+            for i in sorted(range(len(entries)), key=lambda i: (-entries[i]["score"], i)):
+                cost = entries[i]["tokens"] + marker_tokens
+                if used + cost <= budget:
+                    chosen.add(i)
+                    used += cost
+            kept = [entries[i] for i in sorted(chosen)]
+
+        lines = []
+        next_step = first_number
+        for entry in kept:
+            if entry["first"] > next_step:
+                lines.append(f"... {entry['first'] - next_step} steps omitted ...")
+            lines.extend(entry["lines"])
+            next_step = entry["last"] + 1
+        last_step = entries[-1]["last"] if entries else first_number - 1
+        if last_step >= next_step:
+            lines.append(f"... {last_step - next_step + 1} steps omitted ...")
+
+        timeline = "\n".join(lines)
+        self.stats = {
+            "steps": last_step - first_number + 1,
+            "entries": len(entries),
+            "kept_entries": len(kept),
+            "shown_steps": sum(e["count"] for e in kept),
+            "timeline_tokens": estimate_tokens(timeline),
+            "full_timeline_tokens": total_tokens,
+            "token_budget": budget
+        }
+        return timeline
+
+    def split_phases(self, steps: Iterable[Dict], min_steps=40, max_steps=400) -> List[Dict]:
+        """Split steps into phases at window switches.
+
+        A phase ends at the first window switch after `min_steps` steps, or
+        after `max_steps` steps in any case. Cuts only depend on earlier
+        steps, so appending activity leaves all but the last phase unchanged.
+        """
+        phases = []
+        current = []
+        previous_window = None
+        for number, step in enumerate(steps, 1):
+            window_key = self.normalizer.key(step.get('window', 'Unknown window'))
+            switched = previous_window is not None and window_key != previous_window
+            if current and ((switched and len(current) >= min_steps) or len(current) >= max_steps):
+                phases.append({"first": number - len(current), "steps": current})
+                current = []
+            current.append(step)
+            previous_window = window_key
+        if current:
+            phases.append({"first": number - len(current) + 1, "steps": current})
+
+        for phase in phases:
+            phase["last"] = phase["first"] + len(phase["steps"]) - 1
+            apps = []
+            for step in phase["steps"]:
+                app = self.normalizer.app(step.get('window'))
+                if app not in apps:
+                    apps.append(app)
+            phase["apps"] = apps
+        return phases
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    print("Prompt Builder Benchmark")
+
+    random.seed(0)
+    steps = []
+    for i in range(5000):
+        window = random.choice(["Report.xlsx - Excel", "Inbox (3) - Outlook", "CRM - Google Chrome"])
+        if random.random() < 0.5:
+            label = random.choice(["Save", "Next", "Reply", "Search"])
+            steps.append({"window": window, "action_type": "mouse_click",
+                          "summary": f"Clicked '{label}' in {window}",
+                          "click": {"label": label, "element": {"control_type": "Button"}}})
+        else:
+            keys = [random.choice("abcdef") for _ in range(random.randint(1, 40))] + ["Ctrl + s"]
+            steps.append({"window": window, "action_type": "key_press", "keys": keys,
+                          "summary": f"Typed: {' '.join(keys)} in {window}"})
+
+    for budget in (500, 1500, 100000):
+        builder = PromptBuilder(token_budget=budget)
+        start = time.perf_counter()
+        timeline = builder.build_timeline(steps)
+        elapsed = time.perf_counter() - start
+        print(f"budget {budget}: {builder.stats['shown_steps']}/{builder.stats['steps']} steps shown, "
+              f"{builder.stats['timeline_tokens']} of {builder.stats['full_timeline_tokens']} tokens, "
+              f"{elapsed*1000:.0f} ms")
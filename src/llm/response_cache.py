@@ -0,0 +1,158 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access);
+"""
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes don't miss the cache"""
+    return " ".join(prompt.split())
+
+def cache_key(model, prompt, options=None) -> str:
+    payload = json.dumps(
+        {"model": model, "prompt": normalize_prompt(prompt), "options": options or {}},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """On-disk cache of LLM responses keyed by model, prompt and options.
+
+    Entries expire after `ttl` seconds, and the least recently used ones are
+    evicted once the stored responses exceed `max_bytes`. Each operation
+    opens its own short-lived connection, so the file can be deleted by
+    clear_all_data at any time.
+    """
+
+    def __init__(self, db_path="data/cache/llm_responses.db", max_bytes=20*1024*1024, ttl=7*86400):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path))
+        conn.executescript(SCHEMA)
+        return conn
+
+    def get(self, model, prompt, options=None) -> Optional[str]:
+        key = cache_key(model, prompt, options)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    row = conn.execute(
+                        "SELECT response, created FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and now - row[1] > self.ttl:
+                        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        row = None
+                    if row is not None:
+                        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            finally:
+                conn.close()
+
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, model, prompt, response: str, options=None):
+        key = cache_key(model, prompt, options)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, model, response, created, last_access, size) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, model, response, now, now, size)
+                    )
+                    self._evict(conn, now)
+            finally:
+                conn.close()
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Oldest access first until the cache fits again
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        evict = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evict.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", evict)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM responses")
+            finally:
+                conn.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            conn = self._connect()
+            try:
+                entries, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+            finally:
+                conn.close()
+
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits/lookups, 3) if lookups else None,
+                "entries": entries,
+                "bytes": size
+            }
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("Response Cache Test")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(Path(tmp)/"responses.db", max_bytes=50_000)
+
+        start = time.perf_counter()
+        for i in range(100):
+            cache.put("tinyllama", f"prompt {i}", "x"*1000)
+        print(f"100 puts in {(time.perf_counter() - start)*1000:.0f} ms")
+
+        start = time.perf_counter()
+        found = sum(cache.get("tinyllama", f"  prompt\n{i} ") is not None for i in range(100))
+        print(f"100 gets in {(time.perf_counter() - start)*1000:.0f} ms, {found} hits after eviction")
+        print(cache.stats())
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from typing import Dict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+class OllamaTransport:
+    """Pooled HTTP session for the Ollama API.
+
+    Connections are reused across calls, and failed connects or 502/503/504
+    responses are retried with exponential backoff. `preload` loads a model
+    ahead of time and `keep_alive` keeps it loaded between requests.
+    """
+
+    def __init__(self, base_url="http://localhost:11434", pool_size=4, retries=3,
+                 backoff=0.5, keep_alive="30m"):
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Results of the last preload
+        self.load_stats = {}
+        self._preload_thread = None
+
+    def close(self):
+        self.session.close()
+
+    def post(self, path, payload: Dict, stream=False, timeout=(10, 600)) -> requests.Response:
+        """POST to the API, asking Ollama to keep the model loaded afterwards"""
+        payload = {"keep_alive": self.keep_alive, **payload}
+        return self.session.post(f"{self.base_url}{path}", json=payload, stream=stream, timeout=timeout)
+
+    def preload(self, model, timeout=300) -> Dict:
+        """Load `model` into memory without generating anything.
+
+        Returns wall time and the server-side load time, which is near zero
+        when the model was already loaded.
+        """
+        start = time.perf_counter()
+        stats = {"model": model, "ok": False}
+        try:
+            response = self.post("/api/generate", {"model": model}, timeout=(10, timeout))
+            response.raise_for_status()
+            result = response.json()
+            stats["ok"] = True
+            stats["load_seconds"] = round(result.get("load_duration", 0)/1e9, 3)
+        except requests.exceptions.RequestException as e:
+            stats["error"] = str(e)
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        self.load_stats = stats
+        return stats
+
+    def preload_async(self, model) -> threading.Thread:
+        """Start loading `model` in the background, e.g. while a session is still recording"""
+        thread = threading.Thread(target=self.preload, args=(model,), daemon=True)
+        thread.start()
+        self._preload_thread = thread
+        return thread
+
+    def wait_for_preload(self, timeout=None):
+        if self._preload_thread is not None:
+            self._preload_thread.join(timeout)
+
+    def unload(self, model):
+        """Free the model's memory on the server right away"""
+        try:
+            self.post("/api/generate", {"model": model, "keep_alive": 0}, timeout=(10, 60)).close()
+        except requests.exceptions.RequestException as e:
+            logger.error("Error unloading %s: %s", model, e)
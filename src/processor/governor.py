@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from ..utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ["normal", "elevated", "high", "critical"]
+
+# A level applies once any metric reaches its threshold. process_cpu is a
+# multiple of the CPU budget; system_cpu and memory are percentages.
+DEFAULT_POLICY = {
+    "thresholds": {
+        "elevated": {"process_cpu": 1.0, "system_cpu": 75, "memory": 80},
+        "high": {"process_cpu": 1.5, "system_cpu": 90, "memory": 88},
+        "critical": {"process_cpu": 2.5, "system_cpu": 98, "memory": 95}
+    },
+    "actions": {
+        "normal": {"screenshot_interval_factor": 1, "defer_ocr": False, "beam_size": 5,
+                   "pause_screenshots": False, "pause_transcription": False},
+        "elevated": {"screenshot_interval_factor": 2, "defer_ocr": True, "beam_size": 5,
+                     "pause_screenshots": False, "pause_transcription": False},
+        "high": {"screenshot_interval_factor": 4, "defer_ocr": True, "beam_size": 1,
+                 "pause_screenshots": False, "pause_transcription": False},
+        "critical": {"screenshot_interval_factor": 4, "defer_ocr": True, "beam_size": 1,
+                     "pause_screenshots": True, "pause_transcription": True}
+    },
+    # Consecutive calmer samples needed before stepping down one level
+    "calm_samples": 3
+}
+
+class ResourceSampler:
+    """Process and system CPU/memory usage, with or without psutil.
+
+    psutil is optional. Without it, process CPU comes from time.process_time,
+    system CPU from the load average where the OS has one, and memory is
+    reported as unknown (None).
+    """
+
+    def __init__(self):
+        self.cpu_count = os.cpu_count() or 1
+        try:
+            import psutil
+            self._psutil = psutil
+            self._process = psutil.Process()
+            # The first calls only set the baseline for the next ones
+            self._process.cpu_percent(None)
+            psutil.cpu_percent(None)
+        except ImportError:
+            self._psutil = None
+            self._process = None
+        self._last_wall = time.perf_counter()
+        self._last_cpu = time.process_time()
+
+    @property
+    def backend(self):
+        return "psutil" if self._psutil is not None else "process_time"
+
+    def sample(self) -> Dict:
+        """CPU as a percentage of the whole machine, memory as a percentage of RAM"""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        elapsed = max(wall - self._last_wall, 1e-6)
+
+        if self._psutil is not None:
+            process_cpu = self._process.cpu_percent(None)/self.cpu_count
+            system_cpu = self._psutil.cpu_percent(None)
+            memory = self._psutil.virtual_memory().percent
+            rss_mb = self._process.memory_info().rss/1e6
+        else:
+            process_cpu = (cpu - self._last_cpu)/elapsed*100/self.cpu_count
+            system_cpu = None
+            if hasattr(os, "getloadavg"):
+                system_cpu = min(100.0, os.getloadavg()[0]/self.cpu_count*100)
+            memory = None
+            rss_mb = None
+
+        self._last_wall = wall
+        self._last_cpu = cpu
+        return {
+            "process_cpu": round(process_cpu, 1),
+            "system_cpu": None if system_cpu is None else round(system_cpu, 1),
+            "memory": memory,
+            "rss_mb": None if rss_mb is None else round(rss_mb, 1)
+        }
+
+class ResourceGovernor:
+    """Throttle the recorders so the assistant stays within a CPU budget.
+
+    Every `interval` seconds the governor samples resource usage, picks a
+    load level from the policy thresholds and applies that level's actions:
+    - stretch the screenshot interval
+    - defer OCR until the load drops
+    - switch Whisper to greedy decoding
+    - pause screenshots and transcription
+
+    Levels rise as soon as a threshold is crossed and fall one step at a
+    time after `calm_samples` calmer samples. Every level change is logged
+    and kept in `decisions`. `cpu_budget` is a percentage of the whole
+    machine, and recorders that are None are skipped.
+    """
+
+    def __init__(self, screen_recorder=None, event_tracker=None, audio_recorder=None, cpu_budget=25.0,
+                 interval=2.0, policy: Dict = None, sampler: ResourceSampler = None):
+        self.screen_recorder = screen_recorder
+        self.event_tracker = event_tracker
+        self.audio_recorder = audio_recorder
+        self.cpu_budget = cpu_budget
+        self.interval = interval
+        self.policy = self.merge_policy(policy)
+        self.sampler = sampler or ResourceSampler()
+
+        self.level = "normal"
+        self.decisions: List[Dict] = []
+        self.samples = 0
+        self.peak = {}
+        self._calm = 0
+        self._base_interval = screen_recorder.interval if screen_recorder is not None else None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def merge_policy(policy: Optional[Dict]) -> Dict:
+        """DEFAULT_POLICY with the given overrides applied per level"""
+        merged = json.loads(json.dumps(DEFAULT_POLICY))
+        for section in ("thresholds", "actions"):
+            for level, values in ((policy or {}).get(section) or {}).items():
+                merged[section].setdefault(level, {}).update(values)
+        if policy and "calm_samples" in policy:
+            merged["calm_samples"] = policy["calm_samples"]
+        return merged
+
+    @classmethod
+    def load_policy(cls, policy_file="config/governor_policy.json") -> Dict:
+        """Policy overrides from a JSON file, or the defaults when there is none"""
+        path = Path(policy_file)
+        if not path.exists():
+            return cls.merge_policy(None)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.merge_policy(json.load(f))
+
+    def _target_level(self, sample) -> str:
+        target = "normal"
+        for level in LEVELS[1:]:
+            thresholds = self.policy["thresholds"].get(level, {})
+            crossed = sample["process_cpu"] >= thresholds.get("process_cpu", float("inf"))*self.cpu_budget
+            for metric in ("system_cpu", "memory"):
+                value = sample.get(metric)
+                if value is not None and value >= thresholds.get(metric, float("inf")):
+                    crossed = True
+            if crossed:
+                target = level
+        return target
+
+    def step(self) -> str:
+        """Take one sample and apply the resulting level; returns the level"""
+        sample = self.sampler.sample()
+        self.samples += 1
+        for metric, value in sample.items():
+            if value is not None:
+                metrics.gauge(f"resource_{metric}").set(value)
+                if value > self.peak.get(metric, float("-inf")):
+                    self.peak[metric] = value
+
+        target = self._target_level(sample)
+        current = LEVELS.index(self.level)
+        wanted = LEVELS.index(target)
+        if wanted > current:
+            self._calm = 0
+            self._set_level(target, sample)
+        elif wanted < current:
+            self._calm += 1
+            if self._calm >= self.policy["calm_samples"]:
+                self._calm = 0
+                self._set_level(LEVELS[current - 1], sample)
+        else:
+            self._calm = 0
+        return self.level
+
+    def _set_level(self, level, sample, reason="load"):
+        previous = self.level
+        self.level = level
+        metrics.gauge("governor_level").set(LEVELS.index(level))
+        actions = self.apply(self.policy["actions"][level])
+        decision = {
+            "time": datetime.now().isoformat(),
+            "from": previous,
+            "to": level,
+            "reason": reason,
+            "sample": sample,
+            "actions": actions
+        }
+        self.decisions.append(decision)
+        usage = ", ".join(f"{name} {sample[metric]}%" for metric, name in
+                          (("process_cpu", "process CPU"), ("system_cpu", "system CPU"), ("memory", "memory"))
+                          if sample.get(metric) is not None)
+        logger.info("Governor: %s -> %s (%s): %s", previous, level, usage, ", ".join(actions) or "no change")
+
+    def apply(self, actions: Dict) -> List[str]:
+        """Apply one level's actions to the recorders; returns what changed"""
+        changes = []
+        screen = self.screen_recorder
+        if screen is not None:
+            interval = self._base_interval*actions.get("screenshot_interval_factor", 1)
+            if screen.interval != interval:
+                screen.interval = interval
+                changes.append(f"screenshot interval {interval}s")
+            pause = actions.get("pause_screenshots", False)
+            if pause != screen.is_paused and screen.is_recording:
+                screen.pause() if pause else screen.resume()
+                changes.append("screenshots paused" if pause else "screenshots resumed")
+
+        tracker = self.event_tracker
+        if tracker is not None:
+            defer = actions.get("defer_ocr", False)
+            if defer != tracker.ocr_deferred:
+                tracker.defer_ocr() if defer else tracker.resume_ocr()
+                changes.append("OCR deferred" if defer else "OCR resumed")
+
+        audio = self.audio_recorder
+        if audio is not None:
+            beam_size = actions.get("beam_size", 5)
+            if audio.beam_size != beam_size:
+                audio.beam_size = beam_size
+                changes.append("greedy transcription" if beam_size == 1 else f"beam size {beam_size}")
+            pause = actions.get("pause_transcription", False)
+            if pause != audio.transcription_paused:
+                audio.pause_transcription() if pause else audio.resume_transcription()
+                changes.append("transcription paused" if pause else "transcription resumed")
+        return changes
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                logger.error("Governor error: %s", e)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="resource-governor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and undo all throttling, e.g. to transcribe deferred audio"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.level != "normal":
+            self._set_level("normal", self.sampler.sample(), reason="stopped")
+
+    def summary(self) -> Dict:
+        return {
+            "backend": self.sampler.backend,
+            "cpu_budget": self.cpu_budget,
+            "samples": self.samples,
+            "level": self.level,
+            "max_level": max((d["to"] for d in self.decisions), key=LEVELS.index, default="normal"),
+            "decisions": len(self.decisions),
+            "peak": self.peak
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from types import SimpleNamespace
+
+    print("Resource Governor Test")
+
+    # Recorder stand-ins with the attributes the governor drives
+    screen = SimpleNamespace(interval=2, is_paused=False, is_recording=True)
+    screen.pause = lambda: setattr(screen, "is_paused", True)
+    screen.resume = lambda: setattr(screen, "is_paused", False)
+    tracker = SimpleNamespace(ocr_deferred=False)
+    tracker.defer_ocr = lambda: setattr(tracker, "ocr_deferred", True)
+    tracker.resume_ocr = lambda: setattr(tracker, "ocr_deferred", False)
+    audio = SimpleNamespace(beam_size=5, transcription_paused=False)
+    audio.pause_transcription = lambda: setattr(audio, "transcription_paused", True)
+    audio.resume_transcription = lambda: setattr(audio, "transcription_paused", False)
+
+    # A budget of one tenth of a core so a busy loop overshoots it
+    budget = 10/(os.cpu_count() or 1)
+    governor = ResourceGovernor(screen, tracker, audio, cpu_budget=budget, interval=0.2)
+    print(f"Sampling with {governor.sampler.backend}, budget {budget:.1f}% of the machine")
+
+    end = time.perf_counter() + 1.0
+    next_step = time.perf_counter() + 0.2
+    while time.perf_counter() < end:
+        sum(i*i for i in range(10000))
+        if time.perf_counter() >= next_step:
+            governor.step()
+            next_step += 0.2
+    print(f"Busy: level {governor.level}, screenshot interval {screen.interval}s, "
+          f"beam size {audio.beam_size}, OCR deferred {tracker.ocr_deferred}")
+
+    for _ in range(12):
+        time.sleep(0.2)
+        governor.step()
+    print(f"Idle: level {governor.level}, screenshot interval {screen.interval}s, "
+          f"beam size {audio.beam_size}, OCR deferred {tracker.ocr_deferred}")
+    print(governor.summary())
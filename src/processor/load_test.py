@@ -0,0 +1,164 @@
+import json
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+from .session import Session
+from ..llm.mock_server import MockOllamaServer
+from ..llm.ollama_client import OllamaClient
+from ..llm.response_cache import ResponseCache
+from ..recorder.sources import replay_sources, synthetic_sources
+from ..storage.audio_archive import AudioArchive
+from ..storage.event_store import EventStore
+from ..utils.metrics import metrics
+
+class LoadTest:
+    """Run a whole recording session headless on replayed or synthetic input.
+
+    Synthetic input is the same for the same seed. With `replay_session`, a
+    session captured in `source_db` (and the audio archive) is fed back
+    instead. `speed` is a multiple of real time, or None for as fast as
+    possible. Suggestions come from a local mock Ollama server unless a `url`
+    is given, and an empty response cache is used, so every run measures the
+    whole pipeline. Sessions are written to their own store under
+    `output_dir`, away from the real ones.
+    """
+
+    def __init__(self, duration=60.0, speed=None, seed=0, event_rate=4.0, frame_interval=1.0,
+                 record_audio=True, replay_session=None, source_db="data/assistant.db",
+                 audio_archive_dir="data/audio/archive", cpu_budget=25.0, screenshot_interval=None,
+                 profile: Dict = None, url=None, output_dir="data/load_test"):
+        self.duration = duration
+        self.speed = speed
+        self.seed = seed
+        self.event_rate = event_rate
+        self.frame_interval = frame_interval
+        self.record_audio = record_audio
+        self.replay_session = replay_session
+        self.source_db = source_db
+        self.audio_archive_dir = audio_archive_dir
+        self.cpu_budget = cpu_budget
+        # By default frames are captured as often as the input provides them
+        if screenshot_interval is None:
+            screenshot_interval = frame_interval/speed if speed else 0.01
+        self.screenshot_interval = screenshot_interval
+        self.profile = profile
+        self.url = url
+        self.output_dir = Path(output_dir)
+
+    def _sources(self) -> Dict:
+        if self.replay_session is None:
+            return synthetic_sources(self.duration, self.seed, self.speed, self.event_rate, self.frame_interval)
+        store = EventStore(self.source_db)
+        try:
+            archive = AudioArchive(self.audio_archive_dir) if self.record_audio else None
+            return replay_sources(store, self.replay_session, self.speed, archive)
+        finally:
+            store.close()
+
+    def _percentiles(self, name) -> Dict:
+        """p50/p99 of a histogram across all its labels, in milliseconds"""
+        merged = {}
+        for entry in metrics.snapshot()["metrics"]:
+            if entry["name"] == name and entry["value"]["count"]:
+                label = ",".join(f"{k}={v}" for k, v in entry["labels"].items()) or "all"
+                merged[label] = {
+                    "count": entry["value"]["count"],
+                    "p50_ms": round(entry["value"]["p50"]*1000, 3),
+                    "p99_ms": round(entry["value"]["p99"]*1000, 3)
+                }
+        return merged
+
+    def run(self, output_file="data/benchmarks/load_test.json") -> Dict:
+        sources = self._sources()
+        mock = None
+        url = self.url
+        if url is None:
+            mock = MockOllamaServer(token_rate=200.0, seed=self.seed).start()
+            url = mock.url
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        store = EventStore(self.output_dir/"assistant.db")
+        with tempfile.TemporaryDirectory() as tmp:
+            client = OllamaClient(url, cache=ResponseCache(Path(tmp)/"responses.db"), timeline_dir=None)
+            session = Session(store=store, llm_client=client, screenshot_interval=self.screenshot_interval,
+                              output_dir=self.output_dir, record_audio=self.record_audio, ocr=False,
+                              cpu_budget=self.cpu_budget, profile=self.profile, sources=sources)
+            start = time.perf_counter()
+            session.start()
+            # Replays end on their own; the duration (at the replay speed) is only a safety net
+            limit = self.duration/self.speed*2 + 10 if self.speed else None
+            session.wait(limit, interval=0.2)
+            capture_seconds = time.perf_counter() - start
+            result = session.finish()
+            client.transport.close()
+        store.close()
+        if mock is not None:
+            mock.stop()
+
+        summary = result["summary"]
+        report = {
+            "generated_at": datetime.now().isoformat(),
+            "input": f"replay of {self.replay_session}" if self.replay_session else f"synthetic, seed {self.seed}",
+            "speed": self.speed,
+            "session_id": result["session_id"],
+            "completed": session.sources_finished(),
+            "capture_seconds": round(capture_seconds, 3),
+            "events": summary["total_events"],
+            "events_per_second": round(summary["total_events"]/capture_seconds, 1) if capture_seconds else None,
+            "screenshots": session.screen_recorder.screenshots_taken,
+            "audio_chunks": session.audio_recorder.chunks_recorded if session.audio_recorder is not None else 0,
+            "hybrid_suggestions": len(result["hybrid_suggestions"]),
+            "timings": result["timings"],
+            "stages": result["stages"],
+            "governor": result["governor"],
+            "capture_callback": self._percentiles("capture_callback_seconds"),
+            "stage_item": self._percentiles("stage_item_seconds"),
+            "frame_encode": self._percentiles("frame_encode_seconds")
+        }
+        if result.get("profile"):
+            report["profile"] = result["profile"]["folder"]
+
+        print(f"{report['input']} at {'max' if self.speed is None else f'{self.speed}x'} speed: "
+              f"{report['events']} events in {report['capture_seconds']}s ({report['events_per_second']} events/s), "
+              f"{report['screenshots']} screenshots, {report['audio_chunks']} audio chunks")
+        print(f"Stop to suggestions: {result['timings']['stop_to_suggestions']}s, "
+              f"highest load level {result['governor']['max_level']}, "
+              f"analysis queue peak {result['stages']['analysis']['max_queue']}")
+        for label, values in report["capture_callback"].items():
+            print(f"    capture callback {label}: p50 {values['p50_ms']} ms, p99 {values['p99_ms']} ms")
+
+        if output_file:
+            Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Load test saved to {output_file}")
+        return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="Headless load test of the recording pipeline")
+    parser.add_argument("--replay", metavar="SESSION_ID", help="Replay a captured session instead of synthetic input")
+    parser.add_argument("--source-db", default="data/assistant.db", help="Event store holding the replayed session")
+    parser.add_argument("--speed", type=float, help="Multiple of real time; as fast as possible when omitted")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of synthetic input")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--event-rate", type=float, default=4.0, help="Synthetic events per second")
+    parser.add_argument("--no-audio", action="store_true")
+    parser.add_argument("--cpu-budget", type=float, default=25.0)
+    parser.add_argument("--profile", action="store_true", help="Profile the recorder threads into data/profiles/")
+    parser.add_argument("--url", help="Ollama URL; a local mock server is started when omitted")
+    parser.add_argument("--output", default="data/benchmarks/load_test.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+
+    LoadTest(
+        duration=args.duration, speed=args.speed, seed=args.seed, event_rate=args.event_rate,
+        record_audio=not args.no_audio, replay_session=args.replay, source_db=args.source_db, cpu_budget=args.cpu_budget,
+        profile={} if args.profile else None, url=args.url
+    ).run(args.output)
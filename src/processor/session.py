@@ -0,0 +1,406 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+from ..analyzer.activity_analyzer import ActivityAnalyzer
+from ..analyzer.workflow_io import WorkflowReader
+from ..llm.ollama_client import OllamaClient
+from ..storage.event_store import EventStore
+from .governor import ResourceGovernor
+from ..utils.metrics import MetricsExporter, metrics
+from ..utils.profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+_CLOSE = object()
+
+class Stage:
+    """Worker thread applying `handler` to each item put on its queue.
+
+    Items are handled in order on the stage's own thread, so a slow handler
+    never blocks the thread that produced the item (e.g. the input hooks).
+    A full queue (see `maxsize`) blocks put(), or with `drop_when_full`
+    drops the new item instead.
+    """
+
+    def __init__(self, name, handler: Callable, maxsize=0, drop_when_full=False):
+        self.name = name
+        self.handler = handler
+        self._handle = handler
+        self.queue = queue.Queue(maxsize)
+        self.drop_when_full = drop_when_full
+
+        self.items = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_queue = 0
+        self._thread = threading.Thread(target=self._run, name=f"stage-{name}", daemon=True)
+
+    def start(self):
+        # Profiled per item, so a slow-call threshold applies to each one
+        self._handle = profiler.wrap(self.handler, f"stage.{self.name}")
+        self._thread.start()
+        return self
+
+    def put(self, item):
+        if not self.drop_when_full:
+            self.queue.put(item)
+        else:
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+                metrics.counter("stage_dropped_total", stage=self.name).inc()
+                return
+        self.max_queue = max(self.max_queue, self.queue.qsize())
+
+    def close(self, timeout=None) -> bool:
+        """Handle everything already queued, then stop the worker; False if it is still busy after `timeout`"""
+        self.queue.put(_CLOSE)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _CLOSE:
+                return
+            start = time.perf_counter()
+            try:
+                self._handle(item)
+            except Exception as e:
+                self.errors += 1
+                logger.error("%s stage error: %s", self.name, e)
+            elapsed = time.perf_counter() - start
+            self.busy_seconds += elapsed
+            self.items += 1
+            metrics.histogram("stage_item_seconds", stage=self.name).record(elapsed)
+            metrics.gauge("stage_queue_depth", stage=self.name).set(self.queue.qsize())
+
+    def stats(self) -> Dict:
+        return {
+            "items": self.items,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "max_queue": self.max_queue
+        }
+
+class Session:
+    """One recording session run as a pipeline of stages.
+
+    - capture: the recorders run until stop(), cancel() or the duration ends
+    - analysis: events reach the live analysis and template matcher through
+      a queue while recording, off the input hook threads
+    - ocr / transcription: OCR the governor held back and audio chunks are
+      read through their own queues while recording
+    - finalize: the workflow file is written from the live analysis
+    - patterns / llm: hybrid pattern detection runs alongside the LLM call
+    - report: suggestions are saved next to the workflow
+
+    Recorder modules (and their input, screen and audio libraries) are only
+    imported when a session is created; with `record_audio=False` or
+    `ocr=False` those components are never imported at all.
+
+    While recording, a ResourceGovernor throttles the recorders to keep the
+    assistant within `cpu_budget` percent of the machine's CPU; its policy is
+    read from config/governor_policy.json when that file exists. It lives
+    outside data/, so clearing the recorded data keeps it.
+
+    stop() ends the recording right away and moves on to the suggestions;
+    cancel() also stops a running LLM answer and skips the remaining stages.
+    `timings` holds each stage's wall time in seconds, including
+    "stop_to_suggestions".
+
+    `profile` turns on the profiler for the recorder threads, input
+    callbacks and analysis stage, with these options for profiler.start,
+    e.g. {"slow_ms": 20}; the profiles are written when the session ends.
+
+    `sources` replaces live input with other sources by recorder: "events",
+    "frames" and "audio" (see src/recorder/sources.py), e.g. to replay a
+    captured session or run on synthetic input headless. wait() also
+    returns once every given source has played out.
+    """
+
+    def __init__(self, store=None, similarity_index=None, llm_client=None, screenshot_interval=2,
+                 output_dir="data", record_audio=True, ocr=True, cpu_budget=25.0, profile: Dict = None,
+                 sources: Dict = None):
+        from ..recorder.event_tracker import EventTracker
+        from ..recorder.screen_recorder import ScreenRecorder
+
+        self.store = store if store is not None else EventStore()
+        self.output_dir = Path(output_dir)
+        self.sources = dict(sources or {})
+        if not record_audio:
+            self.sources.pop("audio", None)
+
+        self.event_tracker = EventTracker(store=self.store, ocr=ocr, source=self.sources.get("events"))
+        self.session_id = self.event_tracker.session_id
+        self.screen_recorder = ScreenRecorder(interval=screenshot_interval, store=self.store,
+                                              session_id=self.session_id, source=self.sources.get("frames"))
+        self.audio_recorder = None
+        if record_audio:
+            from ..recorder.audio_recorder import AudioRecorder
+            self.audio_recorder = AudioRecorder(store=self.store, session_id=self.session_id,
+                                                source=self.sources.get("audio"))
+
+        self.governor = ResourceGovernor(
+            self.screen_recorder, self.event_tracker, self.audio_recorder,
+            cpu_budget=cpu_budget, policy=ResourceGovernor.load_policy()
+        )
+
+        self.analyzer = ActivityAnalyzer(store=self.store, similarity_index=similarity_index)
+        self.live_analysis = self.analyzer.create_stream()
+        self.template_matcher = self.analyzer.create_matcher(stream=self.live_analysis)
+        self.analysis_stage = Stage("analysis", self._analyze_event)
+        self.event_tracker.add_listener(self.analysis_stage.put)
+        # OCR held back by the governor is read here once it resumes; the
+        # queue is bounded like the tracker's own, so a backlog can't pile up
+        self.ocr_stage = Stage("ocr", self.event_tracker.process_ocr,
+                               maxsize=self.event_tracker.max_deferred_ocr, drop_when_full=True)
+        self.event_tracker.ocr_handler = self.ocr_stage.put
+        self.transcription_stage = None
+        if self.audio_recorder is not None:
+            self.transcription_stage = Stage("transcription", self.audio_recorder.transcribe_chunk)
+            self.audio_recorder.transcription_handler = self.transcription_stage.put
+        # Longest wait for queued transcriptions when the session ends
+        self.transcription_timeout = 60.0
+
+        self.llm_client = llm_client or OllamaClient()
+
+        # idle -> recording -> analyzing -> generating -> done / cancelled
+        self.state = "idle"
+        self.timings = {}
+        self.result = None
+        self.cancel_event = threading.Event()
+        self._stopped = threading.Event()
+        self._started_at = None
+        self._started_on = None
+
+        # Metrics are written to data/metrics/ while the session runs
+        self.exporter = MetricsExporter(interval=10.0)
+        self.profile = profile
+
+    def _analyze_event(self, event):
+        self.live_analysis.consume(event)
+        self.template_matcher.consume(event)
+
+    @contextmanager
+    def _timed(self, stage):
+        """Time a stage into `timings` and trace it as a "session.<stage>" span"""
+        start = time.perf_counter()
+        try:
+            with metrics.span(f"session.{stage}", session_id=self.session_id):
+                yield
+        finally:
+            self.timings[stage] = round(time.perf_counter() - start, 3)
+
+    @property
+    def recorders(self) -> List:
+        recorders = [self.screen_recorder, self.event_tracker]
+        if self.audio_recorder is not None:
+            recorders.append(self.audio_recorder)
+        return recorders
+
+    @property
+    def stages(self) -> List[Stage]:
+        stages = [self.analysis_stage, self.ocr_stage]
+        if self.transcription_stage is not None:
+            stages.append(self.transcription_stage)
+        return stages
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def sources_finished(self):
+        """True once every replayed or synthetic source has played out"""
+        return bool(self.sources) and all(source.finished() for source in self.sources.values())
+
+    def start(self):
+        """Start the recorders, and load the LLM while they run"""
+        self.llm_client.preload()
+        if self.profile is not None:
+            # Before the recorders start, so their threads get wrapped
+            profiler.start(**self.profile)
+        for stage in self.stages:
+            stage.start()
+        for recorder in self.recorders:
+            recorder.start()
+        self.governor.start()
+        self.exporter.start()
+        self._started_at = time.perf_counter()
+        self._started_on = datetime.now()
+        self.state = "recording"
+
+    def stop(self):
+        """End the recording; wait() returns immediately"""
+        self._stopped.set()
+
+    def cancel(self):
+        """Stop the recording and any LLM answer, skipping the remaining stages"""
+        self.cancel_event.set()
+        self._stopped.set()
+
+    def wait(self, duration=None, on_progress: Callable = None, interval=1.0):
+        """Block until `duration` seconds have passed, the session is stopped or its sources finished.
+
+        `on_progress(snapshot)` receives the live analysis every `interval` seconds.
+        """
+        end_time = None if duration is None else time.time() + duration
+        while True:
+            timeout = interval if end_time is None else min(interval, end_time - time.time())
+            if timeout <= 0 or self._stopped.wait(timeout) or self.sources_finished():
+                return
+            if on_progress is not None:
+                on_progress(self.live_analysis.snapshot())
+
+    def stats(self) -> Dict:
+        """Live capture counters, cheap enough to poll several times a second"""
+        snapshot = self.live_analysis.snapshot()
+        elapsed = time.perf_counter() - self._started_at if self._started_at is not None else 0.0
+        return {
+            "state": self.state,
+            "elapsed": round(elapsed, 1),
+            "events": snapshot["total_events"],
+            "steps": snapshot["total_steps"],
+            "screenshots": self.screen_recorder.screenshots_taken,
+            "audio_chunks": self.audio_recorder.chunks_recorded if self.audio_recorder is not None else 0,
+            "analysis_queue": self.analysis_stage.queue.qsize(),
+            "ocr_queue": self.ocr_stage.queue.qsize(),
+            "transcription_queue": (self.transcription_stage.queue.qsize()
+                                    if self.transcription_stage is not None else 0),
+            "load_level": self.governor.level,
+            "template_matches": len(snapshot["template_matches"]),
+            "last_suggestion": snapshot["suggestions"][-1] if snapshot["suggestions"] else None
+        }
+
+    def _stop_recorders(self):
+        # Each stop() joins its thread, so stop them side by side
+        threads = [threading.Thread(target=recorder.stop, daemon=True) for recorder in self.recorders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def finish(self, on_token: Callable = None, on_status: Callable = None) -> Dict:
+        """Stop recording and run the remaining stages; returns the session result"""
+        status = on_status or (lambda text: None)
+        stopped_at = time.perf_counter()
+        self._stopped.set()
+        if self._started_at is not None:
+            self.timings["capture"] = round(stopped_at - self._started_at, 3)
+            metrics.add_span("session.capture", stopped_at - self._started_at, start=self._started_on,
+                             session_id=self.session_id)
+
+        self.state = "analyzing"
+        status("Stopping recorders...")
+        with self._timed("stop"):
+            # Lifting the throttling also hands deferred audio to Whisper
+            self.governor.stop()
+            self._stop_recorders()
+        with self._timed("analysis_drain"):
+            # Stopping the tracker handed any deferred OCR to its stage
+            self.analysis_stage.close()
+            self.ocr_stage.close()
+        if self.transcription_stage is not None:
+            # The workflow's step context includes the transcripts, deferred
+            # chunks the governor just released among them
+            with self._timed("transcription_drain"):
+                if not self.transcription_stage.close(self.transcription_timeout):
+                    logger.warning("Transcription still running after %ss; the workflow misses its last chunks.",
+                                   self.transcription_timeout)
+
+        status("Writing workflow...")
+        with self._timed("finalize"):
+            workflow_file = self.analyzer.write_workflow(
+                self.output_dir/f"workflow_{self.session_id}.ndjson",
+                self.session_id,
+                stream=self.live_analysis
+            )
+
+        result = {
+            "session_id": self.session_id,
+            "workflow_file": workflow_file,
+            "suggestions": "",
+            "hybrid_suggestions": [],
+            "suggestions_file": None
+        }
+        with WorkflowReader(workflow_file) as workflow:
+            result["summary"] = workflow["summary"]
+
+            if not self.cancelled:
+                # Pattern detection is CPU work; the LLM call mostly waits on Ollama
+                patterns = threading.Thread(target=profiler.wrap(self._detect_patterns, "patterns"),
+                                            args=(result, workflow.get("similar_workflows")),
+                                            daemon=True)
+                patterns.start()
+
+                self.state = "generating"
+                status("Generating suggestions...")
+                with self._timed("llm"):
+                    result["suggestions"] = self.llm_client.generate_suggestions(
+                        workflow, on_token=on_token, cancel_event=self.cancel_event
+                    )
+                patterns.join()
+
+        if not self.cancelled:
+            with self._timed("report"):
+                result["suggestions_file"] = self._write_report(result)
+        self.timings["stop_to_suggestions"] = round(time.perf_counter() - stopped_at, 3)
+
+        self.state = "cancelled" if self.cancelled else "done"
+        result["cancelled"] = self.cancelled
+        result["timings"] = dict(self.timings)
+        result["stages"] = {stage.name: stage.stats() for stage in self.stages}
+        result["governor"] = self.governor.summary()
+        result["trace"] = [span for span in metrics.spans
+                           if span["attributes"].get("session_id") == self.session_id]
+        if self.profile is not None:
+            result["profile"] = profiler.stop()
+        self.exporter.stop()
+        self.result = result
+        return result
+
+    def _detect_patterns(self, result, similar_workflows):
+        with self._timed("patterns"):
+            # The workflow header already holds the similarity search
+            result["hybrid_suggestions"] = self.analyzer.detect_patterns_hybrid(
+                self.live_analysis.events, session_id=self.session_id, similar_workflows=similar_workflows
+            )
+
+    def run(self, duration, on_progress: Callable = None, on_token: Callable = None,
+            on_status: Callable = None) -> Dict:
+        """Record for up to `duration` seconds, then analyze and generate suggestions"""
+        self.start()
+        self.wait(duration, on_progress)
+        return self.finish(on_token, on_status)
+
+    def _write_report(self, result) -> Path:
+        """Save the LLM and hybrid suggestions side by side for comparison"""
+        suggestions_file = self.output_dir/f"automation_suggestions_{self.session_id}.txt"
+        hybrid_suggestions: List[str] = result["hybrid_suggestions"]
+        with open(suggestions_file, 'w', encoding='utf-8') as f:
+            f.write("="*60 + "\n")
+            f.write("AUTOMATION SUGGESTIONS - COMPARISON\n")
+            f.write("="*60 + "\n\n")
+
+            f.write("LLM-BASED SUGGESTIONS:\n")
+            f.write("-"*60 + "\n")
+            f.write(result["suggestions"])
+            f.write("\n\n" + "="*60 + "\n\n")
+
+            f.write("HYBRID PATTERN DETECTION:\n")
+            f.write("-"*60 + "\n")
+            if hybrid_suggestions:
+                f.write("\n".join(hybrid_suggestions))
+            else:
+                f.write("No patterns detected.")
+
+            f.write("\n\n" + "="*60 + "\n")
+        return suggestions_file
@@ -1,165 +1,251 @@
-import sounddevice as sd
+import logging
 import numpy as np
-import wave
 import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from faster_whisper import WhisperModel
+from .model_registry import model_registry
+from .sources import LiveAudioSource
+from ..storage.audio_archive import AudioArchive
+from ..utils.metrics import metrics
+from ..utils.profiling import profiler
+
+logger = logging.getLogger(__name__)
 
 class AudioRecorder:
-    """Record audio from mic and transcribe with Whisper"""
+    """Record audio from mic and transcribe with Whisper.
+
+    Audio comes from the microphone unless another `source` is given, e.g.
+    a ReplayAudioSource or SyntheticAudioSource.
+    """
 
-    def __init__(self, output_dir="data/audio", sample_rate=16000):
+    def __init__(self, output_dir="data/audio", sample_rate=16000, model_name="tiny",
+                 store=None, session_id=None, source=None):
         self.output_dir = Path(output_dir)
+        self.source = source if source is not None else LiveAudioSource()
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
+        # Optional EventStore receiving transcripts
+        self.store = store
+        self.session_id = session_id
+
         self.sample_rate = sample_rate
         self.chunk_duration = 10
         self.chunk_size = int(self.sample_rate*self.chunk_duration)
 
+        # Compressed, time-indexed audio instead of one WAV file per chunk
+        self.archive = AudioArchive(self.output_dir/"archive", sample_rate=self.sample_rate)
+
         # Control flags
         self.is_recording = False
         self.recording_thread = None
         self.frames = []
-
-        print("Loading Whisper model...")
-        self.whisper_model = WhisperModel("tiny", device="cpu", compute_type="int8")
-        print("Whisper model loaded!")
+        self._frames_lock = threading.Lock()
+        self.chunks_recorded = 0
+
+        # Tuned by the resource governor: beam_size 1 is greedy decoding, and
+        # while transcription is paused chunks wait until it is resumed
+        self.beam_size = 5
+        self.transcription_paused = False
+        self.deferred_chunks = []
+        self._deferred_lock = threading.Lock()
+
+        # Receives each (audio_data, start_time, archive_ref) chunk to
+        # transcribe, e.g. a pipeline stage's put; when None, every chunk is
+        # transcribed on its own thread
+        self.transcription_handler = None
+
+        # The model is shared across sessions and loads in the background, so
+        # recording can start right away. Chunks captured before it is ready
+        # wait in their transcription threads until it is.
+        self.model_name = model_name
+        model_registry.warm_up(self.model_name, device="cpu", compute_type="int8")
 
     def _audio_callback(self, indata, frames, time, status):
         """Function called for each audio chunk"""
 
         if status:
-            print(f"Audio status: {status}")
-
-        self.frames.append(indata.copy())
-
-    def _save_audio_chunk(self, audio_data, filename):
+            logger.warning("Audio status: %s", status)
+
+        self.feed(indata.copy())
+
+    def feed(self, block):
+        """Add a block of float32 samples shaped (frames, 1), as sounddevice delivers them"""
+        with self._frames_lock:
+            self.frames.append(block)
+
+    def _take_chunk(self):
+        """The next `chunk_size` samples, or None until that many are buffered"""
+        with self._frames_lock:
+            if sum(len(block) for block in self.frames) < self.chunk_size:
+                return None
+            audio_data = np.concatenate(self.frames, axis=0).flatten()
+            # Replayed audio can arrive faster than real time; keep the rest for the next chunk
+            rest = audio_data[self.chunk_size:]
+            self.frames = [rest.reshape(-1, 1)] if len(rest) else []
+        return audio_data[:self.chunk_size]
+
+    def _save_audio_chunk(self, audio_data, start_time):
+        """Append a chunk to the audio archive and return its archive reference"""
         try:
             audio_data = (audio_data*32767).astype(np.int16)
-
-            print(f"DEBUG: Saving to {filename}")
-            print(f"DEBIG: Audio data shape: {audio_data.shape}")
-
-            with wave.open(str(filename), "wb") as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(self.sample_rate)
-                wf.writeframes(audio_data.tobytes())
-            
-            print("DEBUG: File saved successfully")
-            return filename
+            return self.archive.append(audio_data, start_time)
         except Exception as e:
-            print(f"Error saving audio: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error saving audio: %s", e)
             return None
 
-    def _transcribe_audio(self, audio_file):
+    def _transcribe_audio(self, audio_data):
         try:
-            segments, info = self.whisper_model.transcribe(
-                str(audio_file),
+            whisper_model = model_registry.get(self.model_name, device="cpu", compute_type="int8")
+            if whisper_model is None:
+                logger.warning("Whisper model unavailable, skipping transcription")
+                return None
+
+            start = time.perf_counter()
+            segments, info = whisper_model.transcribe(
+                audio_data.astype(np.float32),
                 language="en",
-                beam_size=5
+                beam_size=self.beam_size
             )
 
+            # Segments are decoded lazily, so joining them is part of the work
             text = " ".join([segment.text for segment in segments])
+
+            # Real-time factor: seconds of compute per second of audio
+            seconds = time.perf_counter() - start
+            metrics.histogram("transcription_seconds", beam_size=self.beam_size).record(seconds)
+            metrics.histogram("transcription_rtf", beam_size=self.beam_size).record(
+                seconds/(len(audio_data)/self.sample_rate)
+            )
             return text.strip()
 
         except Exception as e:
-            print(f"Error transcribing: {e}")
+            logger.error("Error transcribing: %s", e)
             return None
 
     def _recording_loop(self):
-        print("Audio recording started...")
+        logger.debug("Audio chunk loop started")
 
         chunk_count = 0
         while self.is_recording:
-            while len(self.frames) < self.chunk_size/512:
-                if not self.is_recording:
-                    return
+            audio_data = self._take_chunk()
+            if audio_data is None:
                 threading.Event().wait(0.1)
-
-            chunk_frames = self.frames
-            self.frames = []
-
-            audio_data = np.concatenate(chunk_frames, axis=0)
-            audio_data = audio_data.flatten()
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            audio_file = self.output_dir/f"audio_{timestamp}.wav"
-            self._save_audio_chunk(audio_data, audio_file)
-
-            print(f"Saved audio chunk {chunk_count + 1}: {audio_file}")
-
-            threading.Thread(
-                target = self._process_transcription,
-                args = (audio_file,),
-                daemon = True
-            ).start()
+                continue
+
+            start_time = self.source.now().timestamp() - len(audio_data)/self.sample_rate
+            archive_ref = self._save_audio_chunk(audio_data, start_time)
+            if archive_ref:
+                logger.debug("Saved audio chunk %d: %s @ %s",
+                             chunk_count + 1, archive_ref['file'], archive_ref['offset'])
+            metrics.counter("audio_chunks_total").inc()
+
+            with self._deferred_lock:
+                if self.transcription_paused:
+                    self.deferred_chunks.append((audio_data, start_time, archive_ref))
+                    metrics.gauge("transcription_deferred_chunks").set(len(self.deferred_chunks))
+                else:
+                    self._start_transcription(audio_data, start_time, archive_ref)
 
             chunk_count += 1
+            self.chunks_recorded = chunk_count
         
-        print("Audio recording stopped!")
+        logger.debug("Audio chunk loop finished")
 
-    def _process_transcription(self, audio_file):
-        print(f"Transcribing {audio_file.name}...")
-
-        transcript = self._transcribe_audio(audio_file)
+    def _start_transcription(self, audio_data, start_time, archive_ref):
+        if self.transcription_handler is not None:
+            self.transcription_handler((audio_data, start_time, archive_ref))
+            return
+        threading.Thread(
+            target = profiler.wrap(self._process_transcription, "transcription"),
+            args = (audio_data, start_time, archive_ref),
+            daemon = True
+        ).start()
+
+    def transcribe_chunk(self, chunk):
+        """Transcribe one chunk handed to `transcription_handler`"""
+        self._process_transcription(*chunk)
+
+    def pause_transcription(self):
+        """Keep recording but hold chunks back from Whisper"""
+        with self._deferred_lock:
+            self.transcription_paused = True
+
+    def resume_transcription(self):
+        """Transcribe the chunks held back while paused"""
+        with self._deferred_lock:
+            self.transcription_paused = False
+            deferred = self.deferred_chunks
+            self.deferred_chunks = []
+        metrics.gauge("transcription_deferred_chunks").set(0)
+        for chunk in deferred:
+            self._start_transcription(*chunk)
+
+    def _process_transcription(self, audio_data, start_time, archive_ref):
+        chunk_start = datetime.fromtimestamp(start_time)
+        chunk_end = datetime.fromtimestamp(start_time + len(audio_data)/self.sample_rate)
+        logger.debug("Transcribing audio from %s...", chunk_start.strftime('%H:%M:%S'))
+
+        transcript = self._transcribe_audio(audio_data)
 
         if transcript:
-            print(f"Transcript: {transcript}")
+            logger.info("Transcript: %s", transcript)
 
             import json
-            transcript_file = self.output_dir/f"transcript_{audio_file.stem}.json"
+            # Microseconds keep names unique even for chunks in the same second
+            transcript_file = self.output_dir/f"transcript_{chunk_start.strftime('%Y%m%d_%H%M%S_%f')}.json"
             transcript_data = {
-                "audio_file": str(audio_file),
+                "session_id": self.session_id,
+                "archive": archive_ref,
+                "start": chunk_start.isoformat(),
+                "end": chunk_end.isoformat(),
                 "transcript": transcript,
                 "timestamp": datetime.now().isoformat()
             }
             with open(transcript_file, 'w', encoding='utf-8') as f:
                 json.dump(transcript_data, f, indent=2)
             
-            print(f"Saved transcript to {transcript_file}")
+            logger.debug("Saved transcript to %s", transcript_file)
+
+            if self.store is not None:
+                try:
+                    self.store.add_transcript(self.session_id, transcript_data)
+                except Exception as e:
+                    logger.error("Error writing transcript to store: %s", e)
         else:
-            print("No speech detected")
+            logger.debug("No speech detected")
 
     def start(self):
         if self.is_recording:
-            print("recording is already running.")
+            logger.warning("Audio recording is already running.")
             return
         
         self.is_recording = True
         self.frames = []
+        self.source.start(self)
 
-        self.stream = sd.InputStream(
-            samplerate = self.sample_rate,
-            channels = 1,
-            callback = self._audio_callback
-        )
-        self.stream.start()
-
-        self.recording_thread = threading.Thread(target=self._recording_loop, daemon=True)
+        self.recording_thread = threading.Thread(target=profiler.wrap(self._recording_loop, "audio_recorder"),
+                                                 daemon=True)
         self.recording_thread.start()
 
-        print("Audio recording started!")
+        logger.info("Audio recording started")
 
     def stop(self):
         if not self.is_recording:
-            print("Recording is not running!")
+            logger.warning("Audio recording is not running!")
 
         self.is_recording = False
-
-        if self.stream:
-            self.stream.stop()
-            self.stream.close()
+        self.source.stop()
 
         if self.recording_thread:
             self.recording_thread.join(timeout=5)
 
-        print("Audio recording stopped!")
+        logger.info("Audio recording stopped")
 
 if __name__ == "__main__":
+    # The package-relative imports need this run as a module from the
+    # repository root: python -m src.recorder.audio_recorder
+    logging.basicConfig(level=logging.INFO)
     print("Audio recorder started")
     print("Make sure your microphone is working")
 
@@ -169,10 +255,9 @@ if __name__ == "__main__":
 
     print("Recording for 15 seconds...")
     print("Speak into your microphone")
-    import time
     time.sleep(15)
 
     recorder.stop()
 
     print("Test complete")
-    print("Check 'data/audio' folder for audio files.")
\ No newline at end of file
+    print("Check 'data/audio/archive' folder for the audio archive.")
\ No newline at end of file
@@ -1,34 +1,49 @@
 import json
+import logging
 import time
 import re
 import threading
+from collections import deque
 from datetime import datetime
 from pathlib import Path
-from pynput import mouse, keyboard
-import pygetwindow as gw
-import pytesseract
-from PIL import Image,ImageGrab
-import uiautomation as auto
+from .sources import LiveEventSource
+from ..utils.metrics import metrics
+from ..utils.profiling import profiler
 
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+logger = logging.getLogger(__name__)
+
+TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+def _load_tesseract():
+    """Import pytesseract on first OCR use; it is not needed when OCR is off"""
+    import pytesseract
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return pytesseract
 
 class EventTracker:
-    """Captures mouse, keyboard and window events"""
-    def __init__(self, output_dir="data/events"):
+    """Captures mouse, keyboard and window events.
+
+    Events come from the live mouse and keyboard hooks unless another
+    `source` is given, e.g. a ReplayEventSource or SyntheticEventSource.
+    """
+    def __init__(self, output_dir="data/events", store=None, ocr=True, source=None):
         self.output_dir = Path(output_dir)
+        self.source = source if source is not None else LiveEventSource()
+
+        # Optional EventStore receiving each saved batch
+        self.store = store
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
         # Event storage
         self.events = []
         self.max_events_before_save = 50
 
+        # Callbacks receiving each event as it is logged
+        self.listeners = []
+
         # Control flag
         self.is_tracking = False
 
-        # Event listeners
-        self.mouse_listener = None
-        self.keyboard_listener = None
-
         self.pressed_modifiers = set()
 
         # Mouse position and threshold to track position
@@ -42,33 +57,69 @@ class EventTracker:
         # Generate session_id
         self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-        # OCR Configuration
-        self.ocr_enabled = True
+        # OCR Configuration; pytesseract is only imported when OCR runs
+        self.ocr_enabled = ocr
         self.ocr_crop_size = 100
 
+        # While the resource governor defers OCR, requests that leave a
+        # callback keep their grabbed area in deferred_ocr (the oldest are
+        # dropped beyond max_deferred_ocr) until resume_ocr() reads them
+        self.ocr_deferred = False
+        self.max_deferred_ocr = 20
+        self.deferred_ocr = deque()
+        self.ocr_dropped = 0
+        self._ocr_lock = threading.Lock()
+        self._ocr_worker = None
+        # Receives each resumed (screenshot, on_text) request, e.g. a bounded
+        # pipeline stage's put; when None, one worker thread reads them in turn
+        self.ocr_handler = None
+
     def _log_event(self, event_type, data):
         """Log an event with timestamp and windows info"""
+        with metrics.timer("capture_callback_seconds", type=event_type):
+            self._record_event({
+                "timestamp": datetime.now().isoformat(),
+                "type": event_type,
+                "window": self._active_window_title(),
+                **data
+            })
+        metrics.counter("events_captured_total", type=event_type).inc()
 
+    def inject(self, event):
+        """Log an event captured elsewhere, e.g. by a replay source, keeping its window and timestamp"""
+        event_type = event.get("type")
+        with metrics.timer("capture_callback_seconds", type=event_type):
+            self._record_event(dict(event))
+        metrics.counter("events_captured_total", type=event_type).inc()
+
+    def _active_window_title(self):
         try:
+            # pygetwindow does not support Linux, so it is only imported for live input
+            import pygetwindow as gw
             active_window = gw.getActiveWindow()
-            window_title = active_window.title if active_window else "Unknown"
+            return active_window.title if active_window else "Unknown"
         except:
-            window_title = "Unknown"
-
-        event = {
-            "timestamp": datetime.now().isoformat(),
-            "type": event_type,
-            "window": window_title,
-            **data
-        }
+            return "Unknown"
 
+    def _record_event(self, event):
         self.events.append(event)
 
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error("Event listener error: %s", e)
+
         if len(self.events) >= self.max_events_before_save:
             self._save_events()
 
+    def add_listener(self, callback):
+        """Call `callback(event)` for every event as soon as it is logged"""
+        self.listeners.append(callback)
+
     def _get_element_at_point(self, x, y):
         try:
+            import uiautomation as auto
             with auto.UIAutomationInitializerInThread():
                 element = auto.ControlFromPoint(x, y)
 
@@ -99,7 +150,7 @@ class EventTracker:
                 return friendly, info
         
         except Exception as e:
-            print(f"UIA lookup failed: {e}")
+            logger.warning("UIA lookup failed: %s", e)
             return None, None
 
     def _on_mouse_click(self, x, y, button, pressed):
@@ -108,7 +159,8 @@ class EventTracker:
             
         clicked_element = None
 
-        label, element_info = self._get_element_at_point(x, y)
+        with metrics.timer("enrichment_seconds", source="uia"):
+            label, element_info = self._get_element_at_point(x, y)
 
         event_data = {
             "x": x,
@@ -172,21 +224,28 @@ class EventTracker:
 
         return text if len(text) > 1 else None
     
-    def _extract_text_near_click(self, x, y):
-        """Extract text from screenshot near click location using OCR"""
-        if not self.is_tracking:
-            return None
-
+    def _grab_click_area(self, x, y):
+        """Screenshot of the area around a click, taken while it is still on screen"""
         try:
+            from PIL import ImageGrab
+
             # Capture small area around the click
             left = max(0, x-100)
             top = max(0, y-50)
             right = x + 100
             bottom = y + 5
 
-            screenshot = ImageGrab.grab(bbox=(left, top, right, bottom))
+            return ImageGrab.grab(bbox=(left, top, right, bottom))
+
+        except Exception as e:
+            logger.error("OCR capture error: %s", e)
+            return None
 
-            from PIL import ImageEnhance, ImageFilter
+    def _extract_text(self, screenshot):
+        """Extract text from a screenshot near a click using OCR"""
+        try:
+            from PIL import Image, ImageEnhance, ImageFilter
+            pytesseract = _load_tesseract()
 
             screenshot = screenshot.convert('L')
 
@@ -207,24 +266,99 @@ class EventTracker:
                 '--psm 13'
             ]
             best_text = None
-            for config in ocr_configs:
-                text = pytesseract.image_to_string(
-                    screenshot, 
-                    lang='eng',
-                    config=config
-                )
-                cleaned_text = self._clean_ocr_text(text)
-
-                if cleaned_text:
-                    best_text = cleaned_text
-                    break
+            with metrics.timer("enrichment_seconds", source="ocr"):
+                for config in ocr_configs:
+                    text = pytesseract.image_to_string(
+                        screenshot, 
+                        lang='eng',
+                        config=config
+                    )
+                    cleaned_text = self._clean_ocr_text(text)
+
+                    if cleaned_text:
+                        best_text = cleaned_text
+                        break
 
             return best_text
         
         except Exception as e:
-            print(f"OCR error: {e}")
+            logger.error("OCR error: %s", e)
+            return None
+
+    def _extract_text_near_click(self, x, y, on_text=None):
+        """Extract text from screenshot near click location using OCR.
+
+        The text is returned, so callers add it to the event before logging
+        it. While OCR is deferred this returns None; with `on_text` the area
+        is still grabbed now and `on_text(text)` is called once OCR resumes,
+        e.g. to update the event already stored.
+        """
+        if not self.is_tracking or not self.ocr_enabled:
+            return None
+        if self.ocr_deferred and on_text is None:
+            return None
+
+        screenshot = self._grab_click_area(x, y)
+        if screenshot is None:
             return None
 
+        with self._ocr_lock:
+            if self.ocr_deferred:
+                if len(self.deferred_ocr) >= self.max_deferred_ocr:
+                    self.deferred_ocr.popleft()
+                    self.ocr_dropped += 1
+                    metrics.counter("ocr_dropped_total").inc()
+                self.deferred_ocr.append((screenshot, on_text))
+                metrics.gauge("ocr_deferred_requests").set(len(self.deferred_ocr))
+                return None
+        return self._extract_text(screenshot)
+
+    def process_ocr(self, request):
+        """Read one deferred (screenshot, on_text) request"""
+        screenshot, on_text = request
+        text = self._extract_text(screenshot)
+        if text:
+            on_text(text)
+
+    def _read_deferred_ocr(self):
+        # One worker at a time; it stops as soon as OCR is deferred again
+        while True:
+            with self._ocr_lock:
+                if self.ocr_deferred or not self.deferred_ocr:
+                    self._ocr_worker = None
+                    return
+                request = self.deferred_ocr.popleft()
+                metrics.gauge("ocr_deferred_requests").set(len(self.deferred_ocr))
+            try:
+                self.process_ocr(request)
+            except Exception as e:
+                logger.error("Deferred OCR error: %s", e)
+
+    def defer_ocr(self):
+        """Hold OCR back from Tesseract until resume_ocr()"""
+        with self._ocr_lock:
+            self.ocr_deferred = True
+
+    def resume_ocr(self):
+        """Run OCR again, reading the requests held back while deferred"""
+        requests = []
+        with self._ocr_lock:
+            self.ocr_deferred = False
+            if self.ocr_handler is not None:
+                requests = list(self.deferred_ocr)
+                self.deferred_ocr.clear()
+            elif self.deferred_ocr and self._ocr_worker is None:
+                self._ocr_worker = threading.Thread(
+                    target = profiler.wrap(self._read_deferred_ocr, "ocr"),
+                    name = "ocr-deferred",
+                    daemon = True
+                )
+                self._ocr_worker.start()
+        if self.ocr_handler is not None:
+            metrics.gauge("ocr_deferred_requests").set(0)
+        for request in requests:
+            self.ocr_handler(request)
+
     def _on_key_press(self, key):
         """Handle keyboard key press event"""
         try:
@@ -305,6 +439,12 @@ class EventTracker:
         if not self.events:
             return
 
+        with metrics.timer("event_save_seconds"):
+            self._write_events()
+        metrics.counter("events_saved_total").inc(len(self.events))
+        self.events = []
+
+    def _write_events(self):
         filename = f"events_{self.session_id}.json"
         filepath = self.output_dir/filename
 
@@ -322,54 +462,49 @@ class EventTracker:
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(all_events, f, indent=2)
 
-        print(f"Saved {len(self.events)} events.")
+        logger.debug("Saved %d events.", len(self.events))
 
-        self.events = []
+        if self.store is not None:
+            try:
+                self.store.add_events(self.session_id, self.events)
+            except Exception as e:
+                logger.error("Error writing events to store: %s", e)
 
     def start(self):
         """Start tracking events"""
 
         if self.is_tracking:
-            print("Event tracker already running.")
+            logger.warning("Event tracker already running.")
             return
 
         self.is_tracking = True
+        self.source.start(self)
 
-        self.mouse_listener = mouse.Listener(
-            on_click=self._on_mouse_click,
-            on_move=self._on_mouse_move,
-            on_scroll=self._on_mouse_scroll
-        )
-        self.mouse_listener.start()
-
-        self.keyboard_listener = keyboard.Listener(
-            on_press=self._on_key_press,
-            on_release=self._on_key_release        
-        )
-        self.keyboard_listener.start()
-
-        print("Event tracking started.")
+        logger.info("Event tracking started.")
 
     def stop(self):
         """Stop event tracking"""
         if not self.is_tracking:
-            print("Event tracking not running!")
+            logger.warning("Event tracking not running!")
             return
 
         self.is_tracking = False
 
-        # Stop listeners
-        if self.mouse_listener:
-            self.mouse_listener.stop()
-        if self.keyboard_listener:
-            self.keyboard_listener.stop()
+        self.source.stop()
+
+        # Deferred OCR is read now, so its callbacks run before the session ends
+        self.resume_ocr()
+        worker = self._ocr_worker
+        if worker is not None:
+            worker.join(timeout=10)
 
         self._save_events()
 
-        print("Event tracking stopped.")
+        logger.info("Event tracking stopped.")
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     print("Event Tracker Test")
     print("Tracking will start in 2 seconds.")
     print("Move, scroll, click, press key on keyboard for 10 seconds.")
@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """Process-wide cache of Whisper models, loaded lazily or warmed in the background"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        # (name, device, compute_type) -> model / readiness event
+        self._models = {}
+        self._ready = {}
+
+        # Seconds spent loading each model
+        self.load_times = {}
+
+    def _load(self, key):
+        name, device, compute_type = key
+        logger.info("Loading Whisper model '%s'...", name)
+
+        start = time.perf_counter()
+        model = None
+        try:
+            from faster_whisper import WhisperModel
+            model = WhisperModel(name, device=device, compute_type=compute_type)
+            self.load_times[key] = time.perf_counter() - start
+            logger.info("Whisper model '%s' loaded in %.2fs", name, self.load_times[key])
+        except Exception as e:
+            logger.error("Error loading Whisper model '%s': %s", name, e)
+
+        with self._lock:
+            event = self._ready[key]
+            if model is None:
+                # Forget the failed attempt so the next request can retry
+                del self._ready[key]
+            else:
+                self._models[key] = model
+        event.set()
+
+    def _start_loading(self, key, background):
+        """Begin loading a model unless it is already loaded or loading"""
+        with self._lock:
+            event = self._ready.get(key)
+            if event is not None:
+                return event
+            event = threading.Event()
+            self._ready[key] = event
+
+        if background:
+            threading.Thread(target=self._load, args=(key,), daemon=True).start()
+        else:
+            self._load(key)
+        return event
+
+    def warm_up(self, name="tiny", device="cpu", compute_type="int8"):
+        """Start loading a model in a background thread without waiting for it"""
+        self._start_loading((name, device, compute_type), background=True)
+
+    def get(self, name="tiny", device="cpu", compute_type="int8", timeout=None):
+        """Return the shared model, loading it first if nobody has asked for it yet.
+
+        Blocks until the model is ready. Returns None if loading failed or the
+        timeout expired.
+        """
+        key = (name, device, compute_type)
+        event = self._start_loading(key, background=False)
+        if not event.wait(timeout):
+            return None
+        return self._models.get(key)
+
+    def is_ready(self, name="tiny", device="cpu", compute_type="int8"):
+        return (name, device, compute_type) in self._models
+
+    def load_time(self, name="tiny", device="cpu", compute_type="int8"):
+        """Seconds it took to load the model, or None if it is not loaded"""
+        return self.load_times.get((name, device, compute_type))
+
+
+# Shared by every recorder in the process so sessions reuse one loaded model
+model_registry = ModelRegistry()
@@ -1,55 +1,71 @@
+import logging
 import os
 import time
 import threading
-from datetime import datetime
 from pathlib import Path
-import mss
-from PIL import Image
+from .sources import LiveFrameSource
+from ..utils.metrics import metrics
+from ..utils.profiling import profiler
+
+logger = logging.getLogger(__name__)
 
 class ScreenRecorder:
-    """Capture periodic screenshots"""
+    """Capture periodic screenshots.
+
+    Frames are grabbed from the screen unless another `source` is given,
+    e.g. a ReplayFrameSource or SyntheticFrameSource.
+    """
 
-    def __init__(self, output_dir="data/screenshots", interval=3):
+    def __init__(self, output_dir="data/screenshots", interval=3, store=None, session_id=None, source=None):
         self.output_dir = Path(output_dir)
         self.interval = interval
+        self.source = source if source is not None else LiveFrameSource()
+
+        # Optional EventStore receiving screenshot metadata
+        self.store = store
+        self.session_id = session_id
 
         # Create output dir if it doesn't already exist
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
         self.is_recording = False
         self.is_paused = False
+        self.screenshots_taken = 0
 
-        # Background recording thread
+        # Background recording thread, woken early by stop()
         self.recording_thread = None
+        self._wake = threading.Event()
 
 
     def _capture_screenshot(self):
         """Capture a screenshot and save it with the timestamp"""
 
         try:
-            # MSS instance
-            sct = mss.mss()
-
-            monitor = sct.monitors[1]
-
-            screenshot = sct.grab(monitor)
-
-            img = Image.frombytes("RGB", screenshot.size, screenshot.rgb)
-
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            with metrics.timer("frame_capture_seconds"):
+                img = self.source.grab()
+            if img is None:
+                # A replay that has not reached its first frame yet
+                return None
+
+            captured_at = self.source.now()
+            timestamp = captured_at.strftime("%Y-%m-%d_%H-%M-%S")
             filename = f"screenshot_{timestamp}.png"
             filepath = self.output_dir/filename
-            img.save(filepath)
+            with metrics.timer("frame_encode_seconds"):
+                img.save(filepath)
+
+            logger.debug("Screenshot saved: %s", filepath)
+            self.screenshots_taken += 1
+            metrics.counter("screenshots_total").inc()
 
-            print(f"Screenshot saved: {filepath}")
+            if self.store is not None:
+                self.store.add_screenshot(self.session_id, captured_at, filepath, img.width, img.height)
             return str(filepath)
 
         except Exception as e:
-            print(f"Error capturing screenshot: {e}")
+            logger.error("Error capturing screenshot: %s", e)
+            metrics.counter("screenshot_errors_total").inc()
             return None
-        finally:
-            if "sct" in locals():
-                sct.close()
 
     def _recording_loop(self):
         """
@@ -64,57 +80,61 @@ class ScreenRecorder:
                 continue
 
             self._capture_screenshot()
-            time.sleep(self.interval)
+            self._wake.wait(self.interval)
 
-        print("Recording stopped")
+        logger.debug("Screenshot loop finished")
 
     def start(self):
         """Start recording screenshots"""
         if self.is_recording:
-            print("Already recording...")
+            logger.warning("Already recording...")
             return
 
         self.is_recording = True
         self.is_paused = False
+        self._wake.clear()
+        self.source.start()
 
-        self.recording_thread = threading.Thread(target=self._recording_loop)
+        self.recording_thread = threading.Thread(target=profiler.wrap(self._recording_loop, "screen_recorder"))
         self.recording_thread.start()
 
-        print("Recording now!")
+        logger.info("Screen recording started")
 
     def stop(self):
         """Stop recording screenshots"""
 
         if not self.is_recording:
-            print("Recording is not running.")
+            logger.warning("Screen recording is not running.")
             return
 
         self.is_recording = False
+        self._wake.set()
 
         if self.recording_thread:
             self.recording_thread.join(timeout=5)
+        self.source.stop()
 
-        print("Recording stopped")
+        logger.info("Screen recording stopped")
 
     def pause(self):
         """Pause recording"""
         if not self.is_recording:
-            print("Recording is not running.")
+            logger.warning("Screen recording is not running.")
             return
         
         self.is_paused = True
         
-        print("Recording paused")
+        logger.info("Screen recording paused")
 
     def resume(self):
         """Resume recording"""
         if not self.is_recording:
-            print("Recording is not running.")
+            logger.warning("Screen recording is not running.")
             return
 
         self.is_paused = False
 
-        print("Recording resumed!")
+        logger.info("Screen recording resumed")
 
     def get_status(self):
         """Get current recording status"""
@@ -128,13 +148,14 @@ class ScreenRecorder:
     def set_interval(self, interval):
         """Incase you want to change the screenshot interval"""
         self.interval = interval
-        print(f"Capture interval set to {interval} seconds")
+        logger.info("Capture interval set to %s seconds", interval)
 
     def cleanup(self):
         """Clean up resources"""
         self.stop()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     print("Starting screen recorder...")
 
     recorder = ScreenRecorder(interval=2)
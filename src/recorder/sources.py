@@ -0,0 +1,503 @@
+import logging
+import random
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import numpy as np
+from ..storage.event_store import to_epoch
+from ..utils.profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+# Scripted workflows the synthetic event stream repeats, as (window, action, value)
+SYNTHETIC_WORKFLOWS = [
+    [("Report.xlsx - Excel", "click", "Export"), ("Report.xlsx - Excel", "key", "Ctrl + c"),
+     ("Inbox - Outlook", "click", "New Email"), ("Inbox - Outlook", "key", "Ctrl + v"),
+     ("Inbox - Outlook", "click", "Send")],
+    [("Customer 42 - CRM - Google Chrome", "click", "Search"),
+     ("Customer 42 - CRM - Google Chrome", "type", "invoice"),
+     ("Customer 42 - CRM - Google Chrome", "click", "Open"),
+     ("Customer 42 - CRM - Google Chrome", "click", "Download")],
+    [("Untitled - Notepad", "type", "weekly notes"), ("Untitled - Notepad", "key", "Ctrl + s"),
+     ("Save As", "click", "Save")]
+]
+
+class Playback:
+    """Clock pacing a replayed stream.
+
+    Offsets are seconds since the start of the captured stream. With `speed`
+    N an offset is reached after offset/N seconds; with `speed=None` items
+    are delivered as fast as possible. Replayed items are stamped with the
+    replay start plus their offset, so they keep their original spacing
+    whatever the speed.
+    """
+
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self.started_at = None
+        self.started_on = None
+        self._position = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.started_on = datetime.now()
+        self._position = 0.0
+
+    def position(self) -> float:
+        """Current offset in the captured stream"""
+        if self.speed is None:
+            return self._position
+        return (time.perf_counter() - self.started_at)*self.speed
+
+    def seek(self, offset):
+        self._position = max(self._position, offset)
+
+    def wait_until(self, offset, stop: threading.Event) -> bool:
+        """Sleep until `offset` is due; returns False if `stop` was set"""
+        if self.speed is not None:
+            delay = self.started_at + offset/self.speed - time.perf_counter()
+            if delay > 0 and stop.wait(delay):
+                return False
+        self.seek(offset)
+        return not stop.is_set()
+
+    def timestamp(self, offset=None) -> datetime:
+        return self.started_on + timedelta(seconds=self.position() if offset is None else offset)
+
+class _PushSource:
+    """Replay source feeding its recorder from a thread of its own"""
+
+    name = "replay"
+
+    def __init__(self, speed=1.0):
+        self.playback = Playback(speed)
+        self.done = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, recorder):
+        self._stop.clear()
+        self.done.clear()
+        self.playback.start()
+        self._thread = threading.Thread(target=profiler.wrap(self._replay, self.name), args=(recorder,),
+                                        name=self.name, daemon=True)
+        self._thread.start()
+
+    def _replay(self, recorder):
+        if self._run(recorder):
+            self.done.set()
+            logger.info("%s finished", self.name)
+
+    def _run(self, recorder) -> bool:
+        raise NotImplementedError
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def finished(self) -> bool:
+        return self.done.is_set()
+
+    def now(self) -> datetime:
+        return self.playback.timestamp()
+
+# Events
+
+class LiveEventSource:
+    """Mouse and keyboard hooks (pynput) calling the tracker's handlers"""
+
+    def __init__(self):
+        self.mouse_listener = None
+        self.keyboard_listener = None
+
+    def start(self, tracker):
+        from pynput import mouse, keyboard
+
+        # The listeners call back on their own threads; wrap() is a no-op unless profiling
+        self.mouse_listener = mouse.Listener(
+            on_click=profiler.wrap(tracker._on_mouse_click, "listener.mouse"),
+            on_move=profiler.wrap(tracker._on_mouse_move, "listener.mouse"),
+            on_scroll=profiler.wrap(tracker._on_mouse_scroll, "listener.mouse")
+        )
+        self.mouse_listener.start()
+
+        self.keyboard_listener = keyboard.Listener(
+            on_press=profiler.wrap(tracker._on_key_press, "listener.keyboard"),
+            on_release=profiler.wrap(tracker._on_key_release, "listener.keyboard")
+        )
+        self.keyboard_listener.start()
+
+    def stop(self):
+        if self.mouse_listener:
+            self.mouse_listener.stop()
+        if self.keyboard_listener:
+            self.keyboard_listener.stop()
+
+    def finished(self) -> bool:
+        return False
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+class ReplayEventSource(_PushSource):
+    """Captured events fed back to EventTracker.inject with their original spacing.
+
+    `origin` (epoch seconds) is the start of the captured session, shared
+    with the frame and audio replay so the three stay aligned; it defaults
+    to the first event.
+    """
+
+    name = "replay.events"
+
+    def __init__(self, events: List[Dict], speed=1.0, origin=None):
+        super().__init__(speed)
+        timed = [(to_epoch(event.get("timestamp")), event) for event in events]
+        timed = sorted((t, i, event) for i, (t, event) in enumerate(timed) if t is not None)
+        if origin is None:
+            origin = timed[0][0] if timed else 0.0
+        self.timeline: List[Tuple[float, Dict]] = [(t - origin, event) for t, _, event in timed]
+
+    @classmethod
+    def from_store(cls, store, session_id, speed=1.0, origin=None):
+        return cls(store.get_events(session_id=session_id), speed, origin)
+
+    @classmethod
+    def from_file(cls, events_file, speed=1.0, origin=None):
+        """Replay an events_<session>.json file written by EventTracker"""
+        import json
+        with open(events_file, "r", encoding="utf-8") as f:
+            return cls(json.load(f), speed, origin)
+
+    def _run(self, tracker) -> bool:
+        for offset, event in self.timeline:
+            if not self.playback.wait_until(offset, self._stop):
+                return False
+            tracker.inject(dict(event, timestamp=self.playback.timestamp(offset).isoformat()))
+        return True
+
+class SyntheticEventSource(ReplayEventSource):
+    """Deterministic event stream: the same seed always gives the same events.
+
+    About `rate` events per second for `duration` seconds, a `repeat_share`
+    of them from the repeated SYNTHETIC_WORKFLOWS and the rest random clicks,
+    typing and scrolling across the same windows.
+    """
+
+    name = "synthetic.events"
+
+    def __init__(self, duration=60.0, rate=4.0, seed=0, speed=1.0, repeat_share=0.6):
+        super().__init__(self.generate(duration, rate, seed, repeat_share), speed, origin=0.0)
+
+    @staticmethod
+    def generate(duration=60.0, rate=4.0, seed=0, repeat_share=0.6) -> List[Dict]:
+        rng = random.Random(seed)
+        windows = sorted({window for workflow in SYNTHETIC_WORKFLOWS for window, _, _ in workflow})
+        labels = ["OK", "Cancel", "Next", "Back", "Refresh", "Settings"]
+
+        def click(window, label):
+            return {"type": "mouse_click", "window": window, "x": rng.randint(0, 1919),
+                    "y": rng.randint(0, 1079), "button": "Button.left", "clicked_element": label,
+                    "element": {"name": label, "control_type": "Button"}}
+
+        def keys(window, text):
+            return [{"type": "key_press", "window": window, "key": "space" if c == " " else c} for c in text]
+
+        events = []
+        t = 0.0
+        while True:
+            if rng.random() < repeat_share:
+                batch = []
+                for window, action, value in rng.choice(SYNTHETIC_WORKFLOWS):
+                    if action == "click":
+                        batch.append(click(window, value))
+                    elif action == "type":
+                        batch.extend(keys(window, value))
+                    else:
+                        batch.append({"type": "key_press", "window": window, "key": value})
+            else:
+                window = rng.choice(windows)
+                kind = rng.random()
+                if kind < 0.5:
+                    batch = [click(window, rng.choice(labels))]
+                elif kind < 0.8:
+                    batch = keys(window, "".join(rng.choice("abcdefgh") for _ in range(rng.randint(1, 8))))
+                else:
+                    batch = [{"type": "mouse_scroll", "window": window, "x": rng.randint(0, 1919),
+                              "y": rng.randint(0, 1079), "delta_x": 0, "delta_y": rng.choice((-1, 1))}]
+
+            for event in batch:
+                t += rng.expovariate(rate)
+                if t >= duration:
+                    return events
+                event["timestamp"] = datetime.fromtimestamp(t).isoformat()
+                events.append(event)
+
+# Frames, polled by ScreenRecorder at its own interval
+
+class LiveFrameSource:
+    """The primary monitor, captured with mss"""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def finished(self) -> bool:
+        return False
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def grab(self):
+        # Imported on first capture so constructing a recorder stays cheap
+        import mss
+        from PIL import Image
+
+        with mss.mss() as sct:
+            screenshot = sct.grab(sct.monitors[1])
+            return Image.frombytes("RGB", screenshot.size, screenshot.rgb)
+
+class ReplayFrameSource:
+    """Captured screenshots, as the screen looked at the replay position.
+
+    With `speed=None` every grab returns the next frame instead, so each one
+    is replayed exactly once at the recorder's interval. `frames` are dicts
+    with "ts" (epoch seconds) and "path", as EventStore.get_screenshots
+    returns them.
+    """
+
+    def __init__(self, frames: List[Dict], speed=1.0, origin=None):
+        frames = sorted(frames, key=lambda frame: frame["ts"])
+        if origin is None:
+            origin = frames[0]["ts"] if frames else 0.0
+        self.frames = frames
+        self.offsets = [frame["ts"] - origin for frame in frames]
+        self.playback = Playback(speed)
+        self._next = 0
+
+    @classmethod
+    def from_store(cls, store, session_id, speed=1.0, origin=None):
+        return cls(store.get_screenshots(session_id=session_id), speed, origin)
+
+    def start(self):
+        self.playback.start()
+        self._next = 0
+
+    def stop(self):
+        pass
+
+    def finished(self) -> bool:
+        if self.playback.speed is None:
+            return self._next >= len(self.frames)
+        return not self.offsets or self.playback.position() >= self.offsets[-1]
+
+    def now(self) -> datetime:
+        return self.playback.timestamp()
+
+    def grab(self):
+        if self.playback.speed is None:
+            if self._next >= len(self.frames):
+                return None
+            index = self._next
+            self._next += 1
+            self.playback.seek(self.offsets[index])
+        else:
+            index = bisect_right(self.offsets, self.playback.position()) - 1
+            if index < 0:
+                return None
+        return self._load(index)
+
+    def _load(self, index):
+        from PIL import Image
+        with Image.open(self.frames[index]["path"]) as img:
+            return img.convert("RGB")
+
+class SyntheticFrameSource(ReplayFrameSource):
+    """Deterministic frames: a few flat "windows" on a desktop plus some noise"""
+
+    def __init__(self, duration=60.0, frame_interval=1.0, width=1280, height=720, seed=0, speed=1.0):
+        count = max(1, int(duration/frame_interval))
+        super().__init__([{"ts": i*frame_interval, "path": None} for i in range(count)], speed, origin=0.0)
+        self.width = width
+        self.height = height
+        self.seed = seed
+
+    def _load(self, index):
+        from PIL import Image
+
+        rng = np.random.default_rng((self.seed, index))
+        pixels = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        pixels[:] = rng.integers(0, 256, 3, dtype=np.uint8)
+        for _ in range(rng.integers(2, 6)):
+            top, left = rng.integers(0, self.height//2), rng.integers(0, self.width//2)
+            bottom = top + rng.integers(self.height//8, self.height//2)
+            right = left + rng.integers(self.width//8, self.width//2)
+            pixels[top:bottom, left:right] = rng.integers(0, 256, 3, dtype=np.uint8)
+        # Text-like noise so encoding costs about what a real screen does
+        band = slice(self.height//3, self.height//3 + self.height//10)
+        pixels[band] = rng.integers(0, 256, pixels[band].shape, dtype=np.uint8)
+        return Image.fromarray(pixels)
+
+# Audio
+
+class LiveAudioSource:
+    """The default microphone, recorded with sounddevice"""
+
+    def __init__(self):
+        self.stream = None
+
+    def start(self, recorder):
+        # PortAudio is only loaded when audio is actually recorded
+        import sounddevice as sd
+
+        self.stream = sd.InputStream(
+            samplerate = recorder.sample_rate,
+            channels = 1,
+            callback = profiler.wrap(recorder._audio_callback, "audio.callback")
+        )
+        self.stream.start()
+
+    def stop(self):
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+
+    def finished(self) -> bool:
+        return False
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+class ReplayAudioSource(_PushSource):
+    """Captured audio fed to AudioRecorder.feed in `block_size` sample blocks.
+
+    `segments` are (offset, samples) pairs of int16 mono audio, e.g. the
+    AudioArchive blocks of a session; silence between them is not replayed.
+    """
+
+    name = "replay.audio"
+
+    def __init__(self, segments: List[Tuple[float, np.ndarray]], sample_rate=16000, speed=1.0, block_size=512):
+        super().__init__(speed)
+        self.segments = segments
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+
+    @classmethod
+    def from_archive(cls, archive, t0, t1, speed=1.0, origin=None):
+        """Replay the AudioArchive blocks overlapping [t0, t1] (epoch seconds)"""
+        blocks = archive.find_blocks(t0, t1)
+        if origin is None:
+            origin = blocks[0]["start"] if blocks else t0
+        segments = [(block["start"] - origin, archive.read_block(block)) for block in blocks]
+        return cls(segments, archive.sample_rate, speed)
+
+    def _run(self, recorder) -> bool:
+        for offset, samples in self.segments:
+            for i in range(0, len(samples), self.block_size):
+                if not self.playback.wait_until(offset + i/self.sample_rate, self._stop):
+                    return False
+                # sounddevice delivers float32 frames shaped (frames, channels)
+                block = samples[i:i + self.block_size].astype(np.float32)/32768
+                recorder.feed(block.reshape(-1, 1))
+        return True
+
+class SyntheticAudioSource(ReplayAudioSource):
+    """Deterministic audio: speech-like tone bursts over background noise"""
+
+    name = "synthetic.audio"
+
+    def __init__(self, duration=60.0, sample_rate=16000, seed=0, speed=1.0):
+        rng = np.random.default_rng(seed)
+        n = int(duration*sample_rate)
+        samples = rng.normal(0, 200, n)
+        t = np.arange(n)/sample_rate
+        start = 0.0
+        while start < duration:
+            length = rng.uniform(0.5, 3.0)
+            burst = (t >= start) & (t < start + length)
+            pitch = rng.uniform(120, 300)
+            samples[burst] += 4000*np.sin(2*np.pi*pitch*t[burst])*np.abs(np.sin(2*np.pi*3*t[burst]))
+            start += length + rng.uniform(0.5, 4.0)
+        samples = np.clip(samples, -32768, 32767).astype(np.int16)
+        super().__init__([(0.0, samples)], sample_rate, speed)
+
+# Sets of sources for a Session
+
+def replay_sources(store, session_id, speed=1.0, audio_archive=None) -> Dict:
+    """Sources replaying a captured session from the event store (and audio archive).
+
+    The three streams share the session start as their origin, so events,
+    screenshots and audio stay aligned as they were recorded.
+    """
+    events = store.get_events(session_id=session_id)
+    frames = store.get_screenshots(session_id=session_id)
+    times = [to_epoch(event.get("timestamp")) for event in (events[:1] + events[-1:])]
+    times += [frame["ts"] for frame in (frames[:1] + frames[-1:])]
+    times = [t for t in times if t is not None]
+    if not times:
+        raise ValueError(f"No captured events or screenshots for session {session_id}")
+    origin, end = min(times), max(times)
+
+    blocks = audio_archive.find_blocks(origin, end) if audio_archive is not None else []
+    if blocks:
+        # An audio chunk can start before the first event
+        origin = min(origin, blocks[0]["start"])
+
+    sources = {
+        "events": ReplayEventSource(events, speed, origin),
+        "frames": ReplayFrameSource(frames, speed, origin)
+    }
+    if audio_archive is not None:
+        sources["audio"] = ReplayAudioSource.from_archive(audio_archive, origin, end, speed, origin)
+    return sources
+
+def synthetic_sources(duration=60.0, seed=0, speed=1.0, event_rate=4.0, frame_interval=1.0) -> Dict:
+    """Deterministic event, frame and audio streams, e.g. for load testing headless"""
+    return {
+        "events": SyntheticEventSource(duration, event_rate, seed, speed),
+        "frames": SyntheticFrameSource(duration, frame_interval, seed=seed, speed=speed),
+        "audio": SyntheticAudioSource(duration, seed=seed, speed=speed)
+    }
+
+
+if __name__ == "__main__":
+    print("Input Sources Test")
+
+    class Sink:
+        """Stand-in recorder collecting what the sources deliver"""
+
+        sample_rate = 16000
+
+        def __init__(self):
+            self.events = []
+            self.samples = 0
+
+        def inject(self, event):
+            self.events.append(event)
+
+        def feed(self, block):
+            self.samples += len(block)
+
+    first = SyntheticEventSource.generate(duration=30, seed=7)
+    assert first == SyntheticEventSource.generate(duration=30, seed=7), "synthetic events are not deterministic"
+    print(f"{len(first)} synthetic events in 30s, e.g. {first[0]['type']} in {first[0]['window']}")
+
+    for speed in (10.0, None):
+        sink = Sink()
+        events = SyntheticEventSource(duration=30, seed=7, speed=speed)
+        audio = SyntheticAudioSource(duration=30, speed=speed)
+        start = time.perf_counter()
+        events.start(sink)
+        audio.start(sink)
+        while not (events.finished() and audio.finished()):
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        span = to_epoch(sink.events[-1]["timestamp"]) - to_epoch(sink.events[0]["timestamp"])
+        print(f"speed {speed or 'max'}: {len(sink.events)} events and {sink.samples/16000:.0f}s of audio "
+              f"in {elapsed:.2f}s, events span {span:.1f}s")
+        assert len(sink.events) == len(first), "events were lost in the replay"
@@ -0,0 +1,194 @@
+import json
+import threading
+import zlib
+from bisect import bisect_right
+from pathlib import Path
+import numpy as np
+
+class AudioArchive:
+    """Append-only store of compressed int16 audio blocks with a time index.
+
+    Blocks are delta-encoded, zlib-compressed and appended to segment files
+    (one per `segment_duration` seconds of audio). Every block gets a line in
+    `index.jsonl` with its wall-clock start/end so any [t0, t1] range can be
+    located with a binary search.
+    """
+
+    def __init__(self, archive_dir="data/audio/archive", sample_rate=16000,
+                 segment_duration=3600, compression_level=6):
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+
+        self.sample_rate = sample_rate
+        self.segment_duration = segment_duration
+        self.compression_level = compression_level
+
+        self.index_file = self.archive_dir/"index.jsonl"
+        self._lock = threading.Lock()
+
+        # Index entries sorted by start time, plus the start times for bisect
+        self.blocks = []
+        self._starts = []
+        self._load_index()
+
+    def _load_index(self):
+        if not self.index_file.exists():
+            return
+
+        with open(self.index_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash; the block is unreachable
+                    continue
+                self.blocks.append(entry)
+
+        self.blocks.sort(key=lambda b: b["start"])
+        self._starts = [b["start"] for b in self.blocks]
+
+    def _segment_for(self, start_time):
+        """Pick the segment a new block goes into, starting a new one when full"""
+        if self.blocks:
+            last = self.blocks[-1]
+            segment_start = last["segment_start"]
+            if start_time - segment_start < self.segment_duration:
+                return last["segment"], segment_start
+            return last["segment"] + 1, start_time
+        return 0, start_time
+
+    def _segment_path(self, segment):
+        return self.archive_dir/f"segment_{segment:06d}.bin"
+
+    @staticmethod
+    def _encode(samples):
+        # int16 wrap-around makes the delta transform exactly reversible
+        deltas = np.diff(samples, prepend=np.int16(0)).astype(np.int16)
+        return deltas.tobytes()
+
+    @staticmethod
+    def _decode(payload):
+        deltas = np.frombuffer(payload, dtype=np.int16)
+        return np.cumsum(deltas, dtype=np.int16)
+
+    def append(self, samples, start_time):
+        """Append a block of int16 mono samples starting at `start_time` (epoch seconds).
+
+        Returns a reference dict that can be stored alongside transcripts and
+        passed back to `read_block`.
+        """
+        samples = np.asarray(samples, dtype=np.int16).ravel()
+        payload = zlib.compress(self._encode(samples), self.compression_level)
+
+        with self._lock:
+            if self.blocks and start_time < self.blocks[-1]["start"]:
+                # Keep the index monotonic even if the clock steps backwards
+                start_time = self.blocks[-1]["end"]
+
+            segment, segment_start = self._segment_for(start_time)
+            segment_path = self._segment_path(segment)
+
+            with open(segment_path, "ab") as f:
+                offset = f.tell()
+                f.write(payload)
+
+            entry = {
+                "segment": segment,
+                "segment_start": segment_start,
+                "offset": offset,
+                "length": len(payload),
+                "start": start_time,
+                "end": start_time + len(samples)/self.sample_rate,
+                "samples": len(samples),
+                "sample_rate": self.sample_rate
+            }
+
+            with open(self.index_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+            self.blocks.append(entry)
+            self._starts.append(start_time)
+
+        return dict(entry, file=str(segment_path))
+
+    def read_block(self, ref):
+        """Decode the block described by an index entry or `append` reference"""
+        with open(self._segment_path(ref["segment"]), "rb") as f:
+            f.seek(ref["offset"])
+            payload = f.read(ref["length"])
+        return self._decode(zlib.decompress(payload))
+
+    def find_blocks(self, t0, t1):
+        """Index entries overlapping [t0, t1], found with a binary search"""
+        with self._lock:
+            i = max(bisect_right(self._starts, t0) - 1, 0)
+            found = []
+            while i < len(self.blocks) and self.blocks[i]["start"] < t1:
+                if self.blocks[i]["end"] > t0:
+                    found.append(self.blocks[i])
+                i += 1
+        return found
+
+    def extract(self, t0, t1):
+        """Return int16 samples covering [t0, t1].
+
+        Gaps between blocks (e.g. while recording was stopped) are skipped,
+        not filled with silence.
+        """
+        pieces = []
+        for block in self.find_blocks(t0, t1):
+            samples = self.read_block(block)
+            rate = block["sample_rate"]
+            first = max(int(round((t0 - block["start"])*rate)), 0)
+            last = min(int(round((t1 - block["start"])*rate)), len(samples))
+            if last > first:
+                pieces.append(samples[first:last])
+
+        if not pieces:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate(pieces)
+
+    def get_stats(self):
+        """Block count, segment count and bytes on disk vs. raw PCM size"""
+        with self._lock:
+            stored = sum(b["length"] for b in self.blocks)
+            raw = sum(b["samples"]*2 for b in self.blocks)
+            segments = len({b["segment"] for b in self.blocks})
+            return {
+                "blocks": len(self.blocks),
+                "segments": segments,
+                "stored_bytes": stored,
+                "raw_bytes": raw,
+                "compression_ratio": raw/stored if stored else None
+            }
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    print("Audio Archive Test")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = AudioArchive(tmp)
+        rate = archive.sample_rate
+        t = time.time()
+
+        # One hour of 10 second chunks: a quiet tone with a little noise
+        rng = np.random.default_rng(0)
+        for i in range(360):
+            n = np.arange(rate*10)
+            tone = 2000*np.sin(2*np.pi*220*n/rate) + rng.normal(0, 50, len(n))
+            archive.append(tone.astype(np.int16), t + i*10)
+
+        stats = archive.get_stats()
+        print(f"Blocks: {stats['blocks']}, segments: {stats['segments']}")
+        print(f"Raw: {stats['raw_bytes']/1e6:.1f} MB, stored: {stats['stored_bytes']/1e6:.1f} MB "
+              f"({stats['compression_ratio']:.2f}x)")
+
+        start = time.perf_counter()
+        clip = archive.extract(t + 1234.5, t + 1250.0)
+        print(f"Extracted {len(clip)/rate:.1f}s in {(time.perf_counter() - start)*1000:.2f} ms")
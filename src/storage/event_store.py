@@ -0,0 +1,338 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    type TEXT,
+    window TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_session_ts ON events(session_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+CREATE INDEX IF NOT EXISTS idx_events_window_ts ON events(window, ts);
+CREATE INDEX IF NOT EXISTS idx_events_type_ts ON events(type, ts);
+
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    step_index INTEGER NOT NULL,
+    ts REAL,
+    window TEXT,
+    action_type TEXT,
+    summary TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_steps_session ON steps(session_id, step_index);
+CREATE INDEX IF NOT EXISTS idx_steps_window_ts ON steps(window, ts);
+
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL,
+    text TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_session_ts ON transcripts(session_id, start_ts);
+CREATE INDEX IF NOT EXISTS idx_transcripts_ts ON transcripts(start_ts);
+
+CREATE TABLE IF NOT EXISTS screenshots (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT,
+    ts REAL NOT NULL,
+    path TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_screenshots_session_ts ON screenshots(session_id, ts);
+CREATE INDEX IF NOT EXISTS idx_screenshots_ts ON screenshots(ts);
+"""
+
+# strftime formats for count_by_period
+PERIOD_FORMATS = {
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m"
+}
+
+def to_epoch(timestamp):
+    """Epoch seconds from an ISO string, datetime or number (None if unparseable)"""
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+class EventStore:
+    """SQLite store for events, workflow steps, transcripts and screenshot metadata across sessions"""
+
+    def __init__(self, db_path="data/assistant.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # One connection shared by the recorder threads, serialized by a lock
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+
+        # WAL lets the analyzer read while recorders write
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _write_many(self, sql, rows):
+        with self._lock:
+            with self.conn:
+                self.conn.executemany(sql, rows)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    # Writes
+
+    def add_events(self, session_id, events: List[Dict]):
+        """Insert a batch of events in a single transaction"""
+        rows = []
+        for event in events:
+            ts = to_epoch(event.get("timestamp"))
+            if ts is None:
+                continue
+            rows.append((
+                session_id,
+                ts,
+                event.get("type"),
+                event.get("window"),
+                json.dumps(event)
+            ))
+
+        if rows:
+            self._write_many(
+                "INSERT INTO events (session_id, ts, type, window, data) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def replace_steps(self, session_id, steps: List[Dict]):
+        """Store the workflow steps of a session, replacing any earlier analysis"""
+        rows = [
+            (
+                session_id,
+                i,
+                to_epoch(step.get("timestamp")),
+                step.get("window"),
+                step.get("action_type"),
+                step.get("summary"),
+                json.dumps(step)
+            )
+            for i, step in enumerate(steps)
+        ]
+        with self._lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM steps WHERE session_id = ?", (session_id,))
+                self.conn.executemany(
+                    "INSERT INTO steps (session_id, step_index, ts, window, action_type, summary, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
+    def add_transcript(self, session_id, transcript: Dict):
+        self._write_many(
+            "INSERT INTO transcripts (session_id, start_ts, end_ts, text, data) VALUES (?, ?, ?, ?, ?)",
+            [(
+                session_id,
+                to_epoch(transcript.get("start")),
+                to_epoch(transcript.get("end")),
+                transcript.get("transcript"),
+                json.dumps(transcript)
+            )]
+        )
+
+    def add_screenshot(self, session_id, timestamp, path, width=None, height=None):
+        self._write_many(
+            "INSERT INTO screenshots (session_id, ts, path, width, height) VALUES (?, ?, ?, ?, ?)",
+            [(session_id, to_epoch(timestamp), str(path), width, height)]
+        )
+
+    def import_events_file(self, event_file, session_id=None):
+        """Backfill a session from an events_<session>.json file. Returns the number of events added."""
+        event_file = Path(event_file)
+        session_id = session_id or event_file.stem.replace("events_", "", 1)
+
+        if self._query("SELECT 1 FROM events WHERE session_id = ? LIMIT 1", (session_id,)):
+            return 0
+
+        with open(event_file, "r", encoding="utf-8") as f:
+            events = json.load(f)
+        return self.add_events(session_id, events)
+
+    # Queries
+
+    @staticmethod
+    def _where(session_id=None, start=None, end=None, window=None, event_type=None):
+        clauses = []
+        params = []
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(to_epoch(start))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(to_epoch(end))
+        if window is not None:
+            clauses.append("window = ?")
+            params.append(window)
+        if event_type is not None:
+            clauses.append("type = ?")
+            params.append(event_type)
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def get_events(self, session_id=None, start=None, end=None, window=None,
+                   event_type=None, limit=None) -> List[Dict]:
+        """Events matching all given filters, in time order"""
+        where, params = self._where(session_id, start, end, window, event_type)
+        sql = f"SELECT data FROM events{where} ORDER BY ts, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [json.loads(row["data"]) for row in self._query(sql, params)]
+
+    def get_steps(self, session_id) -> List[Dict]:
+        rows = self._query(
+            "SELECT data FROM steps WHERE session_id = ? ORDER BY step_index",
+            (session_id,)
+        )
+        return [json.loads(row["data"]) for row in rows]
+
+    def get_transcripts(self, session_id=None, start=None, end=None) -> List[Dict]:
+        """Transcripts of a session and/or overlapping [start, end)"""
+        clauses = []
+        params = []
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if start is not None:
+            clauses.append("end_ts > ?")
+            params.append(to_epoch(start))
+        if end is not None:
+            clauses.append("start_ts < ?")
+            params.append(to_epoch(end))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        rows = self._query(f"SELECT data FROM transcripts{where} ORDER BY start_ts", params)
+        return [json.loads(row["data"]) for row in rows]
+
+    def get_screenshots(self, session_id=None, start=None, end=None) -> List[Dict]:
+        where, params = self._where(session_id, start, end)
+        rows = self._query(f"SELECT ts, path, width, height FROM screenshots{where} ORDER BY ts", params)
+        return [dict(row) for row in rows]
+
+    def get_sessions(self) -> List[Dict]:
+        """Every session with its time span and event count, oldest first"""
+        rows = self._query(
+            "SELECT session_id, MIN(ts) AS start, MAX(ts) AS end, COUNT(*) AS events "
+            "FROM events GROUP BY session_id ORDER BY start"
+        )
+        return [dict(row) for row in rows]
+
+    def latest_session_id(self) -> Optional[str]:
+        rows = self._query("SELECT session_id FROM events ORDER BY ts DESC LIMIT 1")
+        return rows[0]["session_id"] if rows else None
+
+    def has_session(self, session_id) -> bool:
+        return bool(self._query("SELECT 1 FROM events WHERE session_id = ? LIMIT 1", (session_id,)))
+
+    def session_fingerprint(self, session_id) -> Optional[str]:
+        """Cheap token that changes whenever events are added to a session"""
+        rows = self._query(
+            "SELECT COUNT(*) AS n, MAX(id) AS last_id, MAX(ts) AS last_ts FROM events WHERE session_id = ?",
+            (session_id,)
+        )
+        if not rows or not rows[0]["n"]:
+            return None
+        row = rows[0]
+        return f"{row['n']}:{row['last_id']}:{row['last_ts']}"
+
+    def count_by_window(self, session_id=None, start=None, end=None, event_type=None) -> Dict[str, int]:
+        where, params = self._where(session_id, start, end, event_type=event_type)
+        rows = self._query(
+            f"SELECT window, COUNT(*) AS n FROM events{where} GROUP BY window ORDER BY n DESC",
+            params
+        )
+        return {row["window"]: row["n"] for row in rows}
+
+    def count_by_period(self, period="week", start=None, end=None, window=None,
+                        event_type=None) -> Dict[str, int]:
+        """Event counts per hour/day/week/month in local time, e.g. "how often per week" """
+        fmt = PERIOD_FORMATS[period]
+        where, params = self._where(start=start, end=end, window=window, event_type=event_type)
+        rows = self._query(
+            f"SELECT strftime('{fmt}', ts, 'unixepoch', 'localtime') AS period, COUNT(*) AS n "
+            f"FROM events{where} GROUP BY period ORDER BY period",
+            params
+        )
+        return {row["period"]: row["n"] for row in rows}
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    import time
+
+    print("Event Store Test")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = EventStore(Path(tmp)/"test.db")
+
+        # ~3 months of sessions, 200k events
+        random.seed(0)
+        windows = [f"App {i}" for i in range(30)]
+        t = time.time() - 90*86400
+        start = time.perf_counter()
+        for session in range(200):
+            batch = []
+            for _ in range(1000):
+                t += random.expovariate(1/30)
+                batch.append({
+                    "timestamp": datetime.fromtimestamp(t).isoformat(),
+                    "type": random.choice(["mouse_click", "key_press"]),
+                    "window": random.choice(windows)
+                })
+            for i in range(0, len(batch), 50):
+                store.add_events(f"session_{session}", batch[i:i + 50])
+        print(f"Inserted 200k events in {time.perf_counter() - start:.2f}s")
+
+        queries = {
+            "one session": lambda: store.get_events(session_id="session_150"),
+            "one week": lambda: store.get_events(start=t - 7*86400, end=t - 6*86400),
+            "one window, one week": lambda: store.get_events(window="App 3", start=t - 7*86400),
+            "clicks per week": lambda: store.count_by_period("week", event_type="mouse_click"),
+        }
+        for name, query in queries.items():
+            start = time.perf_counter()
+            result = query()
+            print(f"{name}: {len(result)} rows in {(time.perf_counter() - start)*1000:.1f} ms")
+
+        store.close()
@@ -1,11 +1,14 @@
 from pathlib import Path
+import logging
 import shutil
 
+logger = logging.getLogger(__name__)
+
 def clear_all_data(confirm=True):
     data_dir = Path("data")
 
     if not data_dir.exists():
-        print("Data directory doesn't exist.")
+        logger.info("Data directory doesn't exist.")
         return True
     
     if confirm:
@@ -19,14 +22,14 @@ def clear_all_data(confirm=True):
 
         print("="*60 + "\n")
 
-    for subdir in ['events', 'screenshots', 'audio']:
+    for subdir in ['events', 'screenshots', 'audio', 'cache']:
         path = data_dir/subdir
         if path.exists():
             try:
                 shutil.rmtree(path)
-                print(f"Deleted {subdir} directory.")
+                logger.info("Deleted %s directory.", subdir)
             except Exception as e:
-                print(f"Error deleting {subdir} directory: {e}")
+                logger.error("Error deleting %s directory: %s", subdir, e)
 
     deleted_files = 0
     for file in data_dir.glob("*.*"):
@@ -35,10 +38,10 @@ def clear_all_data(confirm=True):
                 file.unlink()
                 deleted_files += 1
             except Exception as e:
-                print(f"Error deleting {file.name}: {e}")
+                logger.error("Error deleting %s: %s", file.name, e)
     
     if deleted_files > 0:
-        print(f"Deleted {deleted_files} files.")
+        logger.info("Deleted %d files.", deleted_files)
 
-    print("All data cleared.")
+    logger.info("All data cleared.")
     return True
\ No newline at end of file
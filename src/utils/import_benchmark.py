@@ -0,0 +1,137 @@
+import json
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+# Entry points whose cold start matters
+DEFAULT_TARGETS = ("main", "src.gui.main_window", "src.processor.session")
+
+# "import time:       412 |       1510 |   encodings.aliases"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Entries of `python -X importtime` output: module, self/cumulative microseconds and nesting depth"""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                "module": module,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(indent) - 1)//2
+            })
+    return entries
+
+def measure_import(target, cwd=".", python=sys.executable) -> Dict:
+    """Import `target` in a fresh interpreter and summarize where the time went"""
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {target}"],
+        cwd=cwd, capture_output=True, text=True
+    )
+    entries = parse_importtime(result.stderr)
+    measurement = {
+        "target": target,
+        "ok": result.returncode == 0,
+        "total_ms": round(sum(e["cumulative_us"] for e in entries if e["depth"] == 0)/1000, 1),
+        "modules": len(entries),
+        "entries": entries
+    }
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        measurement["error"] = errors[-1] if errors else f"exit code {result.returncode}"
+    return measurement
+
+def slowest_packages(entries: List[Dict], limit=10) -> List[Dict]:
+    """Packages by cumulative import time, e.g. numpy or customtkinter.
+
+    Each package is counted at its outermost import, wherever in the tree
+    that happens, so time is not attributed to whoever imported it first.
+    """
+    totals = {}
+    # importtime prints children before their parent; reversed, parents come first
+    ancestors = []
+    for entry in reversed(entries):
+        package = entry["module"].split(".")[0]
+        del ancestors[entry["depth"]:]
+        if package not in ancestors:
+            totals[package] = totals.get(package, 0) + entry["cumulative_us"]
+        ancestors.append(package)
+    slowest = sorted(totals.items(), key=lambda item: -item[1])[:limit]
+    return [{"package": package, "ms": round(us/1000, 1)} for package, us in slowest]
+
+class ImportBenchmark:
+    """Cold-start import time of the app's entry points.
+
+    Each target is imported `repeats` times in a fresh interpreter and the
+    median is kept. Reports are saved to `output_file`, and the previous
+    report there is used to print how much each target got faster or slower.
+    """
+
+    def __init__(self, targets=DEFAULT_TARGETS, repeats=5, cwd="."):
+        self.targets = targets
+        self.repeats = repeats
+        self.cwd = cwd
+
+    def run(self, output_file="data/benchmarks/import_time.json") -> Dict:
+        previous = {}
+        if output_file and Path(output_file).exists():
+            with open(output_file, "r", encoding="utf-8") as f:
+                previous = {r["target"]: r for r in json.load(f).get("results", [])}
+
+        results = []
+        for target in self.targets:
+            runs = [measure_import(target, self.cwd) for _ in range(self.repeats)]
+            median_ms = statistics.median(r["total_ms"] for r in runs)
+            last = runs[-1]
+            result = {
+                "target": target,
+                "ok": last["ok"],
+                "median_ms": median_ms,
+                "min_ms": min(r["total_ms"] for r in runs),
+                "modules": last["modules"],
+                "slowest_packages": slowest_packages(last["entries"])
+            }
+            if not last["ok"]:
+                result["error"] = last["error"]
+            results.append(result)
+
+            line = f"{target}: {median_ms:.1f} ms, {result['modules']} modules"
+            before = previous.get(target)
+            if before is not None:
+                line += f" ({median_ms - before['median_ms']:+.1f} ms vs last run)"
+            if not last["ok"]:
+                line += f" [failed: {result['error']}]"
+            print(line)
+            for package in result["slowest_packages"][:5]:
+                print(f"    {package['package']}: {package['ms']} ms")
+
+        report = {
+            "generated_at": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "repeats": self.repeats,
+            "results": results
+        }
+        if output_file:
+            Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Import times saved to {output_file}")
+        return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cold-start import time benchmark")
+    parser.add_argument("targets", nargs="*", default=list(DEFAULT_TARGETS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default="data/benchmarks/import_time.json")
+    args = parser.parse_args()
+
+    ImportBenchmark(args.targets, args.repeats).run(args.output)
@@ -0,0 +1,329 @@
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class Counter:
+    """Monotonically increasing count"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+class Gauge:
+    """Value that can go up and down, e.g. a queue depth"""
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+class Histogram:
+    """Log-linear (HDR-style) histogram with bounded relative error.
+
+    Each power of two above `lowest` is split into `sub_buckets` linear
+    buckets, so a recorded value is off by at most 1/sub_buckets of itself
+    (about 3% with the default 32) at any scale, from microseconds to minutes,
+    in a few hundred buckets.
+    """
+
+    def __init__(self, lowest=1e-6, sub_buckets=32):
+        self.lowest = lowest
+        self.sub_buckets = sub_buckets
+        self._lock = threading.Lock()
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value) -> int:
+        if value <= self.lowest:
+            return 0
+        ratio = value/self.lowest
+        exponent = int(math.log2(ratio))
+        sub = int((ratio/2**exponent - 1)*self.sub_buckets)
+        return 1 + exponent*self.sub_buckets + min(sub, self.sub_buckets - 1)
+
+    def _upper_bound(self, index) -> float:
+        if index == 0:
+            return self.lowest
+        exponent, sub = divmod(index - 1, self.sub_buckets)
+        return self.lowest*2**exponent*(1 + (sub + 1)/self.sub_buckets)
+
+    def record(self, value):
+        index = self._index(value)
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.sum += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p) -> Optional[float]:
+        with self._lock:
+            if not self.count:
+                return None
+            rank = max(1, math.ceil(p/100*self.count))
+            seen = 0
+            for index in sorted(self._counts):
+                seen += self._counts[index]
+                if seen >= rank:
+                    # Never report more than what was actually recorded
+                    return round(min(self._upper_bound(index), self.max), 9)
+        return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99)
+        }
+
+def _series_key(name, labels: Dict):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class MetricsRegistry:
+    """Process-wide counters, gauges, histograms and trace spans.
+
+    Metrics are created on first use and identified by name plus labels:
+
+        metrics.counter("events_captured_total", type="mouse_click").inc()
+        with metrics.timer("frame_encode_seconds"):
+            ...
+        with metrics.span("session.llm", session_id=session_id):
+            ...
+
+    A span records its duration in the "span_seconds" histogram and keeps
+    the last `max_spans` finished spans, with their parent span on the same
+    thread, for tracing a session stage by stage.
+    """
+
+    def __init__(self, max_spans=1000):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._types = {}
+        self.max_spans = max_spans
+        self.spans: List[Dict] = []
+        self._local = threading.local()
+
+    def _get(self, kind, name, labels):
+        key = _series_key(name, labels)
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    if self._types.setdefault(name, kind) != kind:
+                        raise ValueError(f"Metric {name} is a {self._types[name]}, not a {kind}")
+                    metric = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}[kind]()
+                    self._metrics[key] = metric
+        return metric
+
+    def counter(self, name, **labels) -> Counter:
+        return self._get("counter", name, labels)
+
+    def gauge(self, name, **labels) -> Gauge:
+        return self._get("gauge", name, labels)
+
+    def histogram(self, name, **labels) -> Histogram:
+        return self._get("histogram", name, labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Record the duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name, **labels).record(time.perf_counter() - start)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Trace the block as a span nested in the thread's current span"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        span = {
+            "name": name,
+            "parent": stack[-1]["name"] if stack else None,
+            "start": datetime.now().isoformat(),
+            "attributes": attributes
+        }
+        stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["error"] = type(e).__name__
+            raise
+        finally:
+            span["seconds"] = round(time.perf_counter() - start, 6)
+            stack.pop()
+            self._finish_span(span)
+
+    def add_span(self, name, seconds, start: datetime = None, parent=None, **attributes):
+        """Record a span timed elsewhere, e.g. one that starts and ends in different calls"""
+        self._finish_span({
+            "name": name,
+            "parent": parent,
+            "start": (start or datetime.now()).isoformat(),
+            "attributes": attributes,
+            "seconds": round(seconds, 6)
+        })
+
+    def _finish_span(self, span):
+        self.histogram("span_seconds", span=span["name"]).record(span["seconds"])
+        with self._lock:
+            self.spans.append(span)
+            del self.spans[:-self.max_spans]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            items = list(self._metrics.items())
+        metrics = []
+        for (name, labels), metric in sorted(items, key=lambda item: item[0]):
+            metrics.append({
+                "name": name,
+                "type": self._types[name],
+                "labels": dict(labels),
+                "value": metric.snapshot()
+            })
+        return {"time": datetime.now().isoformat(), "metrics": metrics}
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition; histograms are exported as summaries"""
+        lines = []
+        typed = set()
+        for entry in self.snapshot()["metrics"]:
+            name, kind, value = entry["name"], entry["type"], entry["value"]
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {'summary' if kind == 'histogram' else kind}")
+            labels = entry["labels"]
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            for quantile, key in (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99")):
+                estimate = value[key]
+                if estimate is not None:
+                    lines.append(f"{name}{_format_labels({**labels, 'quantile': quantile})} {estimate}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, jsonl_file="data/metrics/metrics.jsonl", prometheus_file="data/metrics/metrics.prom"):
+        """Append a snapshot to the JSONL history and rewrite the Prometheus file"""
+        if jsonl_file:
+            Path(jsonl_file).parent.mkdir(parents=True, exist_ok=True)
+            with open(jsonl_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.snapshot()) + "\n")
+        if prometheus_file:
+            Path(prometheus_file).parent.mkdir(parents=True, exist_ok=True)
+            # Written aside and renamed so a scraper never reads half a file
+            tmp = Path(str(prometheus_file) + ".tmp")
+            tmp.write_text(self.to_prometheus(), encoding="utf-8")
+            tmp.replace(prometheus_file)
+
+def _format_labels(labels: Dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+class MetricsExporter:
+    """Export a registry every `interval` seconds from a background thread"""
+
+    def __init__(self, registry=None, interval=10.0, jsonl_file="data/metrics/metrics.jsonl",
+                 prometheus_file="data/metrics/metrics.prom"):
+        self.registry = registry or metrics
+        self.interval = interval
+        self.jsonl_file = jsonl_file
+        self.prometheus_file = prometheus_file
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _export(self):
+        try:
+            self.registry.export(self.jsonl_file, self.prometheus_file)
+        except OSError as e:
+            logger.error("Error exporting metrics: %s", e)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._export()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop exporting, writing one last snapshot"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._export()
+
+# Shared by every module
+metrics = MetricsRegistry()
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+
+    print("Metrics Registry Test")
+
+    registry = MetricsRegistry()
+    random.seed(0)
+    values = [random.lognormvariate(-5, 1.5) for _ in range(100000)]
+
+    start = time.perf_counter()
+    for value in values:
+        registry.histogram("latency_seconds", stage="demo").record(value)
+    elapsed = time.perf_counter() - start
+    print(f"{len(values)} records in {elapsed*1000:.0f} ms ({elapsed/len(values)*1e6:.2f} us each)")
+
+    histogram = registry.histogram("latency_seconds", stage="demo")
+    ordered = sorted(values)
+    for p in (50, 90, 99):
+        exact = ordered[math.ceil(p/100*len(ordered)) - 1]
+        estimate = histogram.percentile(p)
+        print(f"p{p}: {estimate:.6f}s (exact {exact:.6f}s, error {abs(estimate - exact)/exact:.1%})")
+
+    with registry.span("session.finish", session_id="demo"):
+        with registry.span("session.llm"):
+            time.sleep(0.01)
+        registry.counter("tokens_total").inc(42)
+    print([(s["name"], s["parent"], s["seconds"]) for s in registry.spans])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry.export(Path(tmp)/"metrics.jsonl", Path(tmp)/"metrics.prom")
+        print((Path(tmp)/"metrics.prom").read_text())
@@ -0,0 +1,270 @@
+import cProfile
+import functools
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def _frame_label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_qualname}"
+
+class Profiler:
+    """Opt-in profiler for the recorder threads and input callbacks.
+
+    Code that runs on its own thread wraps its entry point once:
+
+        callback = profiler.wrap(self._on_mouse_click, "listener.mouse")
+
+    While the profiler runs, a sampler thread records the Python stack of
+    every thread inside a wrapped call `1/interval` times per second. When
+    it is not running, wrap() returns the function untouched, so profiling
+    costs nothing unless it was started before the recorders.
+
+    Each wrapped name gets its own profile, e.g. one per listener, recording
+    loop or transcription worker. Calls that finish in less than `slow_ms`
+    are dropped, so with a threshold only slow callbacks are kept. Calls
+    nested in another wrapped call belong to the outer one. With
+    `cprofile=True` each call also runs under cProfile, for exact call
+    counts; Python 3.12+ only allows one cProfile at a time, so calls that
+    overlap one on another thread are sampled only.
+
+    stop() writes to a timestamped folder under `output_dir`:
+    - <name>.collapsed: that name's stacks in collapsed ("folded") format
+    - <name>.prof: its cProfile stats, with `cprofile=True`
+    - merged.collapsed: every profile, each under its name as the root
+      frame, for flamegraph.pl, speedscope or inferno
+    - summary.json: calls, slow calls and the hottest functions per name
+    """
+
+    def __init__(self):
+        self.active = False
+        self.output_dir = Path("data/profiles")
+        self.slow_ms = 0.0
+        self.interval = 0.005
+        self.cprofile = False
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # thread ident -> call being sampled on that thread
+        self._calls: Dict[int, Dict] = {}
+        self._profiles: Dict[str, Dict] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples_taken = 0
+        self.cprofile_conflicts = 0
+
+    def start(self, output_dir="data/profiles", slow_ms=0.0, interval=0.005, cprofile=False):
+        """Start sampling; only functions wrapped after this call are profiled"""
+        if self.active:
+            logger.warning("Profiler is already running.")
+            return self
+        self.output_dir = Path(output_dir)
+        self.slow_ms = slow_ms
+        self.interval = interval
+        self.cprofile = cprofile
+        self._profiles = {}
+        self.samples_taken = 0
+        self.cprofile_conflicts = 0
+
+        self.active = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+        logger.info("Profiling every %.1f ms, keeping calls slower than %s ms",
+                    self.interval*1000, self.slow_ms)
+        return self
+
+    def wrap(self, func: Callable, name) -> Callable:
+        if not self.active:
+            return func
+
+        @functools.wraps(func)
+        def profiled(*args, **kwargs):
+            return self._call(name, func, args, kwargs)
+        return profiled
+
+    def _call(self, name, func, args, kwargs):
+        if not self.active or getattr(self._local, "busy", False):
+            return func(*args, **kwargs)
+
+        # Sampled stacks stop at this frame, leaving out the thread bootstrap
+        call = {"name": name, "frame": sys._getframe(), "samples": {}}
+        profile = self._start_cprofile() if self.cprofile else None
+        ident = threading.get_ident()
+        self._local.busy = True
+        with self._lock:
+            self._calls[ident] = call
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+            with self._lock:
+                del self._calls[ident]
+            self._local.busy = False
+            self._finish(call, elapsed, profile)
+
+    def _start_cprofile(self) -> Optional[cProfile.Profile]:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another thread's cProfile is running (Python 3.12+)
+            self.cprofile_conflicts += 1
+            return None
+        return profile
+
+    def _finish(self, call, elapsed, profile):
+        name = call["name"]
+        metrics.histogram("profiled_call_seconds", target=name).record(elapsed)
+        slow = elapsed*1000 >= self.slow_ms
+        stats = pstats.Stats(profile) if slow and profile is not None else None
+
+        with self._lock:
+            entry = self._profiles.setdefault(name, {
+                "calls": 0, "slow_calls": 0, "total_seconds": 0.0, "max_ms": 0.0,
+                "samples": {}, "pstats": None
+            })
+            entry["calls"] += 1
+            entry["total_seconds"] += elapsed
+            entry["max_ms"] = max(entry["max_ms"], elapsed*1000)
+            if not slow:
+                return
+            entry["slow_calls"] += 1
+            for stack, count in call["samples"].items():
+                entry["samples"][stack] = entry["samples"].get(stack, 0) + count
+            if stats is not None:
+                if entry["pstats"] is None:
+                    entry["pstats"] = stats
+                else:
+                    entry["pstats"].add(stats)
+        if self.slow_ms:
+            logger.debug("Slow %s call: %.1f ms", name, elapsed*1000)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                self.samples_taken += 1
+                for ident, call in self._calls.items():
+                    frame = frames.get(ident)
+                    stack = []
+                    while frame is not None and frame is not call["frame"]:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    if frame is None:
+                        # The call returned since the frames were taken
+                        continue
+                    key = tuple(reversed(stack))
+                    call["samples"][key] = call["samples"].get(key, 0) + 1
+
+    def stop(self) -> Optional[Dict]:
+        """Stop sampling and write the profiles; returns the summary.
+
+        Calls still running are not included, so stop the recorders first.
+        """
+        if not self.active:
+            return None
+        self.active = False
+        self._stop.set()
+        self._thread.join()
+        return self.write()
+
+    def write(self) -> Dict:
+        folder = self.output_dir/datetime.now().strftime("%Y%m%d_%H%M%S")
+        folder.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            profiles = dict(self._profiles)
+
+        summary = {
+            "folder": str(folder),
+            "interval_ms": self.interval*1000,
+            "slow_ms": self.slow_ms,
+            "samples_taken": self.samples_taken,
+            "cprofile_conflicts": self.cprofile_conflicts,
+            "profiles": {}
+        }
+        merged = []
+        for name, entry in sorted(profiles.items()):
+            lines = [f"{';'.join((name,) + stack)} {count}" for stack, count in sorted(entry["samples"].items())]
+            (folder/f"{name}.collapsed").write_text("\n".join(lines) + "\n", encoding="utf-8")
+            merged.extend(lines)
+            if entry["pstats"] is not None:
+                entry["pstats"].dump_stats(folder/f"{name}.prof")
+
+            # Functions the samples were taken in, i.e. self time
+            leaves = {}
+            for stack, count in entry["samples"].items():
+                leaf = stack[-1] if stack else name
+                leaves[leaf] = leaves.get(leaf, 0) + count
+            samples = sum(leaves.values())
+            hottest = sorted(leaves.items(), key=lambda item: -item[1])[:5]
+            summary["profiles"][name] = {
+                "calls": entry["calls"],
+                "slow_calls": entry["slow_calls"],
+                "total_seconds": round(entry["total_seconds"], 3),
+                "max_ms": round(entry["max_ms"], 2),
+                "samples": samples,
+                "hottest": [{"function": leaf, "share": round(count/samples, 3)} for leaf, count in hottest]
+            }
+
+        (folder/"merged.collapsed").write_text("\n".join(merged) + "\n", encoding="utf-8")
+        with open(folder/"summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        logger.info("Profiles saved to %s", folder)
+        return summary
+
+# Shared by every module
+profiler = Profiler()
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print("Profiler Test")
+
+    def busy(ms):
+        end = time.perf_counter() + ms/1000
+        while time.perf_counter() < end:
+            sum(i*i for i in range(100))
+
+    def on_click(n):
+        # Every tenth click is slow
+        busy(30 if n % 10 == 0 else 1)
+
+    def recording_loop():
+        for _ in range(20):
+            busy(5)
+            time.sleep(0.01)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler.start(output_dir=tmp, slow_ms=20, cprofile=True)
+        click = profiler.wrap(on_click, "listener.mouse")
+        threads = [
+            threading.Thread(target=lambda: [click(n) for n in range(50)]),
+            threading.Thread(target=profiler.wrap(recording_loop, "screen_recorder"))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary = profiler.stop()
+
+        print(f"{summary['samples_taken']} samples, {summary['cprofile_conflicts']} cProfile conflicts")
+        for name, profile in summary["profiles"].items():
+            print(f"{name}: {profile['slow_calls']}/{profile['calls']} calls kept, max {profile['max_ms']} ms, "
+                  f"{profile['samples']} samples, hottest {profile['hottest'][0]['function']}")
+        print(sorted(path.name for path in Path(summary["folder"]).iterdir()))
+        assert summary["profiles"]["listener.mouse"]["slow_calls"] == 5, "threshold kept the wrong calls"
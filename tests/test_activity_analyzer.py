@@ -0,0 +1,19 @@
+from src.analyzer.activity_analyzer import ActivityAnalyzer
+from src.analyzer.workflow_io import WorkflowReader
+
+def test_dict_and_ndjson_workflows_share_the_analysis(tmp_path):
+    analyzer = ActivityAnalyzer(store=None)
+    stream = analyzer.create_stream()
+    matcher = analyzer.create_matcher(stream=stream)
+    matcher.add_template("copy_paste", ["Excel: Ctrl + c", "*", "Excel: Ctrl + v"])
+    for i, key in enumerate(["Ctrl + c", "a", "Ctrl + v"]):
+        event = {"timestamp": f"2026-01-01T00:00:0{i}", "type": "key_press", "window": "Excel", "key": key}
+        stream.consume(event)
+        matcher.consume(event)
+
+    workflow = analyzer.generate_workflow_json("session", stream=stream)
+    with WorkflowReader(analyzer.write_workflow(tmp_path/"workflow.ndjson", "session", stream=stream)) as reader:
+        for key in ("statistics", "template_matches", "similar_workflows"):
+            assert workflow[key] == reader.get(key), key
+
+    assert [match["template"] for match in workflow["template_matches"]] == ["copy_paste"]
@@ -0,0 +1,26 @@
+import json
+from src.analyzer import batch_analyzer
+from src.analyzer.batch_analyzer import BatchAnalyzer
+from src.analyzer.window_normalizer import WindowNormalizer
+
+def _batch(tmp_path):
+    events_dir = tmp_path/"events"
+    events_dir.mkdir()
+    events = [{"timestamp": "2026-01-01T00:00:00", "type": "key_press", "window": "github.com - Google Chrome",
+               "key": "Ctrl + c"}]
+    (events_dir/"events_s1.json").write_text(json.dumps(events), encoding="utf-8")
+    return BatchAnalyzer(events_dir=events_dir, db_path=None, cache_dir=tmp_path/"cache", max_workers=1)
+
+def test_normalizer_rules_are_part_of_the_cache_key(tmp_path, monkeypatch):
+    batch = _batch(tmp_path)
+    before = batch._fingerprint("s1")
+
+    monkeypatch.setattr(batch_analyzer, "default_normalizer", WindowNormalizer(rules=[]))
+    after = batch._fingerprint("s1")
+
+    assert before is not None and after is not None
+    assert before != after
+    # The cached result is not reused under other rules
+    batch._save_cached("s1", before, {"session_id": "s1"})
+    assert batch._load_cached("s1", before) == {"session_id": "s1"}
+    assert batch._load_cached("s1", after) is None
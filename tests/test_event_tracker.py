@@ -0,0 +1,77 @@
+import threading
+from src.recorder.event_tracker import EventTracker
+
+class _Source:
+    def start(self, tracker):
+        pass
+
+    def stop(self):
+        pass
+
+def _tracker(tmp_path):
+    tracker = EventTracker(output_dir=tmp_path, source=_Source())
+    tracker._grab_click_area = lambda x, y: f"area at {x},{y}"
+    tracker._extract_text = lambda screenshot: f"text in {screenshot}"
+    tracker.start()
+    return tracker
+
+def test_ocr_returns_text_right_away(tmp_path):
+    tracker = _tracker(tmp_path)
+
+    assert tracker._extract_text_near_click(10, 20) == "text in area at 10,20"
+    assert len(tracker.deferred_ocr) == 0
+
+def test_deferred_ocr_is_read_once_resumed(tmp_path):
+    tracker = _tracker(tmp_path)
+    texts = []
+    done = threading.Event()
+    def on_text(text):
+        texts.append(text)
+        if len(texts) == 2:
+            done.set()
+
+    tracker.defer_ocr()
+    assert tracker._extract_text_near_click(10, 20, on_text) is None
+    assert tracker._extract_text_near_click(30, 40, on_text) is None
+    # Without a callback nothing is kept for later
+    assert tracker._extract_text_near_click(50, 60) is None
+    assert len(tracker.deferred_ocr) == 2
+    assert texts == []
+
+    tracker.resume_ocr()
+    assert done.wait(5)
+    assert texts == ["text in area at 10,20", "text in area at 30,40"]
+
+def test_deferred_ocr_keeps_only_the_newest_requests(tmp_path):
+    tracker = _tracker(tmp_path)
+    tracker.max_deferred_ocr = 3
+    texts = []
+
+    tracker.defer_ocr()
+    for x in range(5):
+        tracker._extract_text_near_click(x, 0, texts.append)
+
+    assert tracker.ocr_dropped == 2
+    assert [request[0] for request in tracker.deferred_ocr] == ["area at 2,0", "area at 3,0", "area at 4,0"]
+
+def test_resumed_ocr_goes_to_the_handler(tmp_path):
+    tracker = _tracker(tmp_path)
+    handled = []
+    tracker.ocr_handler = handled.append
+
+    tracker.defer_ocr()
+    tracker._extract_text_near_click(10, 20, print)
+    tracker.resume_ocr()
+
+    assert handled == [("area at 10,20", print)]
+    assert len(tracker.deferred_ocr) == 0
+
+def test_stop_reads_deferred_ocr(tmp_path):
+    tracker = _tracker(tmp_path)
+    texts = []
+
+    tracker.defer_ocr()
+    tracker._extract_text_near_click(10, 20, texts.append)
+    tracker.stop()
+
+    assert texts == ["text in area at 10,20"]
@@ -0,0 +1,145 @@
+import threading
+import time
+import pytest
+from src.llm.benchmark import synthetic_workflow
+from src.llm.mock_server import MockOllamaServer
+from src.llm.ollama_client import OllamaClient
+from src.llm.response_cache import ResponseCache
+
+@pytest.fixture
+def client_for(tmp_path):
+    clients = []
+    def make(server):
+        client = OllamaClient(server.url, cache=ResponseCache(tmp_path/"responses.db"), timeline_dir=None)
+        clients.append(client)
+        return client
+    yield make
+    for client in clients:
+        client.transport.close()
+
+class _StubResponse:
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, chunk_size=None):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+class _StubTransport:
+    def __init__(self, lines):
+        self.response = _StubResponse(lines)
+
+    def post(self, path, payload, stream=False, timeout=None):
+        return self.response
+
+def test_stream_yields_the_answer_and_timing(client_for):
+    with MockOllamaServer(token_rate=500.0, first_token_delay=0.05, response_tokens=20) as server:
+        client = client_for(server)
+        chunks = list(client.stream_prompt("Summarize the session"))
+        stats = client.generation_stats
+
+    assert "".join(chunks) == "".join(server.answer_tokens("Summarize the session"))
+    assert stats["chunks"] == 20
+    assert stats["tokens"] == 20
+    assert stats["ttft_seconds"] >= 0.05
+    assert stats["tokens_per_second"] > 0
+    assert stats["total_seconds"] >= stats["ttft_seconds"]
+    assert not stats["cancelled"]
+
+def test_cancel_stops_a_stream_waiting_for_its_first_token(client_for):
+    # The first token would take 5 s; cancelling must not wait for it
+    with MockOllamaServer(first_token_delay=5.0) as server:
+        client = client_for(server)
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        start = time.perf_counter()
+        chunks = list(client.stream_prompt("Summarize the session", cancel))
+        elapsed = time.perf_counter() - start
+
+    assert chunks == []
+    assert elapsed < 2.0
+    assert client.generation_stats["cancelled"]
+    assert client.generation_stats["ttft_seconds"] is None
+
+def test_cancel_during_generation_keeps_partial_stats(client_for):
+    with MockOllamaServer(token_rate=20.0, first_token_delay=0.0, response_tokens=200) as server:
+        client = client_for(server)
+        cancel = threading.Event()
+        chunks = []
+        for text in client.stream_prompt("Summarize the session", cancel):
+            chunks.append(text)
+            if len(chunks) == 3:
+                cancel.set()
+
+    stats = client.generation_stats
+    assert stats["cancelled"]
+    assert 3 <= len(chunks) < 200
+    # No server counters after a cancel: streamed chunks are counted instead
+    assert stats["tokens"] == stats["chunks"] == len(chunks)
+
+def test_malformed_chunks_are_skipped(tmp_path):
+    transport = _StubTransport([
+        b'{"response": "Use ", "done": false}',
+        b'{"response": "a scr',
+        b'',
+        b'{"response": "macro", "done": false}',
+        b'{"response": "", "done": true}'
+    ])
+    client = OllamaClient(cache=ResponseCache(tmp_path/"responses.db"), transport=transport)
+
+    assert "".join(client.stream_prompt("Summarize the session")) == "Use macro"
+    assert client.generation_stats["malformed_chunks"] == 1
+    assert transport.response.closed
+
+def test_cancel_stops_a_stream_waiting_for_its_next_token(client_for):
+    # Tokens come every 2 s; cancelling after the first must not wait for the second
+    with MockOllamaServer(token_rate=0.5, first_token_delay=0.0) as server:
+        client = client_for(server)
+        cancel = threading.Event()
+        chunks = []
+        start = None
+        for text in client.stream_prompt("Summarize the session", cancel):
+            chunks.append(text)
+            start = time.perf_counter()
+            threading.Timer(0.1, cancel.set).start()
+        elapsed = time.perf_counter() - start
+
+    assert len(chunks) == 1
+    assert elapsed < 1.0
+    assert client.generation_stats["cancelled"]
+
+def test_cancel_during_map_reduce_skips_the_final_request(client_for):
+    workflow = synthetic_workflow(400)
+    # Slow enough that the phase summaries are still running when cancelled
+    with MockOllamaServer(token_rate=20.0, first_token_delay=0.0) as server:
+        client = client_for(server)
+        cancel = threading.Event()
+        threading.Timer(0.3, cancel.set).start()
+        start = time.perf_counter()
+        result = client.generate_suggestions(workflow, cancel_event=cancel, bypass_cache=True, map_reduce=True)
+        elapsed = time.perf_counter() - start
+        requests = server.requests
+
+    assert result == "No suggestions generated"
+    assert client.generation_stats["cancelled"]
+    assert elapsed < 2.0
+    # Only the phase summaries that had a worker were sent; no reduce or final pass
+    assert requests == client.phase_workers
+
+def test_timeline_is_saved_only_when_asked(tmp_path):
+    workflow = synthetic_workflow(20)
+    transport = _StubTransport([])
+    client = OllamaClient(cache=ResponseCache(tmp_path/"responses.db"), transport=transport,
+                          timeline_dir=tmp_path/"timelines")
+    prompt = client._prepare_prompt(workflow)
+    assert (tmp_path/"timelines"/"timeline_benchmark_20.txt").read_text(encoding="utf-8") == prompt
+
+    client.timeline_dir = None
+    client._prepare_prompt({**workflow, "session_id": "other"})
+    assert [path.name for path in (tmp_path/"timelines").iterdir()] == ["timeline_benchmark_20.txt"]
@@ -0,0 +1,30 @@
+import threading
+from src.processor.session import Stage
+
+def test_stage_handles_items_in_order():
+    handled = []
+    stage = Stage("test", handled.append).start()
+    for i in range(5):
+        stage.put(i)
+    stage.close(timeout=5)
+
+    assert handled == [0, 1, 2, 3, 4]
+    assert stage.stats()["items"] == 5
+
+def test_full_stage_drops_new_items():
+    release = threading.Event()
+    handled = []
+    def handler(item):
+        release.wait(5)
+        handled.append(item)
+
+    stage = Stage("test", handler, maxsize=2, drop_when_full=True)
+    # Not started yet, so the queue fills up
+    for i in range(4):
+        stage.put(i)
+    stage.start()
+    release.set()
+    stage.close(timeout=5)
+
+    assert handled == [0, 1]
+    assert stage.stats()["dropped"] == 2
@@ -0,0 +1,24 @@
+from src.analyzer.activity_analyzer import ActivityAnalyzer
+from src.analyzer.template_matcher import TemplateMatcher
+
+def key_presses(*keys, window="Excel"):
+    return [{"type": "key_press", "window": window, "key": key} for key in keys]
+
+def test_gap_template_matches():
+    matcher = TemplateMatcher(ActivityAnalyzer())
+    matcher.add_template("copy_paste", ["Excel: Ctrl + c", "*", "Excel: Ctrl + v"])
+    found = matcher.match_events(key_presses("Ctrl + c", "Ctrl + x", "Ctrl + v"))
+    assert [(m["template"], m["start_event"], m["end_event"]) for m in found] == [("copy_paste", 0, 2)]
+
+def test_first_and_last_segment_share_a_token():
+    matcher = TemplateMatcher(ActivityAnalyzer())
+    matcher.add_template("copy_twice", ["Excel: Ctrl + c", "*", "Excel: Ctrl + c"])
+    found = matcher.match_events(key_presses("Ctrl + c", "Ctrl + v", "Ctrl + c"))
+    assert [(m["template"], m["start_event"], m["end_event"]) for m in found] == [("copy_twice", 0, 2)]
+
+def test_shared_token_restarts_the_template():
+    matcher = TemplateMatcher(ActivityAnalyzer())
+    matcher.add_template("copy_twice", ["Excel: Ctrl + c", "*", "Excel: Ctrl + c"])
+    found = matcher.match_events(key_presses("Ctrl + c", "Ctrl + v", "Ctrl + c", "Ctrl + v", "Ctrl + c"))
+    # The middle copy ends the first match and starts the second
+    assert [(m["start_event"], m["end_event"]) for m in found] == [(0, 2), (2, 4)]
@@ -0,0 +1,92 @@
+import heapq
+import threading
+import time
+from src.gui.update_bus import UpdateBus
+
+class HeadlessRoot:
+    """Stand-in for a Tk root: runs `after` callbacks on the thread calling mainloop"""
+
+    def __init__(self):
+        self._timers = []
+        self._counter = 0
+
+    def after(self, ms, func):
+        self._counter += 1
+        heapq.heappush(self._timers, (time.perf_counter() + ms/1000, self._counter, func))
+
+    def mainloop(self, until: threading.Event, timeout=5.0):
+        end = time.perf_counter() + timeout
+        while self._timers and not until.is_set() and time.perf_counter() < end:
+            due, _, func = heapq.heappop(self._timers)
+            time.sleep(max(0, due - time.perf_counter()))
+            func()
+
+def _run_workers(bus, root, targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    done = threading.Event()
+    def join():
+        for thread in threads:
+            thread.join()
+        done.set()
+
+    for thread in threads:
+        thread.start()
+    threading.Thread(target=join).start()
+    root.mainloop(done)
+    assert done.wait(5)
+    bus.drain()
+
+def test_updates_are_coalesced_and_applied_on_the_tk_thread():
+    root = HeadlessRoot()
+    bus = UpdateBus(root, fps=20).start()
+    tk_thread = threading.get_ident()
+    shown = {"text": "", "status": None, "wrong_thread": 0}
+
+    def insert(text):
+        shown["wrong_thread"] += threading.get_ident() != tk_thread
+        shown["text"] += text
+
+    def set_status(text):
+        shown["wrong_thread"] += threading.get_ident() != tk_thread
+        shown["status"] = text
+
+    def worker(n):
+        for i in range(20000):
+            bus.set("status", set_status, f"worker {n}: {i} events")
+            bus.append("tokens", insert, f"{n}")
+
+    _run_workers(bus, root, [lambda n=n: worker(n) for n in range(4)])
+
+    stats = bus.stats()
+    assert len(shown["text"]) == 4*20000
+    assert sorted(shown["text"]) == sorted("0123"*20000)
+    assert shown["status"].endswith("19999 events")
+    assert shown["wrong_thread"] == 0
+    assert stats["posted"] == 2*4*20000
+    # Far fewer callbacks ran than updates were posted
+    assert stats["applied"] < stats["posted"]/10
+
+def test_updates_keep_their_order_around_a_call():
+    root = HeadlessRoot()
+    bus = UpdateBus(root, fps=20)
+    order = []
+
+    bus.append("log", order.append, "a")
+    bus.call(order.append, "b")
+    bus.append("log", order.append, "c")
+    bus.set("status", order.append, "d")
+    bus.set("status", order.append, "e")
+    bus.drain()
+
+    assert order == ["a", "b", "c", "e"]
+
+def test_failing_update_does_not_stop_the_frame():
+    bus = UpdateBus(HeadlessRoot())
+    applied = []
+
+    bus.call(lambda: 1/0)
+    bus.call(applied.append, "after")
+
+    assert bus.drain() == 2
+    assert applied == ["after"]
+    assert bus.stats()["errors"] == 1
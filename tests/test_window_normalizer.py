@@ -0,0 +1,19 @@
+import pytest
+from src.analyzer.window_normalizer import WindowNormalizer
+
+@pytest.mark.parametrize("title, expected", [
+    ("Report (3).xlsx - Excel", ("Excel", "*.xlsx")),
+    ("*notes.txt - Notepad", ("Notepad", "*.txt")),
+    ("main.py - Visual Studio Code", ("Visual Studio Code", "*.py")),
+    ("Inbox (17) - Outlook", ("Outlook", "Inbox")),
+    ("github.com - Google Chrome", ("Google Chrome", "github.com")),
+    ("docs.github.com - Google Chrome", ("Google Chrome", "github.com")),
+    ("www.bbc.co.uk - Firefox", ("Firefox", "bbc.co.uk")),
+    ("Program Manager", ("Program Manager", "")),
+])
+def test_normalize(title, expected):
+    assert WindowNormalizer().normalize(title) == expected
+
+def test_domains_stay_apart():
+    normalizer = WindowNormalizer()
+    assert normalizer.key("github.com - Google Chrome") != normalizer.key("google.com - Google Chrome")